@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
+from apps.account.models import APIKey
 from apps.utils.mixins.admin.core import ExportCsvMixin
 
 
@@ -75,3 +76,47 @@ class UserAdmin(DjangoUserAdmin, ExportCsvMixin):
     def add_view(self, request, form_url='', extra_context=None):
         self.inlines = []
         return super().add_view(request)
+
+
+@admin.register(APIKey)
+class APIKeyAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'name',
+        'prefix',
+        'user',
+        'endpoints',
+        'expires_at',
+        'revoked_at',
+        'created_at',
+    ]
+
+    list_display_links = [
+        'id',
+    ]
+
+    search_fields = [
+        'name',
+        'prefix',
+        'user__username',
+        'user__email',
+    ]
+
+    readonly_fields = [
+        'prefix',
+        'created_at',
+        'modified_at',
+    ]
+
+    actions = [
+        'revoke',
+    ]
+
+    # keys are created with the run_create_api_key command, which is the only place the raw key is shown
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Revoke selected API keys')
+    def revoke(self, request, queryset):
+        for api_key in queryset.filter(revoked_at__isnull=True):
+            api_key.revoke()
@@ -3,10 +3,10 @@ from rest_framework.generics import RetrieveUpdateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import TokenError
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.account.authentication import CachedJWTAuthentication
 from apps.account.serializers import LoginSerializer, RegistrationSerializer, RetrieveUserSerializer, \
     UpdateUserSerializer
 
@@ -36,7 +36,7 @@ class LoginAPIView(APIView):
 
 class UserRetrieveUpdateAPIView(RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
 
     def get_serializer_class(self):
         if self.request.method == "PUT":
@@ -60,7 +60,7 @@ class UserRetrieveUpdateAPIView(RetrieveUpdateAPIView):
 
 class LogoutAPIView(APIView):
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
 
     def post(self, request):
         refresh_token = request.data.get('refresh_token')
@@ -12,7 +12,7 @@ class AccountConfig(AppConfig):
 
     @staticmethod
     def signal_imports():
-        pass
+        import apps.account.signals  # noqa
 
     def ready(self):
         self.model_imports()
@@ -0,0 +1,183 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from apps.account.models import APIKey
+
+JWT_USER_CACHE_KEY = "jwt_user:{}:{}"
+JWT_USER_VERSION_CACHE_KEY = "jwt_user_version:{}"
+
+
+def get_user_cache():
+    if not settings.JWT_USER_CACHE_ENABLED:
+        return None
+
+    # invalidations must reach every worker, which the per-process default cache does not
+    if not settings.JWT_USER_CACHE_ALIAS:
+        raise ImproperlyConfigured('JWT_USER_CACHE_ALIAS must name a cache shared by all workers.')
+
+    return caches[settings.JWT_USER_CACHE_ALIAS]
+
+
+def get_user_version_timeout():
+    # cached users expire with their access tokens, so older versions are not needed after a token lifetime
+    return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def get_user_cache_key(user_cache, user_id):
+    """
+    Returns the cache key of the given user under its current version, initialising the version if it has none.
+    """
+    version_key = JWT_USER_VERSION_CACHE_KEY.format(user_id)
+    version = user_cache.get(version_key)
+    if version is None:
+        user_cache.add(version_key, time.time_ns(), get_user_version_timeout())
+        version = user_cache.get(version_key)
+
+    return JWT_USER_CACHE_KEY.format(user_id, version)
+
+
+def invalidate_cached_user(user_id):
+    """
+    Sets a new version for the cached user of the given id, so the next request with one of its tokens loads it again.
+
+    The cached user is not deleted, as a request that loaded it before the change could store it again right after.
+    Such a request stores it under the previous version, which is not read anymore.
+    """
+    user_cache = get_user_cache()
+    if user_cache is not None and user_id is not None:
+        user_cache.set(JWT_USER_VERSION_CACHE_KEY.format(user_id), time.time_ns(), get_user_version_timeout())
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication keeping the resolved users in a shared cache, so most requests run no user query.
+
+    A user is cached until the access token it was loaded for expires, and its cache version is replaced when it is
+    saved or deleted, e.g. deactivated, or when one of its tokens is blacklisted.
+    """
+
+    def get_user(self, validated_token):
+        user_cache = get_user_cache()
+        if user_cache is None or api_settings.USER_ID_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        key = get_user_cache_key(user_cache, validated_token[api_settings.USER_ID_CLAIM])
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user, max(validated_token['exp'] - int(time.time()), 1))
+            return user
+
+        # the user is shared by all of its tokens, which may have been issued before a password change
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        return user
+
+
+class APIKeyCache:
+    """
+    In-process cache of API keys by prefix, with their user, for a limited time.
+
+    Changes are removed from the cache of the process they are made in, other processes see them after the TTL.
+    Unknown prefixes are cached for `miss_ttl` seconds, so bogus keys do not cost a query each, and at most
+    `max_misses` of them are kept.
+    """
+
+    def __init__(self, ttl, miss_ttl, max_misses=10000):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_misses = max_misses
+
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.misses = {}
+
+    def load(self, prefix):
+        return APIKey.objects.select_related('user').filter(prefix=prefix).first()
+
+    def get(self, prefix):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(prefix)
+            if entry is not None and entry[0] >= now:
+                return entry[1]
+
+            if self.misses.get(prefix, 0) >= now:
+                return None
+
+        api_key = self.load(prefix)
+        with self.lock:
+            if api_key is not None:
+                self.entries[prefix] = (now + self.ttl, api_key)
+            elif self.miss_ttl:
+                if len(self.misses) >= self.max_misses:
+                    self.misses = {key: expires for key, expires in self.misses.items() if expires >= now}
+                if len(self.misses) < self.max_misses:
+                    self.misses[prefix] = now + self.miss_ttl
+
+        return api_key
+
+    def invalidate(self, prefix=None, user_id=None):
+        with self.lock:
+            self.misses.pop(prefix, None)
+            for key, (_, api_key) in list(self.entries.items()):
+                if key == prefix or api_key.user_id == user_id:
+                    del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.misses.clear()
+
+
+api_key_cache = APIKeyCache(ttl=settings.API_KEY_CACHE_TTL, miss_ttl=settings.API_KEY_CACHE_MISS_TTL)
+
+
+class APIKeyAuthentication(BaseAuthentication):
+    """
+    Authentication with API keys, sent as "Authorization: Api-Key <key>".
+
+    The keys are looked up by their prefix in the in-process cache and checked against their hash. The API key is
+    set as request.auth, so its endpoint scopes can be checked by the HasEndpointScope permission.
+    """
+    keyword = 'Api-Key'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid API key header.')
+
+        try:
+            prefix, secret = auth[1].decode().split('.', 1)
+        except (UnicodeError, ValueError):
+            raise exceptions.AuthenticationFailed('Invalid API key.')
+
+        api_key = api_key_cache.get(prefix)
+        if api_key is None or not api_key.check_key(secret):
+            raise exceptions.AuthenticationFailed('Invalid API key.')
+
+        if not api_key.is_valid:
+            raise exceptions.AuthenticationFailed('API key expired or revoked.')
+
+        if not api_key.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return api_key.user, api_key
+
+    def authenticate_header(self, request):
+        return self.keyword
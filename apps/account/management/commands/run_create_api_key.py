@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.account.models import APIKey, User
+
+
+class Command(BaseCommand):
+    help = "Creates an API key for a user and prints it, it cannot be shown again."
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="The username of the user the key authenticates as.")
+        parser.add_argument('name', help="The name of the key, e.g. the service using it.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints', default=[],
+                            help="An endpoint name the key is limited to, can be repeated. All endpoints if omitted.")
+        parser.add_argument('--expires-in-days', type=int, help="The number of days after which the key expires.")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError("User not found: {}".format(options['username']))
+
+        expires_at = None
+        if options['expires_in_days'] is not None:
+            expires_at = timezone.now() + datetime.timedelta(days=options['expires_in_days'])
+
+        print('\n creating api key')
+
+        api_key, key = APIKey.objects.create_key(user, options['name'], options['endpoints'], expires_at)
+
+        print(' api key {} created for {}: {}'.format(api_key.prefix, user.username, key))
@@ -1,7 +1,12 @@
+import hashlib
+import hmac
+import secrets
+
 from django.contrib.auth.models import Group, AbstractUser
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.core.validators import EmailValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.tokens import RefreshToken
 
@@ -68,3 +73,65 @@ class User(TimestampMixin, AbstractUser, ActionLogMixin):
     def tokens(self):
         refresh = RefreshToken.for_user(self)
         return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+
+class APIKeyManager(models.Manager):
+    def create_key(self, user, name, endpoints=None, expires_at=None):
+        """
+        Creates an API key of the given user and returns it with its raw key, which is not stored.
+        """
+        prefix, secret = secrets.token_hex(6), secrets.token_urlsafe(32)
+
+        api_key = self.create(user=user, name=name, prefix=prefix, hashed_key=APIKey.hash_key(secret),
+                              endpoints=list(endpoints or []), expires_at=expires_at)
+
+        return api_key, '{}.{}'.format(prefix, secret)
+
+
+class APIKey(TimestampMixin, models.Model):
+    """
+    The APIKey object represents a long-lived key authenticating a user for service-to-service prediction traffic.
+
+    Attributes:
+        user: The user the key authenticates as,
+        name: The name of the key, e.g. the service using it,
+        prefix: The public first part of the key, used to look it up,
+        hashed_key: The SHA-256 hash of the secret part of the key,
+        endpoints: The names of the endpoints the key can be used for, all endpoints if there are none,
+        expires_at: The date after which the key is no longer accepted, if any,
+        revoked_at: The date the key was revoked, if it was.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    name = models.CharField(_('Name'), max_length=128)
+    prefix = models.CharField(_('Prefix'), max_length=16, unique=True, editable=False)
+    hashed_key = models.CharField(_('Hashed key'), max_length=64, editable=False)
+    endpoints = models.JSONField(_('Endpoints'), default=list, blank=True)
+    expires_at = models.DateTimeField(_('Expires at'), blank=True, null=True)
+    revoked_at = models.DateTimeField(_('Revoked at'), blank=True, null=True)
+
+    objects = APIKeyManager()
+
+    class Meta:
+        verbose_name = "API key"
+        verbose_name_plural = "API keys"
+
+    def __str__(self):
+        return '{} ({})'.format(self.name, self.prefix)
+
+    @staticmethod
+    def hash_key(secret):
+        # the keys are random, so a fast hash is enough, unlike for passwords
+        return hashlib.sha256(secret.encode()).hexdigest()
+
+    def check_key(self, secret):
+        return hmac.compare_digest(self.hashed_key, self.hash_key(secret))
+
+    @property
+    def is_valid(self):
+        return self.revoked_at is None and (self.expires_at is None or self.expires_at > timezone.now())
+
+    def revoke(self, save=True):
+        self.revoked_at = timezone.now()
+
+        if save:
+            self.save()
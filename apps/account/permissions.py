@@ -0,0 +1,16 @@
+from rest_framework.permissions import BasePermission
+
+from apps.account.models import APIKey
+
+
+class HasEndpointScope(BasePermission):
+    """
+    Allows requests authenticated with an API key only for the endpoints the key is scoped to, if any.
+    """
+    message = 'The API key is not allowed for this endpoint.'
+
+    def has_permission(self, request, view):
+        if not isinstance(request.auth, APIKey) or not request.auth.endpoints:
+            return True
+
+        return view.kwargs.get('endpoint_name') in request.auth.endpoints
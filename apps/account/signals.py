@@ -0,0 +1,27 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from apps.account.authentication import api_key_cache, invalidate_cached_user
+from apps.account.models import APIKey, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_jwt_user(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+    transaction.on_commit(lambda: api_key_cache.invalidate(user_id=instance.pk))
+
+
+@receiver(post_save, sender=APIKey)
+@receiver(post_delete, sender=APIKey)
+def invalidate_cached_api_key(sender, instance, **kwargs):
+    transaction.on_commit(lambda: api_key_cache.invalidate(prefix=instance.prefix))
+
+
+# covers the logout view and the token blacklist view, which both blacklist the refresh token of the user
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklisted_jwt_user(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: invalidate_cached_user(instance.token.user_id))
@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.account.authentication import get_user_cache, get_user_cache_key, invalidate_cached_user
+from apps.account.models import User
+from apps.log.models import ActionLog
+
+
+class JWTUserCacheTests(TestCase):
+    def setUp(self):
+        settings = self.settings(JWT_USER_CACHE_ENABLED=True, JWT_USER_CACHE_ALIAS='default')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+
+        self.user = User.objects.create_user(username='piotr', email='piotr@example.com', password='secret-password')
+        self.tokens = self.user.tokens
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.tokens['access']))
+
+    def get_user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/endpoint/')
+        self.assertEqual(200, response.status_code)
+
+        return [query['sql'] for query in queries.captured_queries if 'FROM "account_user"' in query['sql']]
+
+    def test_cached_user(self):
+        self.assertEqual(1, len(self.get_user_queries()))
+        self.assertEqual([], self.get_user_queries())
+
+        # a deactivated user is loaded again, and rejected
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.deactivate()
+        self.assertEqual(401, self.client.get('/api/v1/endpoint/').status_code)
+        self.assertTrue(ActionLog.objects.filter(model_name='user', action_tag='deactivate').exists())
+
+    def test_blacklisted_token(self):
+        self.get_user_queries()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/token/blacklist/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(200, response.status_code)
+
+        self.assertEqual(1, len(self.get_user_queries()))
+        self.assertEqual([], self.get_user_queries())
+
+    def test_cache_key(self):
+        # a user stored by a request that read it before the invalidation is not read anymore
+        key = get_user_cache_key(cache, self.user.id)
+        invalidate_cached_user(self.user.id)
+        self.assertNotEqual(key, get_user_cache_key(cache, self.user.id))
+
+    def test_cache_alias(self):
+        with self.settings(JWT_USER_CACHE_ALIAS=None):
+            self.assertRaises(ImproperlyConfigured, get_user_cache)
+
+        with self.settings(JWT_USER_CACHE_ENABLED=False, JWT_USER_CACHE_ALIAS=None):
+            self.assertIsNone(get_user_cache())
@@ -0,0 +1,85 @@
+import math
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+# non-str keys, e.g. the algorithm ids of the ready view, are written as strings like the standard library does
+ORJSON_OPTIONS = (
+    orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+) if orjson is not None else None
+
+
+def encode_default(obj):
+    """
+    Returns a serializable value for the types the fast encoders do not handle, as the DRF JSON encoder does.
+    """
+    return encoders.JSONEncoder().default(obj)
+
+
+def has_non_finite_floats(data):
+    """
+    Returns whether the given data holds a NaN or infinite float, which orjson would write as null.
+    """
+    if isinstance(data, (float, np.floating)):
+        return not math.isfinite(data)
+    if isinstance(data, np.ndarray):
+        return data.dtype.kind == 'f' and not np.isfinite(data).all()
+    if isinstance(data, dict):
+        return any(has_non_finite_floats(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite_floats(value) for value in data)
+
+    return False
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """
+    JSON renderer using orjson when it is installed, which also encodes NumPy scalars and arrays natively.
+
+    Datetimes and other types orjson does not handle are encoded as by the DRF renderer, so the output is the same.
+    As with the DRF renderer in strict mode, NaN and infinite floats are rejected rather than written as null.
+    Indented responses and installs without orjson use the DRF renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        # the data is only scanned when it may hold a float orjson wrote as null
+        if self.strict and b'null' in ret and has_non_finite_floats(data):
+            raise ValueError("Out of range float values are not JSON compliant")
+
+        # escape the line and paragraph separators as the DRF renderer does, as they are invalid in javascript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    MessagePack renderer for machine clients, requires the msgpack package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=encode_default)
@@ -0,0 +1,68 @@
+import datetime
+import io
+from unittest import skipIf
+
+import numpy as np
+from django.test import TestCase
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+
+from apps.api.parsers import JSONParser, MessagePackParser, msgpack
+from apps.api.renderers import JSONRenderer, MessagePackRenderer
+
+
+class APITests(TestCase):
+    data = {
+        'probability': np.float64(0.4),
+        'count': np.int64(3),
+        'flags': np.array([True, False]),
+        'algorithms': {1: True, 2: False},
+        'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'label': 'café  ',
+    }
+
+    def test_json_renderer(self):
+        content = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.JSONRenderer().render(self.data), content)
+        self.assertIn(b'"algorithms":{"1":true,"2":false}', content)
+        self.assertIn(b'"created_at":"2024-01-02T03:04:05.123456Z"', content)
+
+        indented = 'application/json; indent=2'
+        self.assertEqual(
+            renderers.JSONRenderer().render(self.data, indented), JSONRenderer().render(self.data, indented)
+        )
+        self.assertEqual(b'', JSONRenderer().render(None))
+
+    def test_json_renderer_non_finite(self):
+        # NaN and infinite floats are rejected as by the DRF renderer instead of being written as null
+        for data in ({'probability': float('nan')}, [np.float32('inf')], {'scores': np.array([0.5, np.nan])}):
+            self.assertRaises(ValueError, renderers.JSONRenderer().render, data)
+            self.assertRaises(ValueError, JSONRenderer().render, data)
+
+        self.assertEqual(b'{"probability":null}', JSONRenderer().render({'probability': None}))
+
+    def test_json_parser(self):
+        content = JSONRenderer().render(self.data)
+        parsed = JSONParser().parse(io.BytesIO(content))
+        self.assertEqual(0.4, parsed['probability'])
+        self.assertEqual({'1': True, '2': False}, parsed['algorithms'])
+
+        with self.assertRaises(ParseError):
+            JSONParser().parse(io.BytesIO(b'{"age": '))
+
+    def test_ready_view(self):
+        response = self.client.get('/api/v1/ready/')
+        self.assertIn(response.status_code, (200, 503))
+        self.assertIn('algorithms', response.json())
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        content = MessagePackRenderer().render(self.data)
+        parsed = MessagePackParser().parse(io.BytesIO(content))
+        self.assertEqual(0.4, parsed['probability'])
+        self.assertEqual([True, False], parsed['flags'])
+        self.assertEqual({1: True, 2: False}, parsed['algorithms'])
+        self.assertEqual('2024-01-02T03:04:05.123456Z', parsed['created_at'])
+
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
@@ -0,0 +1,106 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.core.management import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+
+from apps.utils.helpers.string import compile_any
+from apps.utils.middleware.authrequired import AuthRequiredMiddleware
+
+# the middleware before the API fast path, to compare the current MIDDLEWARE setting with
+BASELINE_MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+# csrf exempt like the API views
+@csrf_exempt
+def empty_view(request, *args, **kwargs):
+    return HttpResponse()
+
+
+# the requests are routed to an empty view, so only the middleware and the URL resolution are measured
+urlpatterns = [
+    path('<path:path>', empty_view),
+]
+
+
+def get_handler(middleware):
+    with override_settings(MIDDLEWARE=middleware):
+        handler = BaseHandler()
+        handler.load_middleware()
+
+    return handler
+
+
+def get_request_time(handler, make_request, requests):
+    """
+    Returns the mean time in microseconds of the given handler over the given number of requests.
+    """
+    elapsed = 0
+    for _ in range(requests):
+        request = make_request()
+        request.urlconf = __name__
+
+        start = time.perf_counter()
+        handler.get_response(request)
+        elapsed += time.perf_counter() - start
+
+    return elapsed / requests * 10 ** 6
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request overhead of the middleware, before and after the API fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help="The number of requests to time.")
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        factory = RequestFactory()
+
+        cases = {
+            'api request with token': lambda: factory.post(
+                '/api/v1/predict/income_classifier/', HTTP_AUTHORIZATION='JWT token'
+            ),
+            'browser request': lambda: factory.get('/admin/'),
+        }
+
+        print('\n benchmarking middleware, mean time per request over {} requests'.format(requests))
+
+        bare_handler = get_handler([])
+        for name, make_request in cases.items():
+            # the request factory host is not a configured host
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                bare = get_request_time(bare_handler, make_request, requests)
+                before = get_request_time(get_handler(BASELINE_MIDDLEWARE), make_request, requests) - bare
+                after = get_request_time(get_handler(settings.MIDDLEWARE), make_request, requests) - bare
+
+            print(' {}: middleware overhead before {:.1f}us, after {:.1f}us'.format(name, before, after))
+
+        paths = [make_request().path for make_request in cases.values()]
+        patterns = AuthRequiredMiddleware.allowed_patterns
+        allowed_re = compile_any(patterns)
+
+        start = time.perf_counter()
+        for i in range(requests):
+            any(re.compile(pattern).match(paths[i % 2]) for pattern in patterns)
+        before = (time.perf_counter() - start) / requests * 10 ** 6
+
+        start = time.perf_counter()
+        for i in range(requests):
+            allowed_re.match(paths[i % 2])
+        after = (time.perf_counter() - start) / requests * 10 ** 6
+
+        print(' allow-list match: before {:.2f}us, after {:.2f}us'.format(before, after))
@@ -1,18 +1,29 @@
 from django.urls import path
 
-from apps.endpoints.api_views import MLAlgorithmAPIView, MLAlgorithmStatusAPIView, MLAlgorithmRequestAPIView, \
-    PredictAPIView, StartABTestAPIView, StopABTestAPIView, EndpointAPIView
+from apps.endpoints.api_views import ABTestStatsAPIView, BatchScoringJobAPIView, MLAlgorithmAPIView, \
+    MLAlgorithmStatusAPIView, MLAlgorithmRequestAPIView, MLAlgorithmRequestFeedbackAPIView, PredictAPIView, \
+    PredictBatchAPIView, PredictFileAPIView, PredictJobAPIView, PredictionCacheAPIView, ReadyAPIView, \
+    StartABTestAPIView, StopABTestAPIView, EndpointAPIView
 
 app_name = "endpoints"
 
 urlpatterns = [
 
+    path('batch-scoring-job/', BatchScoringJobAPIView.as_view(), name='batch_scoring_job'),
     path('endpoint/', EndpointAPIView.as_view(), name='endpoint'),
     path('ml-algorithm/', MLAlgorithmAPIView.as_view(), name='ml_algorithm'),
     path('ml-algorithm-request/', MLAlgorithmRequestAPIView.as_view(), name='ml_algorithm_request'),
+    path('ml-algorithm-request/feedback/', MLAlgorithmRequestFeedbackAPIView.as_view(),
+         name='ml_algorithm_request_feedback'),
     path('ml-algorithm-status/', MLAlgorithmStatusAPIView.as_view(), name='ml_algorithm_status'),
     path('predict/<str:endpoint_name>/', PredictAPIView.as_view(), name='predict'),
+    path('predict/<str:endpoint_name>/batch/', PredictBatchAPIView.as_view(), name='predict_batch'),
+    path('predict/<str:endpoint_name>/file/', PredictFileAPIView.as_view(), name='predict_file'),
+    path('predict/<str:endpoint_name>/job/', PredictJobAPIView.as_view(), name='predict_job'),
+    path('prediction-cache/', PredictionCacheAPIView.as_view(), name='prediction_cache'),
+    path('ready/', ReadyAPIView.as_view(), name='ready'),
     path('start_ab/', StartABTestAPIView.as_view(), name='start_ab'),
+    path('stats_ab/<int:ab_test_id>/', ABTestStatsAPIView.as_view(), name='stats_ab'),
     path('stop_ab/<int:ab_test_id>/', StopABTestAPIView.as_view(), name='stop_ab'),
 
 ]
@@ -1,21 +1,45 @@
 import datetime
 import json
+import posixpath
 
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.db.models import F, Q
-from numpy.random import rand
+from django.db.models import OuterRef, Q, Subquery
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from rest_framework import views, status
-from rest_framework.exceptions import APIException
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
 from rest_framework.generics import ListAPIView
-from apps.endpoints.models import ABTest, Endpoint, MLAlgorithm, MLAlgorithmStatus, MLAlgorithmRequest
-from apps.endpoints.serializers import ABTestSerializer, EndpointSerializer, MLAlgorithmSerializer, \
-    MLAlgorithmRequestSerializer, MLAlgorithmStatusSerializer
+from apps.account.authentication import APIKeyAuthentication, CachedJWTAuthentication
+from apps.account.permissions import HasEndpointScope
+from apps.api.parsers import JSONParser
+from apps.endpoints.buffers import get_ml_request_id, save_ml_requests
+from apps.endpoints.counters import create_ab_test_counters, get_ab_test_counters
+from apps.endpoints.feedback import apply_feedback
+from apps.endpoints.models import ABTest, BatchScoringJob, Endpoint, MLAlgorithm, MLAlgorithmStatus, \
+    MLAlgorithmRequest
+from apps.endpoints.pagination import KeysetPagination
+from apps.endpoints.serializers import ABTestSerializer, BatchScoringJobSerializer, EndpointSerializer, \
+    MLAlgorithmSerializer, MLAlgorithmRequestSerializer, MLAlgorithmStatusSerializer
+from apps.endpoints.stats import get_ab_test_stats, get_ratio
+from apps.endpoints.streaming import RECORD_READERS, get_file_format, iter_chunks, iter_lines
+from apps.endpoints.tasks import task_run_batch_scoring_job
+from apps.endpoints.versions import get_etag, get_table_versions, get_version_cache
+from apps.ml.batching import get_micro_batcher
+from apps.ml.cache import prediction_cache
 from apps.ml.registration import registry
+from apps.ml.registry import bump_routes_version
+from apps.utils.helpers.django import get_upload_prefix
 
 
 def deactivate_other_statuses(instance):
@@ -29,37 +53,227 @@ def deactivate_other_statuses(instance):
         old_statuses[i].active = False
 
     MLAlgorithmStatus.objects.bulk_update(old_statuses, ['active'])
+    transaction.on_commit(bump_routes_version)
+
+
+def get_job_input_file(input_file):
+    """
+    Returns the given storage path if it is a file under the batch scoring job uploads, otherwise None.
+    """
+    prefix = get_upload_prefix(BatchScoringJob) + '/'
+    if not isinstance(input_file, str) or posixpath.normpath(input_file) != input_file:
+        return None
+    if not input_file.startswith(prefix) or not default_storage.exists(input_file):
+        return None
+
+    return input_file
 
 
 class BaseListAPIView(ListAPIView):
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    pagination_class = KeysetPagination
     queryset = None
+    # the query parameters accepted as filters, by field with their lookups, only on columns backed by an index so
+    # that no filter scans the table, any other parameter is rejected
+    filter_fields = {'id': ('exact', 'in')}
+    # heavy columns that are only loaded and returned when they are requested with the fields parameter
+    deferred_fields = ()
+    fields_query_param = 'fields'
+
+    def get_filter_kwargs(self):
+        reserved_params = (self.pagination_class.cursor_query_param, self.pagination_class.page_size_query_param,
+                           self.fields_query_param, api_settings.URL_FORMAT_OVERRIDE)
+
+        filter_kwargs = {}
+        for param, value in self.request.query_params.items():
+            if param in reserved_params:
+                continue
+
+            field, _, lookup = param.partition('__')
+            if (lookup or 'exact') not in self.filter_fields.get(field, ()):
+                raise ParseError("Unsupported filter '{}', the supported filters are: {}.".format(
+                    param, ', '.join(self.get_filter_params())
+                ))
+
+            filter_kwargs[param] = value.split(',') if lookup == 'in' else value
+
+        return filter_kwargs
+
+    def get_filter_params(self):
+        return [
+            field if lookup == 'exact' else '{}__{}'.format(field, lookup)
+            for field, lookups in self.filter_fields.items() for lookup in lookups
+        ]
+
+    def get_response_fields(self):
+        """
+        Returns the fields to return, the comma separated fields parameter or else all fields but the deferred ones.
+        """
+        fields = self.get_serializer_class().Meta.fields
+
+        requested_fields = self.request.query_params.get(self.fields_query_param)
+        if not requested_fields:
+            return [field for field in fields if field not in self.deferred_fields]
+
+        requested_fields = {field.strip() for field in requested_fields.split(',')} - {''}
+        if requested_fields - set(fields):
+            raise ParseError("Unknown fields: {}, the available fields are: {}.".format(
+                ', '.join(sorted(requested_fields - set(fields))), ', '.join(fields)
+            ))
+
+        return [field for field in fields if field in requested_fields]
 
     def get_queryset(self):
-        query_params = self.request.query_params
-        filter_kwargs = {param: value for param, value in query_params.items()}
-        return self.queryset.filter(**filter_kwargs)
+        try:
+            queryset = self.queryset.filter(**self.get_filter_kwargs())
+        except (ValueError, DjangoValidationError) as e:
+            raise ParseError('Invalid filter value: {}'.format(e))
+
+        fields = self.get_response_fields()
+        deferred_fields = [field for field in self.deferred_fields if field not in fields]
+        return queryset.defer(*deferred_fields) if deferred_fields else queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.get_response_fields())
+        return super().get_serializer(*args, **kwargs)
+
+
+class VersionedListAPIView(BaseListAPIView):
+    """
+    List view answering conditional GETs from the change versions of the tables behind it.
+
+    The ETag covers the versions of the `versioned_models` tables and the request URL and format, so a client
+    holding the current version gets a 304 without the list being queried. Rendered bodies can also be kept in the
+    shared cache under their ETag, which a new table version makes unreachable. Without a shared cache for the
+    versions, and for the browsable API, rendered per user, the list is served as usual.
+    """
+    versioned_models = ()
+    etag = None
+    last_modified = None
+
+    @property
+    def shared_cache(self):
+        return get_version_cache() if settings.ML_LIST_CACHE_ENABLED else None
+
+    def get_body_cache_key(self):
+        return 'list_body:{}'.format(self.etag)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'api' or get_version_cache() is None:
+            return super().list(request, *args, **kwargs)
+
+        versions = get_table_versions(self.versioned_models)
+        self.etag = get_etag(versions, request.build_absolute_uri(), request.accepted_renderer.media_type)
+        self.last_modified = max(versions) // 10 ** 9
+
+        # If-Modified-Since is not checked, its one second resolution would miss the changes made within a second
+        response = get_conditional_response(request, etag=self.etag)
+        if response is not None:
+            return response
+
+        if self.shared_cache is not None:
+            cached_body = self.shared_cache.get(self.get_body_cache_key())
+            if cached_body is not None:
+                content, content_type = cached_body
+                return HttpResponse(content, content_type=content_type)
+
+        return super().list(request, *args, **kwargs)
+
+    def cache_body(self, response):
+        self.shared_cache.set(
+            self.get_body_cache_key(), (response.content, response['Content-Type']), settings.ML_LIST_CACHE_TTL
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+
+        if self.etag is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified)
+            # the lists require authentication, so only the client may keep them, and revalidates them every time
+            response['Cache-Control'] = 'private, no-cache'
+
+            if isinstance(response, Response) and response.status_code == 200 and self.shared_cache is not None:
+                response.add_post_render_callback(self.cache_body)
 
+        return response
 
-class EndpointAPIView(BaseListAPIView):
+
+class EndpointAPIView(VersionedListAPIView):
     queryset = Endpoint.objects.all()
     serializer_class = EndpointSerializer
+    versioned_models = (Endpoint,)
+    filter_fields = {'id': ('exact', 'in'), 'name': ('exact',)}
 
 
-class MLAlgorithmAPIView(BaseListAPIView):
+class MLAlgorithmAPIView(VersionedListAPIView):
     queryset = MLAlgorithm.objects.all()
     serializer_class = MLAlgorithmSerializer
+    filter_fields = {'id': ('exact', 'in'), 'parent_endpoint': ('exact', 'in'), 'content_hash': ('exact',)}
+    deferred_fields = ('code',)
+    versioned_models = (MLAlgorithm, MLAlgorithmStatus)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+
+        if 'current_status' in self.get_response_fields():
+            latest_status = MLAlgorithmStatus.objects.filter(
+                parent_mlalgorithm=OuterRef('pk')
+            ).order_by('-created_at', '-id').values('status')[:1]
+            queryset = queryset.annotate(current_status=Subquery(latest_status))
+
+        return queryset
 
 
 class MLAlgorithmRequestAPIView(BaseListAPIView):
-    queryset = MLAlgorithmRequest.objects.all()
+    queryset = MLAlgorithmRequest.objects.select_related('request_input', 'response_label')
     serializer_class = MLAlgorithmRequestSerializer
+    filter_fields = {
+        'id': ('exact', 'in'),
+        'uuid': ('exact', 'in'),
+        'parent_mlalgorithm': ('exact', 'in'),
+        'response_label': ('exact', 'in'),
+        'created_at': ('gt', 'gte', 'lt', 'lte'),
+    }
+
 
+class MLAlgorithmRequestFeedbackAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (CachedJWTAuthentication,)
+    parser_classes = (JSONParser, MultiPartParser)
 
-class MLAlgorithmStatusAPIView(BaseListAPIView):
+    def post(self, request, format=None):
+        # feedback is a JSON list of {'request_id', 'feedback'} items, or a CSV or JSONL file with the same columns
+        if request.content_type.startswith('application/json'):
+            items = request.data
+            if not isinstance(items, list):
+                return Response(
+                    {'status': 'Error', 'message': 'Expected a list of request_id and feedback items.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+        else:
+            file = request.FILES.get('file') if request.content_type.startswith('multipart/form-data') else None
+            file_format = get_file_format(
+                request.query_params.get('file_format'), file.name if file else None, request.content_type
+            )
+            if file_format is None:
+                return Response(
+                    {'status': 'Error', 'message': 'Expected a JSON list, or a CSV or JSONL file.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            binary_lines = file if file is not None else request.stream or []
+            items = (record for _, record in RECORD_READERS[file_format](iter_lines(binary_lines)))
+
+        return Response(apply_feedback(items, settings.ML_FEEDBACK_CHUNK_SIZE))
+
+
+class MLAlgorithmStatusAPIView(VersionedListAPIView):
     queryset = MLAlgorithmStatus.objects.all()
     serializer_class = MLAlgorithmStatusSerializer
+    versioned_models = (MLAlgorithmStatus,)
+    filter_fields = {'id': ('exact', 'in'), 'parent_mlalgorithm': ('exact', 'in'), 'status': ('exact',)}
 
     def post(self, request, format=None):
         serializer = self.serializer_class(data=request.data)
@@ -75,59 +289,266 @@ class MLAlgorithmStatusAPIView(BaseListAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class PredictAPIView(views.APIView):
-    permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+class BatchScoringJobAPIView(BaseListAPIView):
+    queryset = BatchScoringJob.objects.all()
+    serializer_class = BatchScoringJobSerializer
+    filter_fields = {
+        'id': ('exact', 'in'),
+        'uuid': ('exact', 'in'),
+        'parent_mlalgorithm': ('exact', 'in'),
+        'status': ('exact',),
+    }
 
-    def post(self, request, endpoint_name, format=None):
+
+class BasePredictAPIView(views.APIView):
+    permission_classes = (IsAuthenticated, HasEndpointScope)
+    authentication_classes = (CachedJWTAuthentication, APIKeyAuthentication)
+    split = None
+
+    def get_algorithms(self, request, endpoint_name):
         algorithm_status = request.query_params.get('status', 'production')
         algorithm_version = request.query_params.get('version')
 
-        algs = MLAlgorithm.objects.filter(
-            parent_endpoint__name=endpoint_name,
-            ml_algorithm_status__status=algorithm_status,
-            ml_algorithm_status__active=True
-        )
-
-        if algorithm_version is not None:
-            algs = algs.filter(version=algorithm_version)
+        route = registry.get_route(endpoint_name, algorithm_status, algorithm_version)
+        algs, self.split = route.algorithms, route.split
 
         if len(algs) == 0:
-            return Response(
+            return algorithm_status, algs, Response(
                 {'status': 'Error', 'message': 'ML algorithm is not available'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
         if len(algs) != 1 and algorithm_status != "ab_testing":
-            return Response(
+            return algorithm_status, algs, Response(
                 {'status': 'Error',
                  'message': 'ML algorithm selection is ambiguous. Please specify algorithm version.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        alg_index = 0
-        if algorithm_status == "ab_testing":
-            alg_index = 0 if rand() < 0.5 else 1
 
-        algorithm_object = registry.endpoints[algs[alg_index].id]
-        prediction = algorithm_object.compute_prediction(request.data)
+        return algorithm_status, algs, None
+
+    def get_alg_indices(self, algorithm_status, count):
+        if algorithm_status != "ab_testing":
+            return np.zeros(count, dtype=int)
+
+        # callers can pass a key, e.g. a user id, to be routed to the same algorithm on every request
+        key = self.request.query_params.get('ab_key') or self.request.headers.get('X-AB-Key')
+        return self.split.choose_many(count, key)
+
+    def compute_predictions(self, algorithm_status, algs, records):
+        alg_indices = self.get_alg_indices(algorithm_status, len(records))
+
+        predictions = [None] * len(records)
+        for alg_index in np.unique(alg_indices):
+            record_indices = np.flatnonzero(alg_indices == alg_index)
+            algorithm_object = algs[alg_index][1]
+            alg_predictions = algorithm_object.compute_predictions([records[i] for i in record_indices])
+
+            for i, prediction in zip(record_indices, alg_predictions):
+                predictions[i] = prediction
+
+        ml_requests = []
+        for record, prediction, alg_index in zip(records, predictions, alg_indices):
+            label = prediction['label'] if "label" in prediction else "error"
+            ml_requests.append(MLAlgorithmRequest(
+                input_data=record,
+                full_response=prediction,
+                response=label,
+                feedback='',
+                parent_mlalgorithm_id=algs[alg_index][0],
+            ))
+        save_ml_requests(ml_requests)
+
+        for prediction, ml_request in zip(predictions, ml_requests):
+            prediction['request_id'] = get_ml_request_id(ml_request)
+
+        return predictions
+
+
+class PredictAPIView(BasePredictAPIView):
+
+    def post(self, request, endpoint_name, format=None):
+        algorithm_status, algs, error_response = self.get_algorithms(request, endpoint_name)
+        if error_response is not None:
+            return error_response
+
+        alg_index = int(self.get_alg_indices(algorithm_status, 1)[0])
+        algorithm_id, algorithm_object = algs[alg_index]
+        if settings.ML_MICRO_BATCH_ENABLED:
+            algorithm_object = get_micro_batcher(algorithm_id, algorithm_object)
+
+        if settings.ML_PREDICTION_CACHE_ENABLED:
+            prediction = prediction_cache.compute_prediction(
+                algorithm_id, algorithm_object, registry.content_hashes.get(algorithm_id), request.data
+            )
+        else:
+            prediction = algorithm_object.compute_prediction(request.data)
 
         label = prediction['label'] if "label" in prediction else "error"
         ml_request = MLAlgorithmRequest(
-            input_data=json.dumps(request.data),
+            input_data=request.data,
             full_response=prediction,
             response=label,
             feedback='',
-            parent_mlalgorithm=algs[alg_index],
+            parent_mlalgorithm_id=algorithm_id,
         )
-        ml_request.save()
+        save_ml_requests([ml_request])
 
-        prediction['request_id'] = ml_request.id
+        prediction['request_id'] = get_ml_request_id(ml_request)
 
         return Response(prediction)
 
 
+class PredictBatchAPIView(BasePredictAPIView):
+
+    def post(self, request, endpoint_name, format=None):
+        records = request.data
+        if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+            return Response(
+                {'status': 'Error', 'message': 'Expected a non-empty list of records.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(records) > settings.ML_PREDICT_BATCH_MAX_SIZE:
+            return Response(
+                {'status': 'Error',
+                 'message': 'Batch size exceeds the maximum of {}.'.format(settings.ML_PREDICT_BATCH_MAX_SIZE)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        algorithm_status, algs, error_response = self.get_algorithms(request, endpoint_name)
+        if error_response is not None:
+            return error_response
+
+        return Response(self.compute_predictions(algorithm_status, algs, records))
+
+
+class PredictFileAPIView(BasePredictAPIView):
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request, endpoint_name, format=None):
+        # multipart uploads are spooled to a temporary file, other bodies are read straight from the request
+        if request.content_type.startswith('multipart/form-data'):
+            file = request.FILES.get('file')
+            if file is None:
+                return Response(
+                    {'status': 'Error', 'message': 'Expected a file upload in the file field.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            file_name, binary_lines = file.name, file
+        else:
+            file_name, binary_lines = None, request.stream or []
+
+        file_format = get_file_format(request.query_params.get('file_format'), file_name, request.content_type)
+        if file_format is None:
+            return Response(
+                {'status': 'Error', 'message': 'Expected a CSV or JSONL file.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        algorithm_status, algs, error_response = self.get_algorithms(request, endpoint_name)
+        if error_response is not None:
+            return error_response
+
+        records = RECORD_READERS[file_format](iter_lines(binary_lines))
+        return StreamingHttpResponse(
+            self.stream_predictions(algorithm_status, algs, records),
+            content_type='application/x-ndjson',
+        )
+
+    def stream_predictions(self, algorithm_status, algs, records):
+        for chunk in iter_chunks(records, settings.ML_PREDICT_FILE_CHUNK_SIZE):
+            valid_rows = [(row, record) for row, record in chunk if isinstance(record, dict)]
+
+            try:
+                predictions = self.compute_predictions(algorithm_status, algs, [record for _, record in valid_rows])
+                results = dict(zip([row for row, _ in valid_rows], predictions))
+            except Exception as e:
+                results = {row: {'status': 'Error', 'message': str(e)} for row, _ in valid_rows}
+
+            lines = []
+            for row, record in chunk:
+                result = results.get(row) or {'status': 'Error', 'message': str(record)}
+                lines.append(json.dumps({'row': row, **result}) + '\n')
+
+            yield ''.join(lines)
+
+
+class PredictJobAPIView(BasePredictAPIView):
+    parser_classes = (MultiPartParser, JSONParser)
+
+    def post(self, request, endpoint_name, format=None):
+        # the input is either uploaded, or the path of a file already stored under the job uploads, e.g. a nightly
+        # export, so that no other file of the storage can be read through a job
+        file = request.FILES.get('file')
+        input_file = get_job_input_file(request.data.get('input_file'))
+        if file is None and input_file is None:
+            return Response(
+                {'status': 'Error',
+                 'message': 'Expected a file upload in the file field or the input_file path of a file stored under '
+                            '{}/.'.format(get_upload_prefix(BatchScoringJob))},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        file_format = get_file_format(request.query_params.get('file_format'), file.name if file else input_file)
+        if file_format is None:
+            return Response(
+                {'status': 'Error', 'message': 'Expected a CSV or JSONL file.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        algorithm_status, algs, error_response = self.get_algorithms(request, endpoint_name)
+        if error_response is not None:
+            return error_response
+        if len(algs) != 1:
+            return Response(
+                {'status': 'Error',
+                 'message': 'Batch scoring jobs need a single ML algorithm. Please specify algorithm status.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        job = BatchScoringJob(
+            parent_mlalgorithm_id=algs[0][0],
+            file_format=file_format,
+            created_by=request.user.username,
+        )
+        if file is not None:
+            job.input_file = file
+        else:
+            job.input_file.name = input_file
+        job.save()
+
+        transaction.on_commit(lambda: task_run_batch_scoring_job.apply_async((job.id,), queue='queue_long'))
+
+        return Response(BatchScoringJobSerializer(job).data, status=status.HTTP_201_CREATED)
+
+
+class PredictionCacheAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (CachedJWTAuthentication,)
+
+    def get(self, request, format=None):
+        return Response(prediction_cache.get_stats())
+
+
+class ReadyAPIView(APIView):
+    permission_classes = (AllowAny,)
+    authentication_classes = ()
+
+    def get(self, request, format=None):
+        algorithms = {
+            algorithm_id: getattr(algorithm_object, 'loaded', True)
+            for algorithm_id, algorithm_object in registry.endpoints.items()
+        }
+        ready = all(algorithms.values())
+
+        return Response(
+            {'ready': ready, 'algorithms': algorithms},
+            status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
 class StartABTestAPIView(APIView):
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
     serializer_class = ABTestSerializer
 
     def post(self, request, format=None):
@@ -137,23 +558,17 @@ class StartABTestAPIView(APIView):
                 with transaction.atomic():
                     instance = serializer.save()
 
-                    # update status for first algorithm
-                    status_1 = MLAlgorithmStatus(
-                        status='ab_testing',
-                        created_by=instance.created_by,
-                        parent_mlalgorithm=instance.parent_mlalgorithm_1,
-                        active=True)
-                    status_1.save()
-                    deactivate_other_statuses(status_1)
-
-                    # update status for second algorithm
-                    status_2 = MLAlgorithmStatus(
-                        status='ab_testing',
-                        created_by=instance.created_by,
-                        parent_mlalgorithm=instance.parent_mlalgorithm_2,
-                        active=True)
-                    status_2.save()
-                    deactivate_other_statuses(status_2)
+                    # update status for all algorithms
+                    for arm in instance.ab_test_arm.order_by('id'):
+                        arm_status = MLAlgorithmStatus(
+                            status='ab_testing',
+                            created_by=instance.created_by,
+                            parent_mlalgorithm_id=arm.parent_mlalgorithm_id,
+                            active=True)
+                        arm_status.save()
+                        deactivate_other_statuses(arm_status)
+
+                    create_ab_test_counters(instance)
 
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -163,9 +578,34 @@ class StartABTestAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ABTestStatsAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (CachedJWTAuthentication,)
+
+    def get(self, request, ab_test_id, format=None):
+        ab_test = ABTest.objects.filter(pk=ab_test_id).first()
+        if ab_test is None:
+            return Response(
+                {'status': 'Error', 'message': 'AB Test not found.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            confidence = float(request.query_params.get('confidence', settings.ML_AB_TEST_CONFIDENCE))
+            if not 0 < confidence < 1:
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'status': 'Error', 'message': 'Confidence must be between 0 and 1.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(get_ab_test_stats(ab_test, confidence))
+
+
 class StopABTestAPIView(APIView):
     permission_classes = (IsAuthenticated,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
 
     def post(self, request, ab_test_id, format=None):
         try:
@@ -176,66 +616,31 @@ class StopABTestAPIView(APIView):
 
             date_now = datetime.datetime.now()
 
-            # alg #1 accuracy
-            all_responses_1 = MLAlgorithmRequest.objects.filter(
-                parent_mlalgorithm=ab_test.parent_mlalgorithm_1,
-                created_at__gt=ab_test.created_at,
-                created_at__lt=date_now
-            ).count()
-
-            correct_responses_1 = MLAlgorithmRequest.objects.filter(
-                parent_mlalgorithm=ab_test.parent_mlalgorithm_1,
-                created_at__gt=ab_test.created_at,
-                created_at__lt=date_now,
-                response=F('feedback')
-            ).count()
-
-            accuracy_1 = correct_responses_1 / float(all_responses_1)
-            print(all_responses_1, correct_responses_1, accuracy_1)
-
-            # alg #2 accuracy
-            all_responses_2 = MLAlgorithmRequest.objects.filter(
-                parent_mlalgorithm=ab_test.parent_mlalgorithm_2,
-                created_at__gt=ab_test.created_at,
-                created_at__lt=date_now
-            ).count()
-
-            correct_responses_2 = MLAlgorithmRequest.objects.filter(
-                parent_mlalgorithm=ab_test.parent_mlalgorithm_2,
-                created_at__gt=ab_test.created_at,
-                created_at__lt=date_now,
-                response=F('feedback')
-            ).count()
-
-            accuracy_2 = correct_responses_2 / float(all_responses_2)
-            print(all_responses_2, correct_responses_2, accuracy_2)
-
-            # select algorithm with higher accuracy
-            alg_id_1, alg_id_2 = ab_test.parent_mlalgorithm_1, ab_test.parent_mlalgorithm_2
-            if accuracy_1 < accuracy_2:
-                alg_id_1, alg_id_2 = alg_id_2, alg_id_1
-
-            # update status for first algorithm
-            status_1 = MLAlgorithmStatus(
-                status='production',
-                created_by=ab_test.created_by,
-                parent_mlalgorithm=alg_id_1,
-                active=True
-            )
-            status_1.save()
-            deactivate_other_statuses(status_1)
-
-            # update status for second algorithm
-            status_2 = MLAlgorithmStatus(
-                status='testing',
-                created_by=ab_test.created_by,
-                parent_mlalgorithm=alg_id_2,
-                active=True
+            # responses are counted incrementally while the test runs
+            counters = get_ab_test_counters(ab_test)
+
+            # accuracy of all algorithms, the share of correct responses among all their responses
+            accuracies = []
+            for algorithm_id, counter in counters.items():
+                accuracies.append((algorithm_id, get_ratio(counter.correct, counter.total) or 0.0))
+
+            # select algorithm with higher accuracy, the first one on ties
+            best_algorithm_id = max(accuracies, key=lambda item: item[1])[0]
+
+            # update status for all algorithms
+            for algorithm_id, _ in accuracies:
+                algorithm_status = MLAlgorithmStatus(
+                    status='production' if algorithm_id == best_algorithm_id else 'testing',
+                    created_by=ab_test.created_by,
+                    parent_mlalgorithm_id=algorithm_id,
+                    active=True
+                )
+                algorithm_status.save()
+                deactivate_other_statuses(algorithm_status)
+
+            summary = ", ".join(
+                "Algorithm #{} accuracy: {}".format(i, accuracy) for i, (_, accuracy) in enumerate(accuracies, start=1)
             )
-            status_2.save()
-            deactivate_other_statuses(status_2)
-
-            summary = "Algorithm #1 accuracy: {}, Algorithm #2 accuracy: {}".format(accuracy_1, accuracy_2)
             ab_test.ended_at = date_now
             ab_test.summary = summary
             ab_test.save()
@@ -12,8 +12,13 @@ class EndpointsConfig(AppConfig):
 
     @staticmethod
     def signal_imports():
-        pass
+        import apps.endpoints.signals  # noqa
+
+    @staticmethod
+    def task_imports():
+        import apps.endpoints.tasks  # noqa
 
     def ready(self):
         self.model_imports()
         self.signal_imports()
+        self.task_imports()
@@ -0,0 +1,203 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from apps.endpoints.counters import count_ml_requests
+from apps.endpoints.models import MLAlgorithmInput, MLAlgorithmLabel, MLAlgorithmRequest
+
+logger = logging.getLogger('custom')
+
+
+class MLAlgorithmRequestBuffer:
+    """
+    Bounded in-process buffer that writes MLAlgorithmRequest records in the background.
+
+    Records are flushed in batches of up to `batch_size`, at least every `flush_interval` seconds, either with
+    bulk_create or by handing them to the `queue_short` Celery queue. When the buffer is full, the overflow
+    policy decides what happens to new records:
+        sync: write the records synchronously in the calling thread.
+        block: wait up to `flush_interval` seconds for space, then write synchronously.
+        drop: discard the records and log a warning.
+    The buffer is flushed when the process exits, so records survive a graceful worker restart. A batch that still
+    fails after a retry is logged with its records as JSON, which task_save_ml_algorithm_requests can replay.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval, overflow_policy='sync', sink='database'):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.sink = sink
+
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.pid = None
+
+        atexit.register(self.stop)
+
+    def start(self):
+        # the flusher thread does not survive a fork, so it is started lazily in every worker process
+        if self.pid == os.getpid() and self.thread.is_alive():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid() or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='ml-request-buffer', daemon=True)
+                self.thread.start()
+                self.pid = os.getpid()
+
+    def put(self, ml_requests):
+        if self.stopping.is_set():
+            self.write(ml_requests)
+            return
+
+        self.start()
+
+        overflow = []
+        for ml_request in ml_requests:
+            try:
+                if self.overflow_policy == 'block':
+                    self.queue.put(ml_request, timeout=self.flush_interval)
+                else:
+                    self.queue.put_nowait(ml_request)
+            except queue.Full:
+                overflow.append(ml_request)
+
+        if overflow:
+            if self.overflow_policy == 'drop':
+                logger.warning('ML request buffer is full, dropped {} records'.format(len(overflow)))
+            else:
+                self.write(overflow)
+
+    def get_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=timeout))
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        return batch
+
+    def run(self):
+        while not self.stopping.is_set():
+            batch = self.get_batch(self.flush_interval)
+            if batch:
+                self.write(batch)
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None and self.pid == os.getpid():
+            self.thread.join(timeout=self.flush_interval * 2)
+
+        self.flush()
+
+    def flush(self):
+        batch = self.get_batch(0)
+        while batch:
+            self.write(batch)
+            batch = self.get_batch(0)
+
+    def write(self, ml_requests, retries=1):
+        try:
+            if self.sink == 'celery':
+                from apps.endpoints.tasks import task_save_ml_algorithm_requests
+
+                task_save_ml_algorithm_requests.apply_async(
+                    args=([serialize_ml_request(ml_request) for ml_request in ml_requests],),
+                    queue='queue_short',
+                )
+            else:
+                close_old_connections()
+                create_ml_requests(ml_requests, batch_size=self.batch_size)
+
+        except Exception as e:
+            if retries > 0:
+                # close_old_connections drops a broken connection before the batch is written again
+                return self.write(ml_requests, retries=retries - 1)
+
+            logger.error('Failed to write {} ML requests: {}'.format(len(ml_requests), e))
+            for ml_request in ml_requests:
+                logger.error('Dropped ML request: {}'.format(json.dumps(serialize_ml_request(ml_request))))
+
+
+def create_ml_requests(ml_requests, batch_size=None, ignore_conflicts=False):
+    """
+    Writes the given MLAlgorithmRequest records and counts them in the running A/B tests, in one transaction.
+
+    The inputs and response labels of the records are deduplicated first, so a batch costs one lookup and at most
+    one insert of inputs, and labels are only looked up when they are not cached yet.
+    """
+    try:
+        with transaction.atomic():
+            input_ids = MLAlgorithmInput.objects.get_ids([ml_request.input_data for ml_request in ml_requests])
+            label_ids = MLAlgorithmLabel.objects.get_ids([ml_request.response for ml_request in ml_requests])
+            for ml_request, input_id, label_id in zip(ml_requests, input_ids, label_ids):
+                ml_request.request_input_id = input_id
+                ml_request.response_label_id = label_id
+
+            MLAlgorithmRequest.objects.bulk_create(ml_requests, batch_size=batch_size,
+                                                   ignore_conflicts=ignore_conflicts)
+            count_ml_requests(ml_requests)
+
+    except Exception:
+        # the ids of a rolled back write are not valid, the records keep their input and response to be written again
+        for ml_request in ml_requests:
+            ml_request.pk = ml_request.request_input_id = ml_request.response_label_id = None
+            ml_request._state.adding = True
+        raise
+
+
+def serialize_ml_request(ml_request):
+    return {
+        'uuid': str(ml_request.uuid),
+        'created_at': ml_request.created_at.isoformat(),
+        'input_data': ml_request.input_data,
+        'probability': ml_request.probability,
+        'message': ml_request.message,
+        'response': ml_request.response,
+        'feedback': ml_request.feedback,
+        'parent_mlalgorithm_id': ml_request.parent_mlalgorithm_id,
+    }
+
+
+ml_request_buffer = MLAlgorithmRequestBuffer(
+    max_size=settings.ML_REQUEST_LOG_BUFFER_SIZE,
+    batch_size=settings.ML_REQUEST_LOG_BATCH_SIZE,
+    flush_interval=settings.ML_REQUEST_LOG_FLUSH_INTERVAL,
+    overflow_policy=settings.ML_REQUEST_LOG_OVERFLOW_POLICY,
+    sink='celery' if settings.ML_REQUEST_LOG_MODE == 'celery' else 'database',
+)
+
+
+def save_ml_requests(ml_requests):
+    """
+    Saves the given MLAlgorithmRequest records according to the ML_REQUEST_LOG_MODE setting.
+
+    In sync mode the records are written before returning, otherwise they are buffered and written in the background.
+    """
+    if settings.ML_REQUEST_LOG_MODE == 'sync':
+        create_ml_requests(ml_requests)
+    else:
+        ml_request_buffer.put(ml_requests)
+
+
+def get_ml_request_id(ml_request):
+    """
+    Returns the id to report for the given MLAlgorithmRequest.
+
+    In sync mode this is the database id of the written record, as it always was. In the background modes the record
+    may not be written yet, so it is its pre-allocated uuid. Feedback can be sent with either.
+    """
+    if settings.ML_REQUEST_LOG_MODE == 'sync':
+        return ml_request.id
+
+    return str(ml_request.uuid)
@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from apps.endpoints.models import ABTest, ABTestCounter
+
+
+def has_feedback(feedback):
+    """
+    Returns whether the given feedback is set.
+    """
+    return feedback is not None and feedback != ''
+
+
+def get_counts(response, feedback):
+    """
+    Returns the (total, with feedback, correct) counts of a single response.
+    """
+    return 1, int(has_feedback(feedback)), int(has_feedback(feedback) and response == feedback)
+
+
+def increment_ab_test_counters(counter_filter, total=0, with_feedback=0, correct=0):
+    """
+    Adds the given counts to the A/B test counters matching the given filter.
+    """
+    if total or with_feedback or correct:
+        ABTestCounter.objects.filter(counter_filter).update(
+            total=F('total') + total,
+            with_feedback=F('with_feedback') + with_feedback,
+            correct=F('correct') + correct,
+        )
+
+
+def count_ml_requests(ml_requests):
+    """
+    Counts new MLAlgorithmRequest records in the counters of the running A/B tests of their algorithms.
+
+    The counts are aggregated per algorithm, so a batch of records costs one update per algorithm.
+    """
+    counts = defaultdict(lambda: [0, 0, 0])
+    for ml_request in ml_requests:
+        algorithm_counts = counts[ml_request.parent_mlalgorithm_id]
+        for i, count in enumerate(get_counts(ml_request.response, ml_request.feedback)):
+            algorithm_counts[i] += count
+
+    for algorithm_id, (total, with_feedback, correct) in counts.items():
+        increment_ab_test_counters(
+            Q(parent_mlalgorithm_id=algorithm_id, ab_test__ended_at__isnull=True),
+            total=total, with_feedback=with_feedback, correct=correct,
+        )
+
+
+def count_ml_request_feedback(changes):
+    """
+    Counts feedback changes, given as (ml_request, previous feedback) pairs, in the A/B test counters.
+
+    A response is counted in every A/B test of its algorithm that was running when the response was created.
+    """
+    algorithm_ids = {ml_request.parent_mlalgorithm_id for ml_request, _ in changes}
+    counters = defaultdict(list)
+    for counter in ABTestCounter.objects.filter(parent_mlalgorithm_id__in=algorithm_ids).select_related('ab_test'):
+        counters[counter.parent_mlalgorithm_id].append(counter)
+
+    deltas = defaultdict(lambda: [0, 0])
+    for ml_request, old_feedback in changes:
+        _, old_with_feedback, old_correct = get_counts(ml_request.response, old_feedback)
+        _, new_with_feedback, new_correct = get_counts(ml_request.response, ml_request.feedback)
+        if (old_with_feedback, old_correct) == (new_with_feedback, new_correct):
+            continue
+
+        for counter in counters[ml_request.parent_mlalgorithm_id]:
+            ab_test = counter.ab_test
+            if ml_request.created_at > ab_test.created_at and \
+                    (ab_test.ended_at is None or ml_request.created_at < ab_test.ended_at):
+                deltas[counter.id][0] += new_with_feedback - old_with_feedback
+                deltas[counter.id][1] += new_correct - old_correct
+
+    for counter_id, (with_feedback, correct) in deltas.items():
+        increment_ab_test_counters(Q(id=counter_id), with_feedback=with_feedback, correct=correct)
+
+
+def get_ab_test_algorithm_ids(ab_test):
+    """
+    Returns the algorithm ids of the arms of the given A/B test, in arm order.
+    """
+    algorithm_ids = [arm.parent_mlalgorithm_id for arm in ab_test.ab_test_arm.order_by('id')]
+    return algorithm_ids or [ab_test.parent_mlalgorithm_1_id, ab_test.parent_mlalgorithm_2_id]
+
+
+def create_ab_test_counters(ab_test):
+    """
+    Creates the counters of all algorithms of the given A/B test.
+    """
+    for algorithm_id in get_ab_test_algorithm_ids(ab_test):
+        ABTestCounter.objects.get_or_create(ab_test=ab_test, parent_mlalgorithm_id=algorithm_id)
+
+
+def rebuild_ab_test_counters(ab_tests=None):
+    """
+    Recomputes the counters of the given A/B tests, or all of them, with a single conditional aggregation query.
+    """
+    ab_tests = ABTest.objects.all() if ab_tests is None else ab_tests
+
+    with transaction.atomic():
+        for ab_test in ab_tests:
+            create_ab_test_counters(ab_test)
+
+        request = 'parent_mlalgorithm__ml_algorithm_request'
+        in_test = Q(**{request + '__created_at__gt': F('ab_test__created_at')}) & (
+            Q(ab_test__ended_at__isnull=True) | Q(**{request + '__created_at__lt': F('ab_test__ended_at')})
+        )
+        with_feedback = in_test & Q(**{request + '__feedback__isnull': False}) & ~Q(**{request + '__feedback': ''})
+        correct = with_feedback & Q(**{request + '__response_label__name': F(request + '__feedback')})
+
+        counters = ABTestCounter.objects.filter(ab_test__in=ab_tests).annotate(
+            new_total=Count(request, filter=in_test),
+            new_with_feedback=Count(request, filter=with_feedback),
+            new_correct=Count(request, filter=correct),
+        )
+
+        counters = list(counters)
+        for counter in counters:
+            counter.total = counter.new_total
+            counter.with_feedback = counter.new_with_feedback
+            counter.correct = counter.new_correct
+
+        ABTestCounter.objects.bulk_update(counters, ['total', 'with_feedback', 'correct'])
+
+    return counters
+
+
+def get_ab_test_counters(ab_test):
+    """
+    Returns the counters of the given A/B test by algorithm id in arm order, rebuilding them if they are missing.
+    """
+    algorithm_ids = get_ab_test_algorithm_ids(ab_test)
+
+    counters = {counter.parent_mlalgorithm_id: counter for counter in ab_test.ab_test_counter.all()}
+    if set(counters) != set(algorithm_ids):
+        counters = {
+            counter.parent_mlalgorithm_id: counter
+            for counter in rebuild_ab_test_counters(ABTest.objects.filter(pk=ab_test.pk))
+        }
+
+    return {algorithm_id: counters[algorithm_id] for algorithm_id in algorithm_ids}
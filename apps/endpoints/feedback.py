@@ -0,0 +1,87 @@
+import uuid
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.endpoints.counters import count_ml_request_feedback
+from apps.endpoints.models import MLAlgorithmRequest
+from apps.endpoints.streaming import iter_chunks
+
+UNKNOWN_IDS_LIMIT = 100
+
+
+def parse_request_id(request_id):
+    """
+    Returns the lookup field and value of a request id, the database id or the uuid, or None if it is invalid.
+    """
+    if isinstance(request_id, int) and not isinstance(request_id, bool):
+        return 'id', request_id
+
+    request_id = str(request_id if request_id is not None else '').strip()
+    if request_id.isdigit():
+        return 'id', int(request_id)
+
+    try:
+        return 'uuid', uuid.UUID(request_id)
+    except ValueError:
+        return None
+
+
+def apply_feedback_chunk(chunk, result):
+    """
+    Applies one chunk of feedback items and adds its counts to the given result.
+    """
+    feedback_by_key = {}
+    for position, item in enumerate(chunk):
+        key = parse_request_id(item.get('request_id')) if isinstance(item, dict) else None
+        if key is None or item.get('feedback') is None:
+            result['invalid'] += 1
+            continue
+
+        # the position resolves a request sent by both its id and its uuid to the feedback sent last
+        feedback_by_key[key] = (position, str(item['feedback']))
+
+    ids = [value for field, value in feedback_by_key if field == 'id']
+    uuids = [value for field, value in feedback_by_key if field == 'uuid']
+    # the labels are joined, so the responses are compared without a label lookup per request
+    ml_requests = MLAlgorithmRequest.objects.filter(Q(id__in=ids) | Q(uuid__in=uuids)).select_related(
+        'response_label'
+    ).only('id', 'uuid', 'response_label__name', 'feedback', 'created_at', 'parent_mlalgorithm_id')
+
+    now = timezone.now()
+    changes, found = [], set()
+    for ml_request in ml_requests:
+        keys = [key for key in (('id', ml_request.id), ('uuid', ml_request.uuid)) if key in feedback_by_key]
+        found.update(keys)
+
+        # every request is changed and counted once, whichever of its ids the feedback was sent with
+        changes.append((ml_request, ml_request.feedback))
+        ml_request.feedback = max(feedback_by_key[key] for key in keys)[1]
+        ml_request.modified_at = now
+
+    MLAlgorithmRequest.objects.bulk_update([ml_request for ml_request, _ in changes], ['feedback', 'modified_at'])
+    count_ml_request_feedback(changes)
+
+    unknown = [str(value) for field, value in feedback_by_key if (field, value) not in found]
+    result['matched'] += len(found)
+    result['unknown'] += len(unknown)
+    result['unknown_ids'].extend(unknown[:UNKNOWN_IDS_LIMIT - len(result['unknown_ids'])])
+
+
+def apply_feedback(items, chunk_size):
+    """
+    Sets the feedback of MLAlgorithmRequest records from {'request_id', 'feedback'} items, in one transaction.
+
+    Request ids are the database ids or the uuids returned by the predict endpoints. The items are applied in
+    chunks, each with one select and one bulk_update, so they can be streamed from large files. Returns the
+    number of received, matched, unknown and invalid items, with up to 100 of the unknown ids.
+    """
+    result = {'received': 0, 'matched': 0, 'unknown': 0, 'invalid': 0, 'unknown_ids': []}
+
+    with transaction.atomic():
+        for chunk in iter_chunks(items, chunk_size):
+            result['received'] += len(chunk)
+            apply_feedback_chunk(chunk, result)
+
+    return result
@@ -0,0 +1,38 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from apps.endpoints.feedback import apply_feedback
+from apps.endpoints.streaming import RECORD_READERS, get_file_format, iter_lines
+
+
+class Command(BaseCommand):
+    help = "Applies feedback from a JSON, JSONL or CSV file of request_id and feedback items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The path of the feedback file.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError("File not found: {}".format(path))
+
+        print('\n applying ml algorithm request feedback')
+
+        with open(path, 'rb') as f:
+            if path.lower().endswith('.json'):
+                items = json.load(f)
+            else:
+                file_format = get_file_format(file_name=path)
+                if file_format is None:
+                    raise CommandError("Expected a JSON, JSONL or CSV file: {}".format(path))
+
+                items = (record for _, record in RECORD_READERS[file_format](iter_lines(f)))
+
+            result = apply_feedback(items, settings.ML_FEEDBACK_CHUNK_SIZE)
+
+        print(' received: {received}, matched: {matched}, unknown: {unknown}, invalid: {invalid}'.format(**result))
+        if result['unknown_ids']:
+            print(' unknown ids: {}'.format(', '.join(result['unknown_ids'])))
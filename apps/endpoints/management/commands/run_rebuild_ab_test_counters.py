@@ -0,0 +1,14 @@
+from django.core.management import BaseCommand
+
+from apps.endpoints.counters import rebuild_ab_test_counters
+
+
+class Command(BaseCommand):
+
+    def handle(self, *args, **options):
+        print('\n rebuilding ab test counter entries')
+
+        for counter in rebuild_ab_test_counters():
+            print(' ab test {} ml algorithm {}: {} responses, {} with feedback, {} correct'.format(
+                counter.ab_test_id, counter.parent_mlalgorithm_id, counter.total, counter.with_feedback,
+                counter.correct))
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlalgorithmrequest',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True, verbose_name='UUID'),
+        ),
+    ]
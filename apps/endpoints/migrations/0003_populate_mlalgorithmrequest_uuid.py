@@ -0,0 +1,32 @@
+import uuid
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def gen_uuid(apps, schema_editor):
+    MLAlgorithmRequest = apps.get_model('endpoints', 'MLAlgorithmRequest')
+    ml_requests = MLAlgorithmRequest.objects.filter(uuid__isnull=True).only('id')
+
+    batch = []
+    for ml_request in ml_requests.iterator(chunk_size=BATCH_SIZE):
+        ml_request.uuid = uuid.uuid4()
+        batch.append(ml_request)
+
+        if len(batch) == BATCH_SIZE:
+            MLAlgorithmRequest.objects.bulk_update(batch, ['uuid'])
+            batch = []
+
+    MLAlgorithmRequest.objects.bulk_update(batch, ['uuid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0002_mlalgorithmrequest_uuid'),
+    ]
+
+    operations = [
+        migrations.RunPython(gen_uuid, reverse_code=migrations.RunPython.noop),
+    ]
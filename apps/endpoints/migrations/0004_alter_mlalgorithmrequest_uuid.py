@@ -0,0 +1,18 @@
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0003_populate_mlalgorithmrequest_uuid'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mlalgorithmrequest',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='UUID'),
+        ),
+    ]
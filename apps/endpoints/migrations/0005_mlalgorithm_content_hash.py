@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0004_alter_mlalgorithmrequest_uuid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mlalgorithm',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='Content Hash'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+import apps.utils.helpers.django
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0005_mlalgorithm_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchScoringJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified at')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='UUID')),
+                ('status', models.CharField(default='pending', max_length=128, verbose_name='Status')),
+                ('input_file', models.FileField(max_length=512, upload_to=apps.utils.helpers.django.get_upload_path, verbose_name='Input File')),
+                ('file_format', models.CharField(max_length=16, verbose_name='File Format')),
+                ('output_file', models.FileField(blank=True, max_length=512, null=True, upload_to=apps.utils.helpers.django.get_upload_path, verbose_name='Output File')),
+                ('total_chunks', models.PositiveIntegerField(default=0, verbose_name='Total Chunks')),
+                ('completed_chunks', models.PositiveIntegerField(default=0, verbose_name='Completed Chunks')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Total Rows')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Processed Rows')),
+                ('error_rows', models.PositiveIntegerField(default=0, verbose_name='Error Rows')),
+                ('message', models.CharField(blank=True, max_length=10000, null=True, verbose_name='Message')),
+                ('created_by', models.CharField(max_length=128, verbose_name='Created By')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('ended_at', models.DateTimeField(blank=True, null=True, verbose_name='Ended At')),
+                ('parent_mlalgorithm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_scoring_job', to='endpoints.mlalgorithm', verbose_name='Parent ML Algorithm')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0006_batchscoringjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ABTestCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified at')),
+                ('total', models.PositiveBigIntegerField(default=0, verbose_name='Total')),
+                ('with_feedback', models.PositiveBigIntegerField(default=0, verbose_name='With Feedback')),
+                ('correct', models.PositiveBigIntegerField(default=0, verbose_name='Correct')),
+                ('ab_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ab_test_counter', to='endpoints.abtest', verbose_name='AB Test')),
+                ('parent_mlalgorithm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ab_test_counter', to='endpoints.mlalgorithm', verbose_name='Parent ML Algorithm')),
+            ],
+            options={
+                'unique_together': {('ab_test', 'parent_mlalgorithm')},
+            },
+        ),
+    ]
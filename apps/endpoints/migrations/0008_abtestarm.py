@@ -0,0 +1,26 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0007_abtestcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ABTestArm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified at')),
+                ('weight', models.FloatField(default=1.0, verbose_name='Weight')),
+                ('ab_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ab_test_arm', to='endpoints.abtest', verbose_name='AB Test')),
+                ('parent_mlalgorithm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ab_test_arm', to='endpoints.mlalgorithm', verbose_name='Parent ML Algorithm')),
+            ],
+            options={
+                'unique_together': {('ab_test', 'parent_mlalgorithm')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_arms(apps, schema_editor):
+    ABTest = apps.get_model('endpoints', 'ABTest')
+    ABTestArm = apps.get_model('endpoints', 'ABTestArm')
+
+    arms = []
+    for ab_test in ABTest.objects.all().only('id', 'parent_mlalgorithm_1_id', 'parent_mlalgorithm_2_id'):
+        for parent_mlalgorithm_id in dict.fromkeys((ab_test.parent_mlalgorithm_1_id, ab_test.parent_mlalgorithm_2_id)):
+            arms.append(ABTestArm(ab_test_id=ab_test.id, parent_mlalgorithm_id=parent_mlalgorithm_id, weight=1.0))
+
+    ABTestArm.objects.bulk_create(arms, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0008_abtestarm'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_arms, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0009_populate_abtestarm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MLAlgorithmInput',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hash', models.CharField(max_length=32, unique=True, verbose_name='Hash')),
+                ('data', models.JSONField(verbose_name='Data')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MLAlgorithmLabel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True, verbose_name='Name')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mlalgorithmrequest',
+            name='message',
+            field=models.CharField(blank=True, default='', max_length=10000, verbose_name='Message'),
+        ),
+        migrations.AddField(
+            model_name='mlalgorithmrequest',
+            name='probability',
+            field=models.FloatField(blank=True, null=True, verbose_name='Probability'),
+        ),
+        migrations.AddField(
+            model_name='mlalgorithmrequest',
+            name='request_input',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ml_algorithm_request', to='endpoints.mlalgorithminput', verbose_name='Input'),
+        ),
+        migrations.AddField(
+            model_name='mlalgorithmrequest',
+            name='response_label',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ml_algorithm_request', to='endpoints.mlalgorithmlabel', verbose_name='Response Label'),
+        ),
+    ]
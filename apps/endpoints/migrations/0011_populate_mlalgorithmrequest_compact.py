@@ -0,0 +1,94 @@
+import ast
+import hashlib
+import json
+import re
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 2000
+
+
+def get_hash(data):
+    canonical_data = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(canonical_data.encode(), digest_size=16).hexdigest()
+
+
+def parse_full_response(full_response):
+    # the responses were stored with str(), where numpy scalars may be written as e.g. np.float64(0.5)
+    try:
+        full_response = ast.literal_eval(re.sub(r'(?:np|numpy)\.\w+\(([^()]*)\)', r'\1', full_response))
+    except (ValueError, SyntaxError):
+        return {}
+
+    return full_response if isinstance(full_response, dict) else {}
+
+
+def compact_requests(apps, schema_editor):
+    """
+    Moves the inputs and labels of the request log to their own tables, committing every batch on its own.
+
+    The migration is not atomic, so the locks of a large request log are only held for one batch at a time. The
+    requests already compacted are skipped, so a migration that was interrupted resumes where it stopped.
+    """
+    MLAlgorithmInput = apps.get_model('endpoints', 'MLAlgorithmInput')
+    MLAlgorithmLabel = apps.get_model('endpoints', 'MLAlgorithmLabel')
+    MLAlgorithmRequest = apps.get_model('endpoints', 'MLAlgorithmRequest')
+
+    label_ids = {}
+    last_id = 0
+    while True:
+        batch = list(MLAlgorithmRequest.objects.filter(id__gt=last_id, request_input__isnull=True).order_by('id').only(
+            'id', 'input_data', 'full_response', 'response'
+        )[:BATCH_SIZE])
+        if not batch:
+            break
+
+        with transaction.atomic():
+            inputs = {}
+            for ml_request in batch:
+                try:
+                    ml_request.input_data = json.loads(ml_request.input_data)
+                except ValueError:
+                    pass
+                ml_request.input_hash = get_hash(ml_request.input_data)
+                inputs.setdefault(ml_request.input_hash, ml_request.input_data)
+
+            input_ids = dict(MLAlgorithmInput.objects.filter(hash__in=inputs).values_list('hash', 'id'))
+            MLAlgorithmInput.objects.bulk_create([
+                MLAlgorithmInput(hash=h, data=data) for h, data in inputs.items() if h not in input_ids
+            ])
+            input_ids.update(MLAlgorithmInput.objects.filter(hash__in=inputs).values_list('hash', 'id'))
+
+            for ml_request in batch:
+                if ml_request.response not in label_ids:
+                    label, _ = MLAlgorithmLabel.objects.get_or_create(name=ml_request.response)
+                    label_ids[ml_request.response] = label.id
+
+                full_response = parse_full_response(ml_request.full_response)
+                try:
+                    ml_request.probability = float(full_response['probability'])
+                except (KeyError, TypeError, ValueError):
+                    ml_request.probability = None
+                ml_request.message = ''
+                if full_response.get('status') == 'Error':
+                    ml_request.message = str(full_response.get('message') or 'Error')
+
+                ml_request.request_input_id = input_ids[ml_request.input_hash]
+                ml_request.response_label_id = label_ids[ml_request.response]
+
+            MLAlgorithmRequest.objects.bulk_update(
+                batch, ['request_input', 'response_label', 'probability', 'message'], batch_size=BATCH_SIZE
+            )
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('endpoints', '0010_mlalgorithmrequest_compact'),
+    ]
+
+    operations = [
+        migrations.RunPython(compact_requests, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0011_populate_mlalgorithmrequest_compact'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='mlalgorithmrequest',
+            name='full_response',
+        ),
+        migrations.RemoveField(
+            model_name='mlalgorithmrequest',
+            name='input_data',
+        ),
+        migrations.RemoveField(
+            model_name='mlalgorithmrequest',
+            name='response',
+        ),
+        migrations.AlterField(
+            model_name='mlalgorithmrequest',
+            name='request_input',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ml_algorithm_request', to='endpoints.mlalgorithminput', verbose_name='Input'),
+        ),
+        migrations.AlterField(
+            model_name='mlalgorithmrequest',
+            name='response_label',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ml_algorithm_request', to='endpoints.mlalgorithmlabel', verbose_name='Response Label'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+PARTITIONS_AHEAD = 3
+
+
+def get_month_start(value, months=0):
+    month = value.year * 12 + value.month - 1 + months
+    return datetime.datetime(month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def partition_requests(apps, schema_editor):
+    """
+    Converts the request log into a table partitioned by month of created_at on Postgres.
+
+    The existing table becomes the partition of all rows up to the end of the current month. Postgres requires the
+    primary key and unique constraints of a partitioned table to include the partition key, so they are (id,
+    created_at) and (uuid, created_at), and ids are drawn from a sequence shared by all partitions.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    table = 'endpoints_mlalgorithmrequest'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(id), 0), MAX(created_at) FROM {}".format(table))
+        max_id, max_created_at = cursor.fetchone()
+
+    legacy_end = get_month_start(max(timezone.now(), max_created_at or timezone.now()), months=1)
+
+    statements = [
+        "ALTER TABLE {table} RENAME TO {table}_legacy",
+        "ALTER TABLE {table}_legacy DROP CONSTRAINT {table}_pkey",
+        "ALTER TABLE {table}_legacy ALTER COLUMN id DROP IDENTITY IF EXISTS",
+        "ALTER TABLE {table}_legacy ALTER COLUMN id DROP DEFAULT",
+        "DROP SEQUENCE IF EXISTS {table}_id_seq",
+        "CREATE TABLE {table} (LIKE {table}_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        "CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id",
+        "SELECT setval('{table}_id_seq', {next_id}, false)",
+        "ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')",
+        "ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)",
+        "ALTER TABLE {table} ADD CONSTRAINT {table}_uuid_created_at_uniq UNIQUE (uuid, created_at)",
+        "ALTER TABLE {table} ADD CONSTRAINT {table}_parent_mlalgorithm_id_fk FOREIGN KEY (parent_mlalgorithm_id) "
+        "REFERENCES endpoints_mlalgorithm (id) DEFERRABLE INITIALLY DEFERRED",
+        "ALTER TABLE {table} ADD CONSTRAINT {table}_request_input_id_fk FOREIGN KEY (request_input_id) "
+        "REFERENCES endpoints_mlalgorithminput (id) DEFERRABLE INITIALLY DEFERRED",
+        "ALTER TABLE {table} ADD CONSTRAINT {table}_response_label_id_fk FOREIGN KEY (response_label_id) "
+        "REFERENCES endpoints_mlalgorithmlabel (id) DEFERRABLE INITIALLY DEFERRED",
+        "CREATE INDEX {table}_parent_mlalgorithm_id_idx ON {table} (parent_mlalgorithm_id)",
+        "CREATE INDEX {table}_request_input_id_idx ON {table} (request_input_id)",
+        "CREATE INDEX {table}_response_label_id_idx ON {table} (response_label_id)",
+        "CREATE INDEX {table}_created_at_idx ON {table} (created_at)",
+        "ALTER TABLE {table} ATTACH PARTITION {table}_legacy FOR VALUES FROM (MINVALUE) TO ('{legacy_end}')",
+        "CREATE TABLE {table}_default PARTITION OF {table} DEFAULT",
+    ]
+    for months in range(PARTITIONS_AHEAD):
+        start, end = get_month_start(legacy_end, months), get_month_start(legacy_end, months + 1)
+        statements.append(
+            "CREATE TABLE {{table}}_p{:%Y%m} PARTITION OF {{table}} FOR VALUES FROM ('{}') TO ('{}')".format(
+                start, start.isoformat(), end.isoformat()
+            )
+        )
+
+    for statement in statements:
+        schema_editor.execute(statement.format(table=table, next_id=max_id + 1, legacy_end=legacy_end.isoformat()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0012_remove_mlalgorithmrequest_input_data'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_requests, reverse_code=migrations.RunPython.noop),
+    ]
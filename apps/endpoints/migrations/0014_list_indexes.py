@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0013_partition_mlalgorithmrequest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='batchscoringjob',
+            index=models.Index(fields=['created_at', 'id'], name='endpoints_b_created_91f7e6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batchscoringjob',
+            index=models.Index(fields=['status'], name='endpoints_b_status_b81066_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['created_at', 'id'], name='endpoints_e_created_3bc09f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='endpoint',
+            index=models.Index(fields=['name'], name='endpoints_e_name_1fd98c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mlalgorithm',
+            index=models.Index(fields=['created_at', 'id'], name='endpoints_m_created_9aab4f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mlalgorithmrequest',
+            index=models.Index(fields=['created_at', 'id'], name='endpoints_m_created_7f54f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mlalgorithmstatus',
+            index=models.Index(fields=['created_at', 'id'], name='endpoints_m_created_45b2fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mlalgorithmstatus',
+            index=models.Index(fields=['status', 'active'], name='endpoints_m_status_55bda5_idx'),
+        ),
+    ]
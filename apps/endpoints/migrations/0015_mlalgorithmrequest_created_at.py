@@ -0,0 +1,17 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0014_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mlalgorithmrequest',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Created at'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+import uuid
+
+from django.db import migrations, models
+
+UUID_FIELD = models.UUIDField(default=uuid.uuid4, editable=False, verbose_name='UUID')
+UUID_CREATED_AT_UNIQ = models.UniqueConstraint(
+    fields=('uuid', 'created_at'), name='endpoints_mlalgorithmrequest_uuid_created_at_uniq'
+)
+
+
+def alter_uuid_unique(apps, schema_editor):
+    """
+    Replaces the unique uuid of the request log with a unique (uuid, created_at) on the databases other than Postgres.
+
+    On Postgres the partitioned table of 0013 already has this constraint instead of the unique uuid.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+
+    model = apps.get_model('endpoints', 'MLAlgorithmRequest')
+    old_field = model._meta.get_field('uuid')
+    new_field = UUID_FIELD.clone()
+    new_field.set_attributes_from_name('uuid')
+    schema_editor.alter_field(model, old_field, new_field)
+    # the constraint is created with its own statement, as SQLite would otherwise rebuild the table from the old state
+    schema_editor.execute(UUID_CREATED_AT_UNIQ.create_sql(model, schema_editor))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0015_mlalgorithmrequest_created_at'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='mlalgorithmrequest',
+                    name='uuid',
+                    field=UUID_FIELD,
+                ),
+                migrations.AddConstraint(
+                    model_name='mlalgorithmrequest',
+                    constraint=UUID_CREATED_AT_UNIQ,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(alter_uuid_unique, reverse_code=migrations.RunPython.noop),
+            ],
+        ),
+    ]
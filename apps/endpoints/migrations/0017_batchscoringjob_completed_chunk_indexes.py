@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('endpoints', '0016_mlalgorithmrequest_uuid_created_at_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batchscoringjob',
+            name='completed_chunk_indexes',
+            field=models.JSONField(blank=True, default=list, verbose_name='Completed Chunk Indexes'),
+        ),
+    ]
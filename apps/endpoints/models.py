@@ -1,7 +1,13 @@
-from django.db import models
+import hashlib
+import json
+import uuid
+
+from django.db import connections, models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from apps.utils.mixins.models.atoms import TimestampMixin
+from apps.utils.helpers.django import get_upload_path
+from apps.utils.mixins.models.atoms import TimestampMixin, UuidMixin
 
 
 class Endpoint(TimestampMixin, models.Model):
@@ -15,6 +21,12 @@ class Endpoint(TimestampMixin, models.Model):
     name = models.CharField(_('Name'), max_length=128)
     owner = models.CharField(_('Owner'), max_length=128)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['name']),
+        ]
+
 
 class MLAlgorithm(TimestampMixin, models.Model):
     """
@@ -27,6 +39,7 @@ class MLAlgorithm(TimestampMixin, models.Model):
         code: The code of the algorithm.
         version: The version of the algorithm similar to software versioning.
         owner: The name of the owner.
+        content_hash: The hash of the registration fields, code and artifacts, used to register the algorithm once.
     """
     parent_endpoint = models.ForeignKey(
         Endpoint,
@@ -40,6 +53,12 @@ class MLAlgorithm(TimestampMixin, models.Model):
     code = models.CharField(_('Code'), max_length=50000)
     version = models.CharField(_('Version'), max_length=128)
     owner = models.CharField(_('Owner'), max_length=128)
+    content_hash = models.CharField(_('Content Hash'), max_length=64, unique=True, blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
 
 class MLAlgorithmStatus(TimestampMixin, models.Model):
@@ -64,15 +83,144 @@ class MLAlgorithmStatus(TimestampMixin, models.Model):
     active = models.BooleanField(_('Active?'))
     created_by = models.CharField(_('Created By'), max_length=128)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['status', 'active']),
+        ]
+
+
+class MLAlgorithmLabelManager(models.Manager):
+    """
+    Caches the label ids by name and the names by id, as the labels are never changed or deleted.
+
+    Labels are only cached once the transaction that read or created them is committed, so a rolled back label
+    is never reused.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.ids = {}
+        self.names = {}
+
+    def remember(self, label_id, name):
+        self.ids[name] = label_id
+        self.names[label_id] = name
+
+    def remember_many(self, ids):
+        for name, label_id in ids.items():
+            self.remember(label_id, name)
+
+    def get_ids(self, names):
+        """
+        Returns the ids of the given label names, inserting only the labels that are not stored yet.
+        """
+        ids = {name: self.ids[name] for name in set(names) if name in self.ids}
+
+        missing_names = set(names) - set(ids)
+        if missing_names:
+            new_ids = dict(self.filter(name__in=missing_names).values_list('name', 'id'))
+            if len(new_ids) < len(missing_names):
+                # concurrent writers may insert the same labels, the conflicts are skipped and read back
+                self.bulk_create([self.model(name=name) for name in missing_names - set(new_ids)],
+                                 ignore_conflicts=True)
+                new_ids = dict(self.filter(name__in=missing_names).values_list('name', 'id'))
 
-class MLAlgorithmRequest(TimestampMixin, models.Model):
+            transaction.on_commit(lambda: self.remember_many(new_ids))
+            ids.update(new_ids)
+
+        return [ids[name] for name in names]
+
+    def get_name(self, label_id):
+        name = self.names.get(label_id)
+        if name is None and label_id is not None:
+            name = self.filter(id=label_id).values_list('name', flat=True).get()
+            transaction.on_commit(lambda: self.remember(label_id, name))
+
+        return name
+
+
+class MLAlgorithmLabel(models.Model):
+    """
+    The MLAlgorithmLabel will keep the distinct response labels, so requests store a small code for the label.
+
+    Attributes:
+        name: The label returned by the ML algorithm, or error for failed predictions.
+    """
+    objects = MLAlgorithmLabelManager()
+
+    name = models.CharField(_('Name'), max_length=128, unique=True)
+
+
+class MLAlgorithmInputManager(models.Manager):
+
+    @staticmethod
+    def get_hash(data):
+        canonical_data = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.blake2b(canonical_data.encode(), digest_size=16).hexdigest()
+
+    def get_locked_ids(self, hashes):
+        """
+        Returns the ids of the inputs with the given hashes, locked FOR KEY SHARE on Postgres until the transaction
+        ends.
+
+        The lock keeps purge_unreferenced_inputs from deleting an input that a request about to be written refers to,
+        and, unlike select_for_update, it does not block the other writers that read the same inputs.
+        """
+        queryset = self.filter(hash__in=hashes).values_list('hash', 'id')
+        connection = connections[self.db]
+        if connection.vendor != 'postgresql' or not hashes:
+            return dict(queryset)
+
+        sql, params = queryset.query.get_compiler(self.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(sql + ' FOR KEY SHARE', params)
+            return dict(cursor.fetchall())
+
+    def get_ids(self, records):
+        """
+        Returns the ids of the given input records, inserting only the records that are not stored yet.
+        """
+        hashes = [self.get_hash(record) for record in records]
+        ids = self.get_locked_ids(set(hashes))
+
+        new_records = {h: record for h, record in zip(hashes, records) if h not in ids}
+        if new_records:
+            # concurrent writers may insert the same records, the conflicts are skipped and read back
+            self.bulk_create([self.model(hash=h, data=record) for h, record in new_records.items()],
+                             ignore_conflicts=True)
+            ids.update(self.get_locked_ids(set(new_records)))
+
+        return [ids[h] for h in hashes]
+
+
+class MLAlgorithmInput(models.Model):
+    """
+    The MLAlgorithmInput will keep the distinct input records, so identical inputs are stored once.
+
+    Attributes:
+        hash: The hash of the canonical JSON of the input record.
+        data: The input record.
+    """
+    objects = MLAlgorithmInputManager()
+
+    hash = models.CharField(_('Hash'), max_length=32, unique=True)
+    data = models.JSONField(_('Data'))
+
+
+class MLAlgorithmRequest(TimestampMixin, UuidMixin, models.Model):
     """
     The MLAlgorithmRequest will keep information about all requests to ML algorithms.
 
     Attributes:
+        uuid: The request id allocated before the request is written, returned to the caller. Unique together with
+            created_at, as the unique constraints of the table partitioned by created_at on Postgres must include it.
+        created_at: The time of the request, set when the record is built, so buffered records keep it.
         parent_mlalgorithm: The reference to MLAlgorithm used to compute response.
-        input_data: The input data to ML algorithm in JSON format.
-        response: The response of the ML algorithm in JSON format.
+        request_input: The reference to the deduplicated input data to ML algorithm.
+        probability: The probability of the response.
+        response_label: The reference to the response label of the ML algorithm.
+        message: The error message of a failed prediction.
         feedback: The feedback about the response in JSON format.
     """
     parent_mlalgorithm = models.ForeignKey(
@@ -81,12 +229,83 @@ class MLAlgorithmRequest(TimestampMixin, models.Model):
         verbose_name=_('Parent ML Algorithm'),
         on_delete=models.CASCADE
     )
+    request_input = models.ForeignKey(
+        MLAlgorithmInput,
+        related_name='ml_algorithm_request',
+        verbose_name=_('Input'),
+        on_delete=models.PROTECT
+    )
+    response_label = models.ForeignKey(
+        MLAlgorithmLabel,
+        related_name='ml_algorithm_request',
+        verbose_name=_('Response Label'),
+        on_delete=models.PROTECT
+    )
 
-    input_data = models.CharField(_('Input Data'), max_length=10000)
-    full_response = models.CharField(_('Full Response'), max_length=10000)
-    response = models.CharField(_('Response'), max_length=10000)
+    uuid = models.UUIDField(_('UUID'), default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(_('Created at'), default=timezone.now, editable=False)
+    probability = models.FloatField(_('Probability'), blank=True, null=True)
+    message = models.CharField(_('Message'), max_length=10000, blank=True, default='')
     feedback = models.CharField(_('Feedback'), max_length=10000, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+        # on Postgres the primary key is (id, created_at) too, which Django models cannot declare, ids are still unique
+        # as they are drawn from a single sequence
+        constraints = [
+            models.UniqueConstraint(
+                fields=['uuid', 'created_at'], name='endpoints_mlalgorithmrequest_uuid_created_at_uniq'
+            ),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        self._input_data = None
+        self._response = None
+        super().__init__(*args, **kwargs)
+
+    @property
+    def input_data(self):
+        # records that are not written yet keep their input until it is deduplicated
+        if self._input_data is None and self.request_input_id is not None:
+            self._input_data = self.request_input.data
+
+        return self._input_data
+
+    @input_data.setter
+    def input_data(self, input_data):
+        self._input_data = input_data
+
+    @property
+    def response(self):
+        # records that are not written yet keep their label until it is resolved with the other labels of the batch
+        if self.response_label_id is None:
+            return self._response
+        if MLAlgorithmRequest.response_label.is_cached(self):
+            return self.response_label.name
+
+        return MLAlgorithmLabel.objects.get_name(self.response_label_id)
+
+    @response.setter
+    def response(self, response):
+        self._response = response
+        self.response_label_id = None
+
+    @property
+    def full_response(self):
+        if self.message:
+            return {'status': 'Error', 'message': self.message}
+
+        return {'probability': self.probability, 'label': self.response, 'status': 'OK'}
+
+    @full_response.setter
+    def full_response(self, full_response):
+        self.probability = full_response.get('probability')
+        self.message = ''
+        if full_response.get('status') == 'Error':
+            self.message = str(full_response.get('message') or 'Error')
+
 
 class ABTest(TimestampMixin, models.Model):
     """
@@ -94,6 +313,7 @@ class ABTest(TimestampMixin, models.Model):
     Attributes:
         parent_mlalgorithm_1: The reference to the first corresponding MLAlgorithm.
         parent_mlalgorithm_2: The reference to the second corresponding MLAlgorithm.
+        ab_test_arm: The algorithms of the test with their traffic weights, starting with the two above.
         title: The title of test.
         created_by: The name of creator.
         ended_at: The date of test stop.
@@ -116,3 +336,114 @@ class ABTest(TimestampMixin, models.Model):
     created_by = models.CharField(_('Created By'), max_length=128)
     ended_at = models.DateTimeField(_('Ended At'), blank=True, null=True)
     summary = models.CharField(_('Summary'), max_length=10000, blank=True, null=True)
+
+
+class ABTestArm(TimestampMixin, models.Model):
+    """
+    The ABTestArm will keep the algorithms of an A/B test and their share of the traffic.
+
+    Attributes:
+        ab_test: The reference to the ABTest.
+        parent_mlalgorithm: The reference to the MLAlgorithm of the test arm.
+        weight: The relative share of the test traffic routed to the algorithm.
+    """
+    ab_test = models.ForeignKey(
+        ABTest,
+        related_name='ab_test_arm',
+        verbose_name=_('AB Test'),
+        on_delete=models.CASCADE
+    )
+    parent_mlalgorithm = models.ForeignKey(
+        MLAlgorithm,
+        related_name='ab_test_arm',
+        verbose_name=_('Parent ML Algorithm'),
+        on_delete=models.CASCADE
+    )
+
+    weight = models.FloatField(_('Weight'), default=1.0)
+
+    class Meta:
+        unique_together = ('ab_test', 'parent_mlalgorithm')
+
+
+class ABTestCounter(TimestampMixin, models.Model):
+    """
+    The ABTestCounter will keep the running response counts of one algorithm in an A/B test.
+
+    Attributes:
+        ab_test: The reference to the ABTest.
+        parent_mlalgorithm: The reference to the MLAlgorithm of the test arm.
+        total: The number of responses of the algorithm during the test.
+        with_feedback: The number of those responses with feedback.
+        correct: The number of those responses where the feedback matches the response.
+    """
+    ab_test = models.ForeignKey(
+        ABTest,
+        related_name='ab_test_counter',
+        verbose_name=_('AB Test'),
+        on_delete=models.CASCADE
+    )
+    parent_mlalgorithm = models.ForeignKey(
+        MLAlgorithm,
+        related_name='ab_test_counter',
+        verbose_name=_('Parent ML Algorithm'),
+        on_delete=models.CASCADE
+    )
+
+    total = models.PositiveBigIntegerField(_('Total'), default=0)
+    with_feedback = models.PositiveBigIntegerField(_('With Feedback'), default=0)
+    correct = models.PositiveBigIntegerField(_('Correct'), default=0)
+
+    class Meta:
+        unique_together = ('ab_test', 'parent_mlalgorithm')
+
+
+class BatchScoringJob(TimestampMixin, UuidMixin, models.Model):
+    """
+    The BatchScoringJob will keep information about offline scoring jobs for files of records.
+
+    Attributes:
+        uuid: The job id used to follow the job.
+        parent_mlalgorithm: The reference to MLAlgorithm used to score the records.
+        status: The status of the job. Can be: pending, running, completed, failed.
+        input_file: The CSV or JSONL file of records in the default storage.
+        file_format: The format of the input file, csv or jsonl.
+        output_file: The JSON lines file with one prediction per record, written when the job is completed.
+        total_chunks: The number of chunks the records are split into.
+        completed_chunks: The number of chunks scored so far.
+        completed_chunk_indexes: The indexes of the chunks scored so far, so that a retried chunk is counted once.
+        total_rows: The number of records in the input file.
+        processed_rows: The number of records scored so far.
+        error_rows: The number of records that could not be scored.
+        message: The error message of a failed job.
+        created_by: The name of creator.
+        started_at: The date of job start.
+        ended_at: The date of job completion or failure.
+    """
+    parent_mlalgorithm = models.ForeignKey(
+        MLAlgorithm,
+        related_name='batch_scoring_job',
+        verbose_name=_('Parent ML Algorithm'),
+        on_delete=models.CASCADE
+    )
+
+    status = models.CharField(_('Status'), max_length=128, default='pending')
+    input_file = models.FileField(_('Input File'), upload_to=get_upload_path, max_length=512)
+    file_format = models.CharField(_('File Format'), max_length=16)
+    output_file = models.FileField(_('Output File'), upload_to=get_upload_path, max_length=512, blank=True, null=True)
+    total_chunks = models.PositiveIntegerField(_('Total Chunks'), default=0)
+    completed_chunks = models.PositiveIntegerField(_('Completed Chunks'), default=0)
+    completed_chunk_indexes = models.JSONField(_('Completed Chunk Indexes'), default=list, blank=True)
+    total_rows = models.PositiveIntegerField(_('Total Rows'), default=0)
+    processed_rows = models.PositiveIntegerField(_('Processed Rows'), default=0)
+    error_rows = models.PositiveIntegerField(_('Error Rows'), default=0)
+    message = models.CharField(_('Message'), max_length=10000, blank=True, null=True)
+    created_by = models.CharField(_('Created By'), max_length=128)
+    started_at = models.DateTimeField(_('Started At'), blank=True, null=True)
+    ended_at = models.DateTimeField(_('Ended At'), blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['status']),
+        ]
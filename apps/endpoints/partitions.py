@@ -0,0 +1,267 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+
+from apps.endpoints.models import MLAlgorithmInput, MLAlgorithmRequest
+from apps.utils.helpers.django import remove_storage_file_if_exists
+
+logger = logging.getLogger('custom')
+
+TABLE = MLAlgorithmRequest._meta.db_table
+PARTITION_BOUND_RE = re.compile(r"FROM \((.+)\) TO \((.+)\)")
+MAX_DATETIME = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+
+
+def get_month_start(value, months=0):
+    """
+    Returns the start of the month of the given datetime in UTC, shifted by the given number of months.
+    """
+    month = value.year * 12 + value.month - 1 + months
+    return datetime.datetime(month // 12, month % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def parse_partition_bound(bound):
+    if bound in ('MINVALUE', 'MAXVALUE'):
+        return None
+
+    return datetime.datetime.fromisoformat(bound.strip("'"))
+
+
+def is_partitioned():
+    """
+    Returns whether the request log is a partitioned table, which is only the case on Postgres.
+    """
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [TABLE])
+        return cursor.fetchone()[0] == 'p'
+
+
+def get_partitions():
+    """
+    Returns the (name, start, end) range partitions of the request log ordered by end, with None for MINVALUE.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            [TABLE],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_RE.search(bound)
+        if match:
+            partitions.append((name, parse_partition_bound(match.group(1)), parse_partition_bound(match.group(2))))
+
+    return sorted(partitions, key=lambda partition: partition[2] or MAX_DATETIME)
+
+
+def create_partitions(now, months_ahead):
+    """
+    Creates the monthly partitions of the request log up to the given number of months after the current one.
+    """
+    last_end = max([end for _, _, end in get_partitions() if end is not None], default=get_month_start(now))
+
+    created = []
+    start = last_end
+    while start < get_month_start(now, months_ahead + 1):
+        end = get_month_start(start, 1)
+        name = '{}_p{:%Y%m}'.format(TABLE, start)
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE TABLE {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s)".format(name, TABLE),
+                           [start, end])
+        created.append(name)
+        start = end
+
+    return created
+
+
+def get_expired_periods(cutoff):
+    """
+    Returns the (partition name, start, end) periods of the request log that end before the given cutoff.
+
+    On Postgres these are the partitions of the table. Elsewhere they are the months from the oldest request,
+    without a partition name, so they are archived in the same steps but removed with chunked deletes.
+    """
+    if is_partitioned():
+        return [(name, start, end) for name, start, end in get_partitions() if end is not None and end <= cutoff]
+
+    oldest = MLAlgorithmRequest.objects.order_by('created_at').values_list('created_at', flat=True).first()
+    if oldest is None:
+        return []
+
+    periods = []
+    start = get_month_start(oldest)
+    while get_month_start(start, 1) <= cutoff:
+        periods.append((None, start, get_month_start(start, 1)))
+        start = get_month_start(start, 1)
+
+    return periods
+
+
+def get_period_requests(start, end):
+    ml_requests = MLAlgorithmRequest.objects.filter(created_at__lt=end)
+    if start is not None:
+        ml_requests = ml_requests.filter(created_at__gte=start)
+
+    return ml_requests
+
+
+def iter_period_requests(start, end, chunk_size):
+    """
+    Yields the requests of the given period in id order, reading one chunk at a time.
+    """
+    ml_requests = get_period_requests(start, end).select_related('request_input', 'response_label').order_by('id')
+
+    last_id = 0
+    while True:
+        chunk = list(ml_requests.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+
+        yield from chunk
+        last_id = chunk[-1].id
+
+
+def serialize_archived_request(ml_request):
+    return {
+        'id': ml_request.id,
+        'uuid': str(ml_request.uuid),
+        'parent_mlalgorithm': ml_request.parent_mlalgorithm_id,
+        'input_data': ml_request.input_data,
+        'full_response': ml_request.full_response,
+        'response': ml_request.response,
+        'feedback': ml_request.feedback,
+        'created_at': ml_request.created_at,
+        'modified_at': ml_request.modified_at,
+    }
+
+
+def get_archive_path(archive_dir, start, end):
+    return os.path.join(archive_dir, '{}_{}_{:%Y-%m-%d}.jsonl.gz'.format(
+        TABLE, 'min' if start is None else format(start, '%Y-%m-%d'), end
+    ))
+
+
+def archive_period(archive_dir, start, end, chunk_size):
+    """
+    Writes the requests of the given period as a gzipped JSON lines file to the default storage.
+
+    Returns the storage path and the number of archived requests, or no path if the period is empty.
+    """
+    rows = 0
+    with tempfile.TemporaryFile() as output:
+        with gzip.GzipFile(fileobj=output, mode='wb') as archive:
+            for ml_request in iter_period_requests(start, end, chunk_size):
+                archive.write(json.dumps(serialize_archived_request(ml_request), cls=DjangoJSONEncoder).encode())
+                archive.write(b'\n')
+                rows += 1
+
+        if not rows:
+            return None, 0
+
+        # a retried archive step replaces the file of the previous attempt
+        path = get_archive_path(archive_dir, start, end)
+        remove_storage_file_if_exists(path)
+
+        output.seek(0)
+        path = default_storage.save(path, File(output))
+
+    return path, rows
+
+
+def delete_period(start, end, chunk_size):
+    """
+    Deletes the requests of the given period in chunks, each in its own transaction, so locks are held briefly.
+    """
+    ml_requests = get_period_requests(start, end)
+
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(ml_requests.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+
+            deleted += MLAlgorithmRequest.objects.filter(id__in=ids).delete()[0]
+
+
+def drop_partition(name):
+    with connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE {} DETACH PARTITION {}".format(TABLE, name))
+        cursor.execute("DROP TABLE {}".format(name))
+
+
+def get_unreferenced_inputs():
+    return MLAlgorithmInput.objects.filter(
+        ~Exists(MLAlgorithmRequest.objects.filter(request_input_id=OuterRef('id')))
+    )
+
+
+def purge_unreferenced_inputs(chunk_size):
+    """
+    Deletes the deduplicated inputs that no request refers to anymore, in chunks, each in its own transaction.
+
+    The inputs are written to the archive files with their requests, so they are not archived again. On Postgres,
+    writers lock the inputs they read FOR KEY SHARE until their requests are committed, and the inputs locked by a
+    writer are skipped, so an input is never deleted between a writer reading its id and committing a request that
+    refers to it. The skipped inputs are purged on a later run, as is a chunk that a writer refers to again.
+    """
+    deleted = 0
+    last_id = 0
+    while True:
+        inputs = get_unreferenced_inputs().filter(id__gt=last_id).order_by('id')
+        ids = list(inputs.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+
+        last_id = ids[-1]
+        try:
+            with transaction.atomic():
+                locked_ids = list(get_unreferenced_inputs().filter(id__in=ids).select_for_update(
+                    skip_locked=True
+                ).values_list('id', flat=True))
+                deleted += MLAlgorithmInput.objects.filter(id__in=locked_ids).delete()[0]
+        except IntegrityError as e:
+            logger.warning('Skipped purging {} ML request inputs: {}'.format(len(ids), e))
+
+
+def archive_expired_requests(cutoff, archive_dir, chunk_size):
+    """
+    Archives the request log periods that end before the cutoff to the default storage and removes them.
+
+    A period is only removed once its archive file is saved. Expired partitions are detached and dropped, which
+    is instant, other periods are deleted in chunks. The inputs left without requests are then purged. Returns the
+    archived periods with their files and counts.
+    """
+    archived = []
+    for name, start, end in get_expired_periods(cutoff):
+        path, rows = archive_period(archive_dir, start, end, chunk_size)
+
+        if name is not None:
+            drop_partition(name)
+        else:
+            delete_period(start, end, chunk_size)
+
+        logger.info('Archived {} ML requests until {} to {}'.format(rows, end, path))
+        archived.append({'partition': name, 'start': start, 'end': end, 'file': path, 'rows': rows})
+
+    if archived:
+        purged = purge_unreferenced_inputs(chunk_size)
+        logger.info('Purged {} unreferenced ML request inputs'.format(purged))
+
+    return archived
@@ -1,9 +1,23 @@
 from rest_framework import serializers
 
-from apps.endpoints.models import Endpoint, MLAlgorithm, MLAlgorithmStatus, MLAlgorithmRequest, ABTest
+from apps.endpoints.models import Endpoint, MLAlgorithm, MLAlgorithmStatus, MLAlgorithmRequest, ABTest, \
+    ABTestArm, BatchScoringJob
 
 
-class EndpointSerializer(serializers.ModelSerializer):
+class SparseFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    Model serializer that only returns the given fields, chosen by the list views from the fields query parameter.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+
+class EndpointSerializer(SparseFieldsModelSerializer):
     class Meta:
         model = Endpoint
         fields = (
@@ -15,11 +29,9 @@ class EndpointSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class MLAlgorithmSerializer(serializers.ModelSerializer):
-    current_status = serializers.SerializerMethodField(read_only=True)
-
-    def get_current_status(self, mlalgorithm):
-        return MLAlgorithmStatus.objects.filter(parent_mlalgorithm=mlalgorithm).latest('created_at').status
+class MLAlgorithmSerializer(SparseFieldsModelSerializer):
+    # annotated by the queryset, see MLAlgorithmAPIView
+    current_status = serializers.CharField(read_only=True)
 
     class Meta:
         model = MLAlgorithm
@@ -37,13 +49,19 @@ class MLAlgorithmSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class MLAlgorithmRequestSerializer(serializers.ModelSerializer):
+class MLAlgorithmRequestSerializer(SparseFieldsModelSerializer):
+    input_data = serializers.JSONField(read_only=True)
+    full_response = serializers.JSONField(read_only=True)
+    response = serializers.CharField(read_only=True)
+
     class Meta:
         model = MLAlgorithmRequest
         fields = (
             'id',
+            'uuid',
             'input_data',
             'full_response',
+            'probability',
             'response',
             'feedback',
             'created_at',
@@ -51,15 +69,17 @@ class MLAlgorithmRequestSerializer(serializers.ModelSerializer):
         )
         read_only_fields = (
             'id',
+            'uuid',
             'input_data',
             'full_response',
+            'probability',
             'response',
             'created_at',
             'parent_mlalgorithm',
         )
 
 
-class MLAlgorithmStatusSerializer(serializers.ModelSerializer):
+class MLAlgorithmStatusSerializer(SparseFieldsModelSerializer):
     class Meta:
         model = MLAlgorithmStatus
         fields = (
@@ -76,7 +96,50 @@ class MLAlgorithmStatusSerializer(serializers.ModelSerializer):
         )
 
 
+class ABTestArmSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ABTestArm
+        fields = (
+            'parent_mlalgorithm',
+            'weight',
+        )
+
+
 class ABTestSerializer(serializers.ModelSerializer):
+    arms = ABTestArmSerializer(source='ab_test_arm', many=True, required=False)
+
+    def validate(self, data):
+        # tests are started with two algorithms and equal weights, or with a list of weighted arms
+        arms = data.get('ab_test_arm')
+        if not arms:
+            if not data.get('parent_mlalgorithm_1') or not data.get('parent_mlalgorithm_2'):
+                raise serializers.ValidationError("Two algorithms or a list of arms are required.")
+            arms = [
+                {'parent_mlalgorithm': data['parent_mlalgorithm_1'], 'weight': 1.0},
+                {'parent_mlalgorithm': data['parent_mlalgorithm_2'], 'weight': 1.0},
+            ]
+
+        if len(arms) < 2:
+            raise serializers.ValidationError("At least two arms are required.")
+        if len({arm['parent_mlalgorithm'] for arm in arms}) != len(arms):
+            raise serializers.ValidationError("The algorithms of the arms must be different.")
+
+        weights = [arm.get('weight', 1.0) for arm in arms]
+        if min(weights) < 0 or sum(weights) <= 0:
+            raise serializers.ValidationError("Weights must be non-negative with a positive sum.")
+
+        data['ab_test_arm'] = arms
+        data['parent_mlalgorithm_1'] = arms[0]['parent_mlalgorithm']
+        data['parent_mlalgorithm_2'] = arms[1]['parent_mlalgorithm']
+        return data
+
+    def create(self, validated_data):
+        arms = validated_data.pop('ab_test_arm')
+        instance = super().create(validated_data)
+        ABTestArm.objects.bulk_create([ABTestArm(ab_test=instance, **arm) for arm in arms])
+
+        return instance
+
     class Meta:
         model = ABTest
         fields = (
@@ -88,6 +151,7 @@ class ABTestSerializer(serializers.ModelSerializer):
             'summary',
             'parent_mlalgorithm_1',
             'parent_mlalgorithm_2',
+            'arms',
         )
         read_only_fields = (
             'id',
@@ -95,3 +159,42 @@ class ABTestSerializer(serializers.ModelSerializer):
             'created_at',
             'summary',
         )
+        extra_kwargs = {
+            'parent_mlalgorithm_1': {'required': False},
+            'parent_mlalgorithm_2': {'required': False},
+        }
+
+
+class BatchScoringJobSerializer(SparseFieldsModelSerializer):
+    progress = serializers.SerializerMethodField(read_only=True)
+
+    def get_progress(self, batch_scoring_job):
+        if batch_scoring_job.status == 'completed':
+            return 1.0
+        if not batch_scoring_job.total_chunks:
+            return 0.0
+        return batch_scoring_job.completed_chunks / batch_scoring_job.total_chunks
+
+    class Meta:
+        model = BatchScoringJob
+        fields = (
+            'id',
+            'uuid',
+            'status',
+            'progress',
+            'input_file',
+            'file_format',
+            'output_file',
+            'total_chunks',
+            'completed_chunks',
+            'total_rows',
+            'processed_rows',
+            'error_rows',
+            'message',
+            'created_by',
+            'created_at',
+            'started_at',
+            'ended_at',
+            'parent_mlalgorithm',
+        )
+        read_only_fields = fields
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.endpoints.counters import count_ml_request_feedback, count_ml_requests
+from apps.endpoints.models import ABTest, ABTestArm, Endpoint, MLAlgorithm, MLAlgorithmStatus, MLAlgorithmRequest
+from apps.endpoints.versions import bump_table_version
+from apps.ml.registry import bump_routes_version
+
+
+@receiver(post_save, sender=Endpoint)
+@receiver(post_delete, sender=Endpoint)
+@receiver(post_save, sender=MLAlgorithm)
+@receiver(post_delete, sender=MLAlgorithm)
+@receiver(post_save, sender=MLAlgorithmStatus)
+@receiver(post_delete, sender=MLAlgorithmStatus)
+@receiver(post_save, sender=ABTest)
+@receiver(post_save, sender=ABTestArm)
+@receiver(post_delete, sender=ABTestArm)
+def invalidate_ml_registry_routes(sender, **kwargs):
+    transaction.on_commit(bump_routes_version)
+
+
+@receiver(post_save, sender=Endpoint)
+@receiver(post_delete, sender=Endpoint)
+@receiver(post_save, sender=MLAlgorithm)
+@receiver(post_delete, sender=MLAlgorithm)
+@receiver(post_save, sender=MLAlgorithmStatus)
+@receiver(post_delete, sender=MLAlgorithmStatus)
+def invalidate_list_versions(sender, **kwargs):
+    transaction.on_commit(lambda: bump_table_version(sender))
+
+
+@receiver(pre_save, sender=MLAlgorithmRequest)
+def store_ml_request_feedback(sender, instance, **kwargs):
+    instance.old_feedback = None
+    if instance.pk is not None:
+        instance.old_feedback = sender.objects.filter(pk=instance.pk).values_list('feedback', flat=True).first()
+
+
+# predictions are written with bulk_create, which counts them itself, this covers single saves (e.g. the admin)
+@receiver(post_save, sender=MLAlgorithmRequest)
+def count_ml_request(sender, instance, created, **kwargs):
+    if created:
+        count_ml_requests([instance])
+    else:
+        count_ml_request_feedback([(instance, instance.old_feedback)])
@@ -0,0 +1,99 @@
+import math
+from statistics import NormalDist
+
+from apps.endpoints.counters import get_ab_test_counters
+
+
+def get_ratio(numerator, denominator):
+    """
+    Returns the ratio of the given counts, or None if the denominator is zero.
+    """
+    return numerator / denominator if denominator else None
+
+
+def get_accuracy(counter):
+    """
+    Returns the accuracy counted by the given A/B test counter, the share of correct responses among the responses
+    with feedback, or None if no response has feedback.
+    """
+    return get_ratio(counter.correct, counter.with_feedback)
+
+
+def get_wilson_interval(successes, n, confidence):
+    """
+    Returns the Wilson score interval of a proportion, which stays within [0, 1] for small samples.
+    """
+    if not n:
+        return None
+
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    p = successes / n
+    denominator = 1 + z ** 2 / n
+    center = (p + z ** 2 / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+
+    return [max(0.0, center - margin), min(1.0, center + margin)]
+
+
+def get_two_proportion_test(successes_1, n_1, successes_2, n_2):
+    """
+    Returns the z-score and two-sided p-value of the difference between two proportions.
+    """
+    if not n_1 or not n_2:
+        return None, None
+
+    pooled = (successes_1 + successes_2) / (n_1 + n_2)
+    standard_error = math.sqrt(pooled * (1 - pooled) * (1 / n_1 + 1 / n_2))
+    if not standard_error:
+        return 0.0, 1.0
+
+    z = (successes_1 / n_1 - successes_2 / n_2) / standard_error
+    return z, 2 * (1 - NormalDist().cdf(abs(z)))
+
+
+def get_ab_test_stats(ab_test, confidence):
+    """
+    Returns the current statistics of the given A/B test from its pre-aggregated counters.
+
+    The accuracy of an arm is the share of correct responses among the responses with feedback. Every arm is
+    compared with the first arm, and the difference is significant when the two-proportion test rejects equal
+    accuracy at the given confidence.
+    """
+    counters = get_ab_test_counters(ab_test)
+
+    arms = []
+    for parent_mlalgorithm_id, counter in counters.items():
+        arms.append({
+            'parent_mlalgorithm': parent_mlalgorithm_id,
+            'requests': counter.total,
+            'with_feedback': counter.with_feedback,
+            'correct': counter.correct,
+            'feedback_coverage': get_ratio(counter.with_feedback, counter.total),
+            'accuracy': get_accuracy(counter),
+            'confidence_interval': get_wilson_interval(counter.correct, counter.with_feedback, confidence),
+            'z_score': None,
+            'p_value': None,
+            'significant': False,
+        })
+
+    control = arms[0]
+    for arm in arms[1:]:
+        z_score, p_value = get_two_proportion_test(
+            arm['correct'], arm['with_feedback'], control['correct'], control['with_feedback']
+        )
+        arm.update({
+            'z_score': z_score,
+            'p_value': p_value,
+            'significant': p_value is not None and p_value < 1 - confidence,
+        })
+
+    return {
+        'id': ab_test.id,
+        'title': ab_test.title,
+        'running': ab_test.ended_at is None,
+        'created_at': ab_test.created_at,
+        'ended_at': ab_test.ended_at,
+        'confidence': confidence,
+        'arms': arms,
+        'significant': any(arm['significant'] for arm in arms),
+    }
@@ -0,0 +1,124 @@
+import codecs
+import csv
+import itertools
+import json
+import os
+
+FILE_FORMATS = {
+    'csv': 'csv',
+    'text/csv': 'csv',
+    'jsonl': 'jsonl',
+    'ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+}
+
+
+def get_file_format(file_format=None, file_name=None, content_type=None):
+    """
+    Returns the record file format (csv or jsonl) from the explicit format, the file extension or the content type.
+    """
+    if not file_format and file_name:
+        file_format = os.path.splitext(file_name)[1].lstrip('.')
+    if not file_format and content_type:
+        file_format = content_type.split(';')[0].strip()
+
+    return FILE_FORMATS.get((file_format or '').lower())
+
+
+def iter_lines(binary_lines):
+    """
+    Decodes an iterable of binary lines or chunks, e.g. an uploaded file or a request, line by line without reading
+    it into memory.
+
+    Every line is decoded on its own, so a UnicodeDecodeError is only raised once all the lines before the first
+    invalid line are yielded.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer = b''
+    for chunk in binary_lines:
+        lines = (buffer + chunk).split(b'\n')
+        buffer = lines.pop()
+        for line in lines:
+            yield decoder.decode(line + b'\n')
+
+    line = decoder.decode(buffer, final=True)
+    if line:
+        yield line
+
+
+def iter_csv_records(lines):
+    """
+    Yields (row number, record) pairs from CSV lines with a header, with empty values as missing values.
+
+    Rows that cannot be parsed are yielded as a ValueError and skipped. The file cannot be read past bytes that are not
+    valid UTF-8, so reading stops after the ValueError of the row they are in.
+    """
+    reader = csv.DictReader(lines)
+    row = 0
+    while True:
+        row += 1
+        try:
+            record = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield row, ValueError("Invalid CSV: {}".format(e))
+            continue
+        except UnicodeDecodeError as e:
+            yield row, ValueError("Invalid UTF-8: {}".format(e))
+            return
+
+        yield row, {key: value if value != '' else None for key, value in record.items()}
+
+
+def iter_jsonl_records(lines):
+    """
+    Yields (row number, record) pairs from JSON lines, with a ValueError in place of records that are not objects.
+
+    Reading stops after the ValueError of a line that is not valid UTF-8.
+    """
+    lines = iter(lines)
+    row = 0
+    while True:
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except UnicodeDecodeError as e:
+            yield row + 1, ValueError("Invalid UTF-8: {}".format(e))
+            return
+
+        if not line.strip():
+            continue
+
+        row += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row, ValueError("Invalid JSON: {}".format(e))
+            continue
+
+        if not isinstance(record, dict):
+            record = ValueError("Expected a JSON object.")
+
+        yield row, record
+
+
+RECORD_READERS = {
+    'csv': iter_csv_records,
+    'jsonl': iter_jsonl_records,
+}
+
+
+def iter_chunks(iterable, size):
+    """
+    Splits an iterable into lists of the given size, without reading it into memory.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+
+        yield chunk
@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.endpoints.buffers import create_ml_requests
+from apps.endpoints.models import BatchScoringJob, MLAlgorithmRequest
+from apps.endpoints.partitions import archive_expired_requests, create_partitions, is_partitioned
+from apps.endpoints.streaming import RECORD_READERS, iter_chunks, iter_lines
+from apps.utils.helpers.django import remove_storage_file_if_exists
+
+logger = logging.getLogger('custom')
+
+
+@shared_task
+def task_save_ml_algorithm_requests(ml_requests):
+    # only (uuid, created_at) is unique, so the records of a retried batch that were already written are skipped
+    # by uuid, looking only at the partitions of the batch
+    ml_requests = list({
+        ml_request['uuid']: {**ml_request, 'created_at': parse_datetime(ml_request['created_at'])}
+        for ml_request in ml_requests
+    }.values())
+
+    existing_uuids = set(MLAlgorithmRequest.objects.filter(
+        uuid__in=[ml_request['uuid'] for ml_request in ml_requests],
+        created_at__gte=min(ml_request['created_at'] for ml_request in ml_requests),
+        created_at__lte=max(ml_request['created_at'] for ml_request in ml_requests),
+    ).values_list('uuid', flat=True)) if ml_requests else set()
+
+    new_ml_requests = [
+        MLAlgorithmRequest(**ml_request) for ml_request in ml_requests
+        if uuid.UUID(ml_request['uuid']) not in existing_uuids
+    ]
+    create_ml_requests(new_ml_requests, ignore_conflicts=True)
+
+
+def get_chunk_path(job, name, chunk_index):
+    return os.path.join(settings.ML_BATCH_SCORING_DIR, str(job.uuid), '{}-{:05d}.jsonl'.format(name, chunk_index))
+
+
+def fail_batch_scoring_job(job_id, e):
+    logger.error('Batch scoring job {} failed: {}'.format(job_id, e))
+    BatchScoringJob.objects.filter(pk=job_id).exclude(status='failed').update(
+        status='failed', message=str(e), ended_at=timezone.now()
+    )
+
+
+@shared_task
+def task_run_batch_scoring_job(job_id):
+    """
+    Splits the input file of the job into chunk files and fans the chunks out to task_score_batch_chunk.
+    """
+    job = BatchScoringJob.objects.get(pk=job_id)
+
+    try:
+        BatchScoringJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+
+        total_chunks, total_rows = 0, 0
+        with default_storage.open(job.input_file.name, 'rb') as f:
+            records = RECORD_READERS[job.file_format](iter_lines(f))
+
+            for chunk_index, chunk in enumerate(iter_chunks(records, settings.ML_BATCH_SCORING_CHUNK_SIZE)):
+                lines = []
+                for row, record in chunk:
+                    if isinstance(record, dict):
+                        lines.append(json.dumps({'row': row, 'record': record}))
+                    else:
+                        lines.append(json.dumps({'row': row, 'error': str(record)}))
+
+                chunk_path = get_chunk_path(job, 'input', chunk_index)
+                remove_storage_file_if_exists(chunk_path)
+                default_storage.save(chunk_path, ContentFile('\n'.join(lines).encode()))
+
+                total_chunks += 1
+                total_rows += len(chunk)
+
+        BatchScoringJob.objects.filter(pk=job_id).update(total_chunks=total_chunks, total_rows=total_rows)
+
+    except Exception as e:
+        fail_batch_scoring_job(job_id, e)
+        return
+
+    if total_chunks == 0:
+        task_complete_batch_scoring_job.apply_async((job_id,), queue='queue_long')
+
+    for chunk_index in range(total_chunks):
+        task_score_batch_chunk.apply_async((job_id, chunk_index), queue='queue_long')
+
+
+@shared_task
+def task_score_batch_chunk(job_id, chunk_index):
+    """
+    Scores one chunk file of the job, and completes the job when it is the last chunk to finish.
+    """
+    # imported here, as the registry registers the algorithms on import, which needs the apps to be ready
+    from apps.ml.registration import registry
+
+    job = BatchScoringJob.objects.get(pk=job_id)
+    if job.status != 'running' or chunk_index in job.completed_chunk_indexes:
+        return
+
+    try:
+        algorithm_object = registry.endpoints.get(job.parent_mlalgorithm_id)
+        if algorithm_object is None:
+            raise ValueError('ML algorithm {} is not available'.format(job.parent_mlalgorithm_id))
+
+        input_path = get_chunk_path(job, 'input', chunk_index)
+        with default_storage.open(input_path, 'rb') as f:
+            items = [json.loads(line) for line in iter_lines(f) if line.strip()]
+
+        valid_items = [item for item in items if 'record' in item]
+        predictions = algorithm_object.compute_predictions([item['record'] for item in valid_items])
+        results = {item['row']: prediction for item, prediction in zip(valid_items, predictions)}
+
+        lines, error_rows = [], 0
+        for item in items:
+            result = results.get(item['row']) or {'status': 'Error', 'message': item.get('error')}
+            if result.get('status') != 'OK':
+                error_rows += 1
+            lines.append(json.dumps({'row': item['row'], **result}))
+
+        output_path = get_chunk_path(job, 'output', chunk_index)
+        remove_storage_file_if_exists(output_path)
+        default_storage.save(output_path, ContentFile('\n'.join(lines).encode()))
+
+    except Exception as e:
+        fail_batch_scoring_job(job_id, e)
+        return
+
+    # the row lock makes a retried chunk count once, and exactly one chunk task see the last completed chunk
+    with transaction.atomic():
+        job = BatchScoringJob.objects.select_for_update().only(
+            'completed_chunk_indexes', 'completed_chunks', 'total_chunks'
+        ).get(pk=job_id)
+        if chunk_index in job.completed_chunk_indexes:
+            return
+
+        BatchScoringJob.objects.filter(pk=job_id).update(
+            completed_chunk_indexes=job.completed_chunk_indexes + [chunk_index],
+            completed_chunks=F('completed_chunks') + 1,
+            processed_rows=F('processed_rows') + len(items),
+            error_rows=F('error_rows') + error_rows,
+        )
+        is_last = job.completed_chunks + 1 == job.total_chunks
+
+    # the input is kept until the chunk is counted, so that a chunk task retried before is scored again
+    remove_storage_file_if_exists(input_path)
+
+    if is_last:
+        task_complete_batch_scoring_job.apply_async((job_id,), queue='queue_long')
+
+
+@shared_task
+def task_complete_batch_scoring_job(job_id):
+    """
+    Concatenates the scored chunk files of the job into its output file.
+    """
+    job = BatchScoringJob.objects.get(pk=job_id)
+
+    try:
+        with tempfile.TemporaryFile() as output:
+            for chunk_index in range(job.total_chunks):
+                output_path = get_chunk_path(job, 'output', chunk_index)
+                with default_storage.open(output_path, 'rb') as f:
+                    for data in f.chunks():
+                        output.write(data)
+                output.write(b'\n')
+
+            output.seek(0)
+            job.output_file.save('output.jsonl', File(output), save=False)
+
+        for chunk_index in range(job.total_chunks):
+            remove_storage_file_if_exists(get_chunk_path(job, 'output', chunk_index))
+
+        job.status = 'completed'
+        job.ended_at = timezone.now()
+        job.save(update_fields=['output_file', 'status', 'ended_at', 'modified_at'])
+
+    except Exception as e:
+        fail_batch_scoring_job(job_id, e)
+
+
+@shared_task
+def task_archive_ml_algorithm_requests():
+    """
+    Archives and removes the request log periods older than the retention, and creates the upcoming partitions.
+    """
+    now = timezone.now()
+
+    archived = []
+    if settings.ML_REQUEST_LOG_RETENTION_DAYS:
+        archived = archive_expired_requests(
+            now - timedelta(days=settings.ML_REQUEST_LOG_RETENTION_DAYS),
+            settings.ML_REQUEST_LOG_ARCHIVE_DIR,
+            settings.ML_REQUEST_LOG_ARCHIVE_CHUNK_SIZE,
+        )
+
+    if is_partitioned():
+        create_partitions(now, settings.ML_REQUEST_LOG_PARTITIONS_AHEAD)
+
+    return [dict(period, start=str(period['start']), end=str(period['end'])) for period in archived]
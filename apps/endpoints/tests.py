@@ -0,0 +1,775 @@
+import csv
+import datetime
+import gzip
+import inspect
+import io
+import json
+import tempfile
+import threading
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.account.authentication import api_key_cache
+from apps.account.models import APIKey, User
+from apps.core import celery_app
+from apps.endpoints.buffers import MLAlgorithmRequestBuffer, get_ml_request_id, serialize_ml_request
+from apps.endpoints.counters import rebuild_ab_test_counters
+from apps.endpoints.feedback import apply_feedback, parse_request_id
+from apps.endpoints.pagination import KeysetPagination
+from apps.endpoints.partitions import archive_expired_requests, is_partitioned, purge_unreferenced_inputs
+from apps.endpoints.models import ABTest, ABTestCounter, BatchScoringJob, Endpoint, MLAlgorithm, MLAlgorithmLabel, \
+    MLAlgorithmInput, MLAlgorithmRequest, MLAlgorithmStatus
+from apps.endpoints.stats import get_two_proportion_test, get_wilson_interval
+from apps.endpoints.tasks import task_save_ml_algorithm_requests, task_score_batch_chunk
+from apps.ml.deployments.income_classifier.et_classifier import ETClassifier
+from apps.ml.deployments.income_classifier.rf_classifier import RFClassifier
+from apps.ml.registration import registry
+
+
+class EndpointsTestCase(TestCase):
+    input_data = {
+        'age': 37,
+        'workclass': 'Private',
+        'fnlwgt': 34146,
+        'education': 'HS-grad',
+        'education-num': 9,
+        'marital-status': 'Married-civ-spouse',
+        'occupation': 'Craft-repair',
+        'relationship': 'Husband',
+        'race': 'White',
+        'sex': 'Male',
+        'capital-gain': 0,
+        'capital-loss': 0,
+        'hours-per-week': 68,
+        'native-country': 'United-States'
+    }
+
+    def setUp(self):
+        registry.endpoints.clear()
+        registry.add_algorithm("income_classifier", RFClassifier(), "random forest", "production", "0.0.1",
+                               "Piotr", "Random Forest with simple pre- and post-processing",
+                               inspect.getsource(RFClassifier))
+        registry.add_algorithm("income_classifier", ETClassifier(), "extra trees", "testing", "0.0.1",
+                               "Piotr", "Extra Trees with simple pre- and post-processing",
+                               inspect.getsource(ETClassifier))
+
+        self.user = User.objects.create_user(username='piotr', email='piotr@example.com', password='secret-password')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.user.tokens['access']))
+
+
+class EndpointsTests(EndpointsTestCase):
+    def test_predict_batch(self):
+        records = [self.input_data, dict(self.input_data, age=60), dict(self.input_data, workclass='unknown')]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+
+        self.assertEqual(200, response.status_code)
+        predictions = response.json()
+        self.assertEqual(3, len(predictions))
+        for prediction in predictions[:2]:
+            self.assertEqual('OK', prediction['status'])
+            self.assertEqual({'probability', 'label', 'status', 'request_id'}, set(prediction))
+        self.assertEqual('Error', predictions[2]['status'])
+
+        ml_requests = MLAlgorithmRequest.objects.order_by('id')
+        self.assertEqual([prediction['request_id'] for prediction in predictions],
+                         [ml_request.id for ml_request in ml_requests])
+        self.assertEqual(['<=50K', 'error'], [ml_requests[0].response, ml_requests[2].response])
+
+        inserts = [query for query in queries.captured_queries
+                   if query['sql'].startswith('INSERT INTO "endpoints_mlalgorithmrequest"')]
+        self.assertEqual(1, len(inserts))
+
+    def test_predict_batch_validation(self):
+        response = self.client.post('/api/v1/predict/income_classifier/batch/', self.input_data, format='json')
+        self.assertEqual(400, response.status_code)
+        self.assertEqual('Error', response.json()['status'])
+
+        response = self.client.post('/api/v1/predict/income_classifier/batch/', [], format='json')
+        self.assertEqual(400, response.status_code)
+        self.assertFalse(MLAlgorithmRequest.objects.exists())
+
+    def test_predict_file(self):
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(self.input_data))
+        writer.writeheader()
+        for age in range(20, 70):
+            writer.writerow(dict(self.input_data, age=age))
+
+        file = SimpleUploadedFile('records.csv', output.getvalue().encode())
+        response = self.client.post('/api/v1/predict/income_classifier/file/', {'file': file}, format='multipart')
+        self.assertEqual(200, response.status_code)
+
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(list(range(1, 51)), [line['row'] for line in lines])
+        self.assertTrue(all(line['status'] == 'OK' for line in lines))
+        self.assertEqual(50, MLAlgorithmRequest.objects.count())
+
+        single = self.client.post('/api/v1/predict/income_classifier/', dict(self.input_data, age=20), format='json')
+        self.assertAlmostEqual(single.json()['probability'], lines[0]['probability'])
+
+    def test_predict_file_errors(self):
+        content = '\n'.join([json.dumps(self.input_data), 'not json', '[1]', '', json.dumps(self.input_data)])
+        response = self.client.generic('POST', '/api/v1/predict/income_classifier/file/', content.encode(),
+                                       content_type='application/x-ndjson')
+        self.assertEqual(200, response.status_code)
+
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(['OK', 'Error', 'Error', 'OK'], [line['status'] for line in lines])
+
+        response = self.client.generic('POST', '/api/v1/predict/income_classifier/file/', b'age',
+                                       content_type='text/plain')
+        self.assertEqual(400, response.status_code)
+
+        # rows that cannot be read are reported, and reading stops at bytes that are not valid UTF-8
+        header = ','.join(self.input_data).encode()
+        row = ','.join(str(value) for value in self.input_data.values()).encode()
+        content = b'\n'.join([header, row, b'x' * 200000, row, b'\xff' + row, row])
+        response = self.client.generic('POST', '/api/v1/predict/income_classifier/file/', content,
+                                       content_type='text/csv')
+        self.assertEqual(200, response.status_code)
+
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(1, 'OK'), (2, 'Error'), (3, 'OK'), (4, 'Error')],
+                         [(line['row'], line['status']) for line in lines])
+        self.assertIn('Invalid UTF-8', lines[3]['message'])
+
+    def test_compact_storage(self):
+        records = [self.input_data, dict(self.input_data, age=60), self.input_data, dict(self.input_data, age=60)]
+        predictions = self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json').json()
+
+        # identical inputs and labels are stored once, whatever the order of their keys
+        self.assertEqual(2, MLAlgorithmInput.objects.count())
+        self.assertEqual(len({prediction['label'] for prediction in predictions}), MLAlgorithmLabel.objects.count())
+        reordered_data = dict(reversed(list(self.input_data.items())))
+        self.assertEqual(MLAlgorithmInput.objects.get_ids([self.input_data]),
+                         MLAlgorithmInput.objects.get_ids([reordered_data]))
+        self.assertEqual(2, MLAlgorithmInput.objects.count())
+        self.assertEqual(MLAlgorithmLabel.objects.get_ids(['<=50K', 'error']),
+                         MLAlgorithmLabel.objects.get_ids(['<=50K', 'error']))
+
+        # the requests read back the same inputs and responses they were written with, newest first
+        ml_requests = self.client.get('/api/v1/ml-algorithm-request/').json()['results'][::-1]
+        self.assertEqual(4, len(ml_requests))
+        for ml_request, record, prediction in zip(ml_requests, records, predictions):
+            self.assertEqual(record, ml_request['input_data'])
+            self.assertEqual(prediction['request_id'], ml_request['id'])
+            self.assertEqual({key: prediction[key] for key in ('probability', 'label', 'status')},
+                             ml_request['full_response'])
+            self.assertEqual(prediction['label'], ml_request['response'])
+
+
+class BatchScoringJobTests(EndpointsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_root_settings = self.settings(MEDIA_ROOT=media_root.name, ML_BATCH_SCORING_CHUNK_SIZE=20)
+        media_root_settings.enable()
+        self.addCleanup(media_root_settings.disable)
+
+        # the chunk tasks run in the test process, one after the other
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+
+    def test_job(self):
+        content = '\n'.join(
+            json.dumps(dict(self.input_data, age=age, workclass='unknown' if age == 30 else 'Private'))
+            for age in range(20, 70)
+        )
+        file = SimpleUploadedFile('records.jsonl', content.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/predict/income_classifier/job/', {'file': file}, format='multipart')
+        self.assertEqual(201, response.status_code)
+
+        job = BatchScoringJob.objects.get(uuid=response.json()['uuid'])
+        self.assertEqual('completed', job.status)
+        self.assertEqual((50, 50, 1, 3, 3),
+                         (job.total_rows, job.processed_rows, job.error_rows, job.total_chunks, job.completed_chunks))
+
+        lines = [json.loads(line) for line in job.output_file.open('rb').read().decode().splitlines()]
+        self.assertEqual(list(range(1, 51)), [line['row'] for line in lines])
+        self.assertEqual('Error', lines[10]['status'])
+
+        # a chunk task that runs again is not counted twice
+        BatchScoringJob.objects.filter(pk=job.pk).update(status='running')
+        task_score_batch_chunk(job.id, 0)
+        job.refresh_from_db()
+        self.assertEqual((50, 3, [0, 1, 2]), (job.processed_rows, job.completed_chunks, job.completed_chunk_indexes))
+
+    def test_job_validation(self):
+        response = self.client.post('/api/v1/predict/income_classifier/job/', {'input_file': 'missing.csv'},
+                                    format='json')
+        self.assertEqual(400, response.status_code)
+
+        # only files stored under the job uploads can be scored
+        content = ContentFile(json.dumps(self.input_data).encode())
+        input_file = default_storage.save('endpoints/batchscoringjob/exports/records.jsonl', content)
+        other_file = default_storage.save('exports/records.jsonl', content)
+        for path in (other_file, 'endpoints/batchscoringjob/../../' + other_file):
+            response = self.client.post('/api/v1/predict/income_classifier/job/', {'input_file': path},
+                                        format='json')
+            self.assertEqual(400, response.status_code)
+        self.assertFalse(BatchScoringJob.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/predict/income_classifier/job/', {'input_file': input_file},
+                                        format='json')
+        self.assertEqual(201, response.status_code)
+        self.assertEqual('completed', BatchScoringJob.objects.get().status)
+
+
+class ListTests(EndpointsTestCase):
+    def test_keyset_pagination(self):
+        records = [dict(self.input_data, age=age) for age in range(20, 45)]
+        self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+        ids = list(MLAlgorithmRequest.objects.order_by('id').values_list('id', flat=True))
+        # requests created at the same time are ordered by id
+        MLAlgorithmRequest.objects.filter(id__in=ids[:10]).update(
+            created_at=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+
+        page_ids, query_counts = [], []
+        url = '/api/v1/ml-algorithm-request/?page_size=4'
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                page = self.client.get(url).json()
+            self.assertEqual({'next', 'results'}, set(page))
+            self.assertLessEqual(len(page['results']), 4)
+            page_ids.extend(ml_request['id'] for ml_request in page['results'])
+            query_counts.append(len(queries.captured_queries))
+            url = page['next']
+
+        self.assertEqual(ids[10:][::-1] + ids[:10][::-1], page_ids)
+        self.assertEqual(1, len(set(query_counts)))
+
+        # without a cursor or a page size the list starts with a first page of the default page size
+        self.addCleanup(setattr, KeysetPagination, 'page_size', KeysetPagination.page_size)
+        KeysetPagination.page_size = 10
+        page = self.client.get('/api/v1/ml-algorithm-request/').json()
+        self.assertEqual(page_ids[:10], [ml_request['id'] for ml_request in page['results']])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page_ids[10:20], [ml_request['id'] for ml_request in page['results']])
+
+        page = self.client.get('/api/v1/ml-algorithm-request/?page_size=100000').json()
+        self.assertEqual(25, len(page['results']))
+        self.assertIsNone(page['next'])
+
+        self.assertEqual(404, self.client.get('/api/v1/ml-algorithm-request/?cursor=invalid').status_code)
+
+    def test_filters(self):
+        records = [dict(self.input_data, age=age) for age in range(20, 25)]
+        self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+        ids = list(MLAlgorithmRequest.objects.order_by('id').values_list('id', flat=True))
+        MLAlgorithmRequest.objects.filter(id__in=ids[:2]).update(
+            created_at=datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc))
+
+        def get_ids(query):
+            response = self.client.get('/api/v1/ml-algorithm-request/?' + query)
+            self.assertEqual(200, response.status_code)
+            return sorted(ml_request['id'] for ml_request in response.json()['results'])
+
+        self.assertEqual(ids[:3], get_ids('id__in={},{},{}'.format(*ids[:3])))
+        self.assertEqual(ids[2:], get_ids('created_at__gte=2026-02-01T00:00:00Z'))
+
+        label_id = MLAlgorithmLabel.objects.get_ids(['<=50K'])[0]
+        self.assertEqual(ids, get_ids('response_label={}'.format(label_id)))
+        statuses = self.client.get('/api/v1/ml-algorithm-status/?status=production').json()['results']
+        self.assertEqual(['production'], [status['status'] for status in statuses])
+
+        # only the filters on indexed columns are accepted
+        for query in ('unknown=1', 'response=<=50K', 'feedback=', 'feedback__contains=x', 'id=invalid',
+                      'created_at__gte=invalid', 'uuid=1'):
+            response = self.client.get('/api/v1/ml-algorithm-request/?' + query)
+            self.assertEqual(400, response.status_code, query)
+        response = self.client.get('/api/v1/ml-algorithm/?name=random forest&version=0.0.1')
+        self.assertEqual(400, response.status_code)
+
+
+    def test_fields(self):
+        algorithm = MLAlgorithm.objects.get(name='extra trees')
+        for i in range(10):
+            new_algorithm = MLAlgorithm.objects.create(
+                name='extra trees', description='', code='pass\n' * 10000, version='0.1.{}'.format(i),
+                owner='Piotr', parent_endpoint_id=algorithm.parent_endpoint_id
+            )
+            MLAlgorithmStatus.objects.create(status='testing', active=False, created_by='Piotr',
+                                             parent_mlalgorithm=new_algorithm)
+            MLAlgorithmStatus.objects.create(status='staging', active=True, created_by='Piotr',
+                                             parent_mlalgorithm=new_algorithm)
+
+        # the code is only loaded when it is requested, and the statuses come with the list in one query
+        with CaptureQueriesContext(connection) as queries:
+            algorithms = self.client.get('/api/v1/ml-algorithm/').json()['results']
+        self.assertEqual(12, len(algorithms))
+        self.assertNotIn('code', algorithms[0])
+        statuses = {algorithm['id']: algorithm['current_status'] for algorithm in algorithms}
+        self.assertEqual('testing', statuses.pop(algorithm.id))
+        self.assertEqual(['production'] + ['staging'] * 10, sorted(statuses.values()))
+        list_queries = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT') and 'FROM "endpoints_mlalgorithm"' in query['sql']]
+        self.assertEqual(1, len(list_queries))
+        self.assertNotIn('"code"', list_queries[0])
+
+        response = self.client.get('/api/v1/ml-algorithm/?fields=id,code&id={}'.format(new_algorithm.id))
+        algorithms = response.json()['results']
+        self.assertEqual([{'id': new_algorithm.id, 'code': 'pass\n' * 10000}], algorithms)
+
+        with CaptureQueriesContext(connection) as queries:
+            algorithms = self.client.get('/api/v1/ml-algorithm/?fields=id,name').json()['results']
+        self.assertEqual({'id', 'name'}, set(algorithms[0]))
+        self.assertFalse(any('endpoints_mlalgorithmstatus' in query['sql'] for query in queries.captured_queries))
+
+        prediction = self.client.post('/api/v1/predict/income_classifier/', self.input_data, format='json').json()
+        ml_requests = self.client.get('/api/v1/ml-algorithm-request/?fields=id,response').json()['results']
+        self.assertEqual([{'id': prediction['request_id'], 'response': prediction['label']}], ml_requests)
+        statuses = self.client.get('/api/v1/ml-algorithm-status/?fields=status').json()['results']
+        self.assertEqual({'status'}, set(statuses[0]))
+
+        response = self.client.get('/api/v1/ml-algorithm/?fields=id,unknown')
+        self.assertEqual(400, response.status_code)
+
+
+class APIKeyTests(EndpointsTestCase):
+    def setUp(self):
+        super().setUp()
+        api_key_cache.clear()
+        self.addCleanup(api_key_cache.clear)
+
+    def predict(self, key):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Api-Key {}'.format(key))
+        return client.post('/api/v1/predict/income_classifier/', self.input_data, format='json')
+
+    def test_api_key(self):
+        api_key, key = APIKey.objects.create_key(self.user, 'scoring service')
+        self.assertEqual(200, self.predict(key).status_code)
+
+        # the key is cached, so later requests run no account query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.predict(key)
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(any('account_' in query['sql'] for query in queries.captured_queries))
+
+        # API keys are only accepted by the prediction endpoints
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Api-Key {}'.format(key))
+        self.assertEqual(401, client.get('/api/v1/endpoint/').status_code)
+        self.assertEqual(401, self.predict(key[:-1] + ('a' if key[-1] != 'a' else 'b')).status_code)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            api_key.revoke()
+        self.assertEqual(401, self.predict(key).status_code)
+
+    def test_api_key_scope(self):
+        api_key, key = APIKey.objects.create_key(self.user, 'scoring service', endpoints=['other_classifier'])
+        self.assertEqual(403, self.predict(key).status_code)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            api_key.endpoints = ['income_classifier']
+            api_key.save()
+        self.assertEqual(200, self.predict(key).status_code)
+
+    def test_unknown_api_key(self):
+        self.assertEqual(401, self.predict('unknown.secret').status_code)
+
+        # unknown prefixes are cached for a while, so bogus keys do not cost a query each
+        with CaptureQueriesContext(connection) as queries:
+            response = self.predict('unknown.secret')
+        self.assertEqual(401, response.status_code)
+        self.assertFalse(any('account_apikey' in query['sql'] for query in queries.captured_queries))
+
+
+class ConditionalListTests(EndpointsTestCase):
+    def setUp(self):
+        super().setUp()
+        settings = self.settings(ML_LIST_CACHE_ALIAS='default')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # the table versions outlive the test transactions
+        cache.clear()
+
+    def get_endpoint_queries(self, queries):
+        return [query['sql'] for query in queries.captured_queries if 'endpoints_' in query['sql']]
+
+    def test_etag(self):
+        response = self.client.get('/api/v1/ml-algorithm/')
+        etag = response['ETag']
+        self.assertEqual('private, no-cache', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        # a client holding the current version gets a 304 without the list being queried
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/ml-algorithm/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(etag, response['ETag'])
+        self.assertEqual([], self.get_endpoint_queries(queries))
+
+        self.assertNotEqual(etag, self.client.get('/api/v1/ml-algorithm/?fields=id')['ETag'])
+        endpoint_etag = self.client.get('/api/v1/endpoint/')['ETag']
+        self.assertEqual(304, self.client.get('/api/v1/endpoint/', HTTP_IF_NONE_MATCH=endpoint_etag).status_code)
+
+        # a committed change of a table behind the list makes the ETag stale
+        algorithm = MLAlgorithm.objects.get(name='extra trees')
+        with self.captureOnCommitCallbacks(execute=True):
+            MLAlgorithmStatus.objects.create(status='staging', active=True, created_by='Piotr',
+                                             parent_mlalgorithm=algorithm)
+        response = self.client.get('/api/v1/ml-algorithm/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertNotEqual(etag, response['ETag'])
+        self.assertIn('staging', [algorithm['current_status'] for algorithm in response.json()['results']])
+
+        # the other lists are not affected
+        self.assertEqual(304, self.client.get('/api/v1/endpoint/', HTTP_IF_NONE_MATCH=endpoint_etag).status_code)
+
+    def test_modified_since(self):
+        # only the ETag is compared, a change made within the second of Last-Modified is not missed
+        last_modified = self.client.get('/api/v1/ml-algorithm/')['Last-Modified']
+        response = self.client.get('/api/v1/ml-algorithm/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(200, response.status_code)
+
+    def test_no_shared_cache(self):
+        # without a cache shared by all workers the versions are not kept, and the lists are served as usual
+        with self.settings(ML_LIST_CACHE_ALIAS=None):
+            response = self.client.get('/api/v1/ml-algorithm/')
+            self.assertEqual(200, response.status_code)
+            self.assertNotIn('ETag', response)
+            self.assertEqual(200, self.client.get('/api/v1/ml-algorithm/', HTTP_IF_NONE_MATCH='"etag"').status_code)
+
+    def test_body_cache(self):
+        with self.settings(ML_LIST_CACHE_ENABLED=True):
+            response = self.client.get('/api/v1/ml-algorithm/')
+            with CaptureQueriesContext(connection) as queries:
+                cached_response = self.client.get('/api/v1/ml-algorithm/')
+            self.assertEqual([], self.get_endpoint_queries(queries))
+            self.assertEqual(response.content, cached_response.content)
+            self.assertEqual(response['ETag'], cached_response['ETag'])
+            self.assertEqual(response['Content-Type'], cached_response['Content-Type'])
+
+            algorithm = MLAlgorithm.objects.get(name='extra trees')
+            with self.captureOnCommitCallbacks(execute=True):
+                algorithm.description = 'Extra Trees'
+                algorithm.save()
+            algorithms = self.client.get('/api/v1/ml-algorithm/').json()['results']
+            self.assertIn('Extra Trees', [algorithm['description'] for algorithm in algorithms])
+
+
+class RequestLogArchiveTests(EndpointsTestCase):
+    def setUp(self):
+        super().setUp()
+
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_root_settings = self.settings(MEDIA_ROOT=media_root.name)
+        media_root_settings.enable()
+        self.addCleanup(media_root_settings.disable)
+
+    def test_archive_expired_requests(self):
+        if is_partitioned():
+            self.skipTest('The periods of a partitioned request log are its partitions.')
+
+        records = [dict(self.input_data, age=age) for age in range(20, 27)]
+        self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+        ids = list(MLAlgorithmRequest.objects.order_by('id').values_list('id', flat=True))
+        MLAlgorithmRequest.objects.filter(id__in=ids[:3]).update(
+            created_at=datetime.datetime(2026, 1, 3, tzinfo=datetime.timezone.utc))
+        MLAlgorithmRequest.objects.filter(id__in=ids[3:5]).update(
+            created_at=datetime.datetime(2026, 3, 3, tzinfo=datetime.timezone.utc))
+
+        cutoff = datetime.datetime(2026, 3, 20, tzinfo=datetime.timezone.utc)
+        archived = archive_expired_requests(cutoff, 'request_log_archive', chunk_size=2)
+
+        # only whole months before the cutoff are archived, and empty months have no file
+        self.assertEqual([3, 0], [period['rows'] for period in archived])
+        self.assertIsNone(archived[1]['file'])
+        with default_storage.open(archived[0]['file']) as archive:
+            lines = gzip.decompress(archive.read()).decode().splitlines()
+        archived_requests = [json.loads(line) for line in lines]
+        self.assertEqual(ids[:3], [ml_request['id'] for ml_request in archived_requests])
+        self.assertEqual(records[:3], [ml_request['input_data'] for ml_request in archived_requests])
+
+        self.assertEqual(ids[3:], list(MLAlgorithmRequest.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(4, MLAlgorithmInput.objects.count())
+        self.assertEqual([], archive_expired_requests(cutoff, 'request_log_archive', chunk_size=2))
+
+    def test_purge_unreferenced_inputs(self):
+        records = [dict(self.input_data, age=age) for age in range(20, 25)]
+        self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+
+        MLAlgorithmRequest.objects.filter(request_input__data__age__lt=23).delete()
+        self.assertEqual(3, purge_unreferenced_inputs(chunk_size=2))
+        self.assertEqual(2, MLAlgorithmInput.objects.count())
+        self.assertEqual(0, purge_unreferenced_inputs(chunk_size=2))
+
+
+class ABTestTests(EndpointsTestCase):
+    def start_ab_test(self):
+        algorithm_ids = list(MLAlgorithm.objects.order_by('id').values_list('id', flat=True))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/start_ab/', {
+                'title': 'random forest vs extra trees',
+                'created_by': 'Piotr',
+                'parent_mlalgorithm_1': algorithm_ids[0],
+                'parent_mlalgorithm_2': algorithm_ids[1],
+            }, format='json')
+        self.assertEqual(201, response.status_code)
+
+        return ABTest.objects.get(pk=response.json()['id'])
+
+    def get_counts(self, ab_test):
+        return sorted(ab_test.ab_test_counter.values_list('parent_mlalgorithm_id', 'total', 'with_feedback', 'correct'))
+
+    def test_ab_test_counters(self):
+        ab_test = self.start_ab_test()
+        records = [dict(self.input_data, age=age) for age in range(20, 60)]
+        self.client.post('/api/v1/predict/income_classifier/batch/?status=ab_testing', records, format='json')
+        self.client.post('/api/v1/predict/income_classifier/?status=ab_testing', self.input_data, format='json')
+
+        for i, ml_request in enumerate(MLAlgorithmRequest.objects.order_by('id')[:20]):
+            ml_request.feedback = ml_request.response if i % 3 else 'wrong'
+            ml_request.save()
+        ml_request.feedback = ''
+        ml_request.save()
+
+        counts = self.get_counts(ab_test)
+        self.assertEqual(41, sum(total for _, total, _, _ in counts))
+        self.assertEqual(19, sum(with_feedback for _, _, with_feedback, _ in counts))
+        self.assertEqual(12, sum(correct for _, _, _, correct in counts))
+
+        # the incremental counts match the counts rebuilt from the request log
+        ABTestCounter.objects.update(total=0, with_feedback=0, correct=0)
+        rebuild_ab_test_counters()
+        self.assertEqual(counts, self.get_counts(ab_test))
+
+        ABTestCounter.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/stop_ab/{}/'.format(ab_test.id))
+        self.assertEqual('AB Test finished.', response.json()['message'])
+        self.assertEqual(counts, self.get_counts(ab_test))
+        self.assertEqual(1, MLAlgorithmStatus.objects.filter(status='production', active=True).count())
+
+    def test_feedback(self):
+        ab_test = self.start_ab_test()
+        records = [dict(self.input_data, age=age) for age in range(20, 50)]
+        self.client.post('/api/v1/predict/income_classifier/batch/?status=ab_testing', records, format='json')
+        ml_requests = list(MLAlgorithmRequest.objects.order_by('id'))
+
+        items = [{'request_id': ml_request.id, 'feedback': '<=50K'} for ml_request in ml_requests[:10]]
+        items += [
+            {'request_id': str(ml_requests[10].uuid), 'feedback': '>50K'},
+            {'request_id': 0, 'feedback': '<=50K'},
+            {'request_id': 'unknown', 'feedback': '<=50K'},
+            {'feedback': '<=50K'},
+        ]
+        with self.settings(ML_FEEDBACK_CHUNK_SIZE=5):
+            response = self.client.post('/api/v1/ml-algorithm-request/feedback/', items, format='json')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'received': 14, 'matched': 11, 'unknown': 1, 'invalid': 2, 'unknown_ids': ['0']},
+                         response.json())
+
+        body = 'request_id,feedback\n' + ''.join(
+            '{},>50K\n'.format(ml_request.uuid) for ml_request in ml_requests[11:20])
+        response = self.client.post('/api/v1/ml-algorithm-request/feedback/',
+                                    {'file': SimpleUploadedFile('feedback.csv', body.encode())}, format='multipart')
+        self.assertEqual(9, response.json()['matched'])
+        self.assertEqual(20, MLAlgorithmRequest.objects.exclude(feedback='').count())
+
+        # the counters are updated with the feedback as if it was set one request at a time
+        counts = self.get_counts(ab_test)
+        self.assertEqual(20, sum(with_feedback for _, _, with_feedback, _ in counts))
+        rebuild_ab_test_counters()
+        self.assertEqual(counts, self.get_counts(ab_test))
+
+        # a request sent by its id and by its uuid is counted once, with the feedback sent last
+        apply_feedback([{'request_id': ml_requests[20].id, 'feedback': '<=50K'},
+                        {'request_id': str(ml_requests[20].uuid), 'feedback': '>50K'}], chunk_size=10)
+        self.assertEqual('>50K', MLAlgorithmRequest.objects.get(pk=ml_requests[20].pk).feedback)
+        counts = self.get_counts(ab_test)
+        self.assertEqual(21, sum(with_feedback for _, _, with_feedback, _ in counts))
+        rebuild_ab_test_counters()
+        self.assertEqual(counts, self.get_counts(ab_test))
+
+    def test_apply_feedback(self):
+        records = [dict(self.input_data, age=age) for age in range(20, 50)]
+        self.client.post('/api/v1/predict/income_classifier/batch/', records, format='json')
+        ml_requests = list(MLAlgorithmRequest.objects.order_by('id'))
+
+        self.assertEqual(('id', 7), parse_request_id(7))
+        self.assertEqual(('id', 7), parse_request_id(' 7 '))
+        self.assertEqual(('uuid', ml_requests[0].uuid), parse_request_id(str(ml_requests[0].uuid)))
+        self.assertIsNone(parse_request_id(True))
+        self.assertIsNone(parse_request_id(None))
+
+        # each chunk is applied with one select and one bulk update, whatever its size
+        query_counts = []
+        for chunk in (ml_requests[:5], ml_requests[5:]):
+            with CaptureQueriesContext(connection) as queries:
+                result = apply_feedback([{'request_id': ml_request.id, 'feedback': '>50K'} for ml_request in chunk],
+                                        chunk_size=100)
+            self.assertEqual(len(chunk), result['matched'])
+            query_counts.append(len(queries.captured_queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+        self.assertEqual(30, MLAlgorithmRequest.objects.filter(feedback='>50K').count())
+
+    def test_wilson_interval(self):
+        self.assertIsNone(get_wilson_interval(0, 0, 0.95))
+
+        lower, upper = get_wilson_interval(8, 10, 0.95)
+        self.assertAlmostEqual(0.4902, lower, places=4)
+        self.assertAlmostEqual(0.9433, upper, places=4)
+
+        # unlike the normal approximation, the interval stays within [0, 1] at the extremes
+        lower, upper = get_wilson_interval(0, 5, 0.95)
+        self.assertAlmostEqual(0.0, lower)
+        self.assertAlmostEqual(0.4345, upper, places=4)
+        self.assertEqual(1.0, get_wilson_interval(5, 5, 0.95)[1])
+
+        lower, upper = get_wilson_interval(8, 10, 0.95)
+        narrow_lower, narrow_upper = get_wilson_interval(800, 1000, 0.95)
+        self.assertTrue(lower < narrow_lower < 0.8 < narrow_upper < upper)
+        self.assertLess(get_wilson_interval(8, 10, 0.99)[0], get_wilson_interval(8, 10, 0.95)[0])
+
+        z_score, p_value = get_two_proportion_test(400, 500, 360, 500)
+        self.assertAlmostEqual(2.9617, z_score, places=4)
+        self.assertAlmostEqual(0.0031, p_value, places=4)
+        self.assertEqual((None, None), get_two_proportion_test(1, 0, 1, 1))
+
+    def test_ab_test_stats(self):
+        ab_test = self.start_ab_test()
+        counters = ABTestCounter.objects.filter(ab_test=ab_test)
+        counters.filter(parent_mlalgorithm_id=ab_test.parent_mlalgorithm_1_id).update(
+            total=1000, with_feedback=500, correct=400)
+        counters.filter(parent_mlalgorithm_id=ab_test.parent_mlalgorithm_2_id).update(
+            total=1000, with_feedback=500, correct=360)
+
+        stats = self.client.get('/api/v1/stats_ab/{}/'.format(ab_test.id)).json()
+        self.assertEqual([0.8, 0.72], [arm['accuracy'] for arm in stats['arms']])
+        self.assertEqual([0.5, 0.5], [arm['feedback_coverage'] for arm in stats['arms']])
+        self.assertTrue(stats['significant'])
+
+        stats = self.client.get('/api/v1/stats_ab/{}/?confidence=0.999'.format(ab_test.id)).json()
+        self.assertFalse(stats['significant'])
+
+        self.assertEqual(400, self.client.get('/api/v1/stats_ab/{}/?confidence=2'.format(ab_test.id)).status_code)
+        self.assertEqual(404, self.client.get('/api/v1/stats_ab/0/').status_code)
+
+    def test_stop_ab_test_accuracy(self):
+        ab_test = self.start_ab_test()
+        algorithm_1, algorithm_2 = ab_test.parent_mlalgorithm_1_id, ab_test.parent_mlalgorithm_2_id
+
+        # the winner has the most correct responses among all responses, not the best accuracy on the feedback alone
+        counters = ABTestCounter.objects.filter(ab_test=ab_test)
+        counters.filter(parent_mlalgorithm_id=algorithm_1).update(total=1000, with_feedback=10, correct=9)
+        counters.filter(parent_mlalgorithm_id=algorithm_2).update(total=1000, with_feedback=500, correct=400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/stop_ab/{}/'.format(ab_test.id))
+
+        production = MLAlgorithmStatus.objects.get(status='production', active=True)
+        self.assertEqual(algorithm_2, production.parent_mlalgorithm_id)
+
+
+class BufferTests(TransactionTestCase):
+    def setUp(self):
+        # the labels of the previous tests are cached with their ids, but their rows are flushed
+        MLAlgorithmLabel.objects.ids.clear()
+        MLAlgorithmLabel.objects.names.clear()
+
+        endpoint = Endpoint.objects.create(name='income_classifier', owner='Piotr')
+        self.algorithm = MLAlgorithm.objects.create(parent_endpoint=endpoint, name='random forest', description='',
+                                                    code='', version='0.0.1', owner='Piotr')
+
+    def create_ml_request(self, age):
+        return MLAlgorithmRequest(
+            input_data={'age': age},
+            full_response={'probability': 0.4, 'label': '<=50K', 'status': 'OK'},
+            response='<=50K',
+            feedback='',
+            parent_mlalgorithm_id=self.algorithm.id,
+        )
+
+    def test_buffer(self):
+        with CaptureQueriesContext(connection) as queries:
+            ml_requests = [self.create_ml_request(age) for age in range(5)]
+        self.assertEqual(0, len(queries.captured_queries))
+
+        ml_request_buffer = MLAlgorithmRequestBuffer(max_size=10, batch_size=2, flush_interval=0.05)
+        ml_request_buffer.put(ml_requests)
+        ml_request_buffer.stop()
+
+        self.assertEqual(sorted(ml_request.uuid for ml_request in ml_requests),
+                         sorted(MLAlgorithmRequest.objects.values_list('uuid', flat=True)))
+        self.assertEqual({'<=50K'}, {ml_request.response for ml_request in MLAlgorithmRequest.objects.all()})
+
+        # the records may not be written when the response is returned, so they are identified by their uuid
+        with self.settings(ML_REQUEST_LOG_MODE='buffered'):
+            self.assertEqual(str(ml_requests[0].uuid), get_ml_request_id(ml_requests[0]))
+
+    def test_buffer_write_error(self):
+        ml_requests = [self.create_ml_request(age) for age in range(3)]
+        ml_requests[1].parent_mlalgorithm_id = self.algorithm.id + 1
+
+        ml_request_buffer = MLAlgorithmRequestBuffer(max_size=10, batch_size=10, flush_interval=0.05)
+        with self.assertLogs('custom', 'ERROR') as logs:
+            ml_request_buffer.write(ml_requests)
+        self.assertEqual(0, MLAlgorithmRequest.objects.count())
+
+        # the dropped records are logged, so they can be written again
+        dropped = [json.loads(line.split('Dropped ML request: ')[1]) for line in logs.output if 'Dropped' in line]
+        self.assertEqual([str(ml_request.uuid) for ml_request in ml_requests], [record['uuid'] for record in dropped])
+        dropped[1]['parent_mlalgorithm_id'] = self.algorithm.id
+        task_save_ml_algorithm_requests(dropped)
+        self.assertEqual(3, MLAlgorithmRequest.objects.count())
+
+    def test_purge_locked_inputs(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('The inputs are only locked for writers on Postgres.')
+
+        MLAlgorithmInput.objects.get_ids([{'age': 37}])
+        locked, released = threading.Event(), threading.Event()
+
+        def write():
+            # the writer reads the input id and holds its lock until the request is committed
+            with transaction.atomic():
+                input_id = MLAlgorithmInput.objects.get_ids([{'age': 37}])[0]
+                locked.set()
+                released.wait(5)
+                ml_request = self.create_ml_request(37)
+                ml_request.request_input_id = input_id
+                ml_request.response_label_id = MLAlgorithmLabel.objects.get_ids(['<=50K'])[0]
+                ml_request.save()
+            connection.close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        locked.wait(5)
+        self.assertEqual(0, purge_unreferenced_inputs(chunk_size=10))
+        released.set()
+        thread.join()
+
+        self.assertEqual(1, MLAlgorithmRequest.objects.count())
+        self.assertEqual(0, purge_unreferenced_inputs(chunk_size=10))
+
+    def test_celery_sink(self):
+        ml_request = self.create_ml_request(37)
+        ml_request.created_at = timezone.now() - datetime.timedelta(minutes=5)
+
+        # a retried batch and a record sent twice are written once, with the time of the request
+        task_save_ml_algorithm_requests([serialize_ml_request(ml_request)] * 2)
+        task_save_ml_algorithm_requests([serialize_ml_request(ml_request)])
+
+        saved_ml_request = MLAlgorithmRequest.objects.get()
+        self.assertEqual(ml_request.uuid, saved_ml_request.uuid)
+        self.assertEqual(ml_request.created_at, saved_ml_request.created_at)
+        self.assertEqual(({'age': 37}, '<=50K'), (saved_ml_request.input_data, saved_ml_request.response))
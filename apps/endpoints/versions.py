@@ -0,0 +1,57 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+TABLE_VERSION_CACHE_KEY = "table_version:{}"
+
+
+def get_table_version_key(model):
+    return TABLE_VERSION_CACHE_KEY.format(model._meta.label_lower)
+
+
+def get_version_cache():
+    # versions bumped by one worker must reach every other, which the per-process default cache does not
+    return caches[settings.ML_LIST_CACHE_ALIAS] if settings.ML_LIST_CACHE_ALIAS else None
+
+
+def get_table_versions(models):
+    """
+    Returns the shared change versions of the given models, initialising the ones the cache has no value for.
+
+    A version is the time in nanoseconds of the last change of the table, so it also gives its last modified date.
+    Versions do not expire, since a version dropped while the table is unchanged would only invalidate the ETags.
+    """
+    cache = get_version_cache()
+    keys = [get_table_version_key(model) for model in models]
+
+    versions = cache.get_many(keys)
+    missing_keys = [key for key in keys if key not in versions]
+    if missing_keys:
+        for key in missing_keys:
+            cache.add(key, time.time_ns(), None)
+        versions.update(cache.get_many(missing_keys))
+
+    return [versions[key] for key in keys]
+
+
+def bump_table_version(model):
+    """
+    Sets a new change version for the table of the given model, so responses built from it are not reused.
+    """
+    cache = get_version_cache()
+    if cache is not None:
+        cache.set(get_table_version_key(model), time.time_ns(), None)
+
+
+def get_etag(versions, *parts):
+    """
+    Returns a strong ETag over the given table versions and the other parts identifying a response.
+    """
+    etag = hashlib.blake2b(digest_size=16)
+    for part in (*versions, *parts):
+        etag.update(str(part).encode())
+        etag.update(b'\0')
+
+    return '"{}"'.format(etag.hexdigest())
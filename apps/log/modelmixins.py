@@ -28,5 +28,5 @@ class ActionLogMixin(models.Model):
             self.log_action(**action_kwargs)
 
     def log_action(self, **kwargs):
-        action_log_model = apps.get_model('common_log', 'ActionLog')
+        action_log_model = apps.get_model('log', 'ActionLog')
         action_log_model.objects.build(instance=self, **kwargs).save()
@@ -0,0 +1,110 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+import joblib
+from django.conf import settings
+
+
+class ArtifactStore:
+    """
+    Loads model artifacts once per process, deduplicated by the content hash of the artifact file.
+
+    With an mmap mode (e.g. 'r'), artifacts are loaded from an uncompressed copy in the cache directory with
+    memory mapping, so the numpy arrays they hold are backed by the page cache and shared between all worker
+    processes on the node. Compressed joblib files cannot be memory mapped directly, which is why the copy is used.
+    """
+
+    def __init__(self, mmap_mode=None, cache_dir=None):
+        self.mmap_mode = mmap_mode
+        self.cache_dir = cache_dir
+
+        self.lock = threading.RLock()
+        self.hashes = {}
+        self.objects = {}
+
+    def get_hash(self, path):
+        stat = os.stat(path)
+        stat_key = (path, stat.st_size, stat.st_mtime_ns)
+
+        content_hash = self.hashes.get(stat_key)
+        if content_hash is None:
+            file_hash = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+
+            content_hash = file_hash.hexdigest()
+            self.hashes[stat_key] = content_hash
+
+        return content_hash
+
+    def get_cache_path(self, key):
+        return os.path.join(self.cache_dir, '{}.joblib'.format(key))
+
+    def dump_cache(self, obj, cache_path):
+        # write to a temporary file first, so that concurrently starting workers never load a partial file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+
+        try:
+            joblib.dump(obj, tmp_path)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def load_cached(self, key, build):
+        """
+        Returns the object stored under the given key, building it with the given function on first use.
+        """
+        with self.lock:
+            if key in self.objects:
+                return self.objects[key]
+
+            if self.mmap_mode is None:
+                obj = build()
+            else:
+                cache_path = self.get_cache_path(key)
+                if not os.path.exists(cache_path):
+                    self.dump_cache(build(), cache_path)
+                obj = joblib.load(cache_path, mmap_mode=self.mmap_mode)
+
+            self.objects[key] = obj
+            return obj
+
+    def load(self, path):
+        return self.load_cached(self.get_hash(path), lambda: joblib.load(path))
+
+    def load_compiled(self, path, compiler):
+        """
+        Returns the artifact at the given path compiled with the given class, e.g. a CompiledForest.
+
+        Only the compiled object is kept, the source artifact is not stored once it is compiled. The key includes the
+        format version of the compiler, so that cached copies written by an older compiler are rebuilt.
+        """
+        content_hash = self.get_hash(path)
+        key = '{}.{}.v{}'.format(content_hash, compiler.__name__.lower(), compiler.format_version)
+        return self.load_cached(key, lambda: compiler(self.load_uncached(content_hash, path)))
+
+    def load_uncached(self, content_hash, path):
+        with self.lock:
+            if content_hash in self.objects:
+                return self.objects[content_hash]
+
+        return joblib.load(path)
+
+    def get_stats(self):
+        return {
+            'mmap_mode': self.mmap_mode,
+            'cache_dir': self.cache_dir,
+            'objects': sorted(self.objects),
+        }
+
+
+artifact_store = ArtifactStore(
+    mmap_mode=settings.ML_ARTIFACTS_MMAP_MODE,
+    cache_dir=settings.ML_ARTIFACTS_CACHE_DIR,
+)
@@ -0,0 +1,97 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+
+logger = logging.getLogger('custom')
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single predictions for an algorithm into one vectorized prediction.
+
+    The first caller to arrive becomes the leader of a batch. It waits up to `max_wait` seconds, or until
+    `max_batch_size` records are pending, then computes the predictions for all pending records with one call to
+    compute_predictions and hands every caller its own result. Other attributes are forwarded to the wrapped
+    algorithm object, so a batcher can be used in its place.
+
+    Batching only helps when requests are served concurrently in one process, e.g. gunicorn with --threads.
+    A caller that does not get its result within `timeout` seconds, e.g. because the leader failed or is stuck,
+    computes its prediction itself.
+    """
+
+    def __init__(self, algorithm_object, max_batch_size, max_wait, timeout):
+        self.algorithm_object = algorithm_object
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self.condition = threading.Condition()
+        self.pending = []
+
+    def __getattr__(self, name):
+        return getattr(self.algorithm_object, name)
+
+    def compute_prediction(self, input_data):
+        if not isinstance(input_data, dict):
+            return self.algorithm_object.compute_prediction(input_data)
+
+        future = Future()
+        with self.condition:
+            self.pending.append((input_data, future))
+            is_leader = len(self.pending) == 1
+
+            if len(self.pending) >= self.max_batch_size:
+                self.condition.notify_all()
+
+        if is_leader:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self.pending) >= self.max_batch_size, timeout=self.max_wait)
+                batch, self.pending = self.pending, []
+
+            self.run(batch)
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self.condition:
+                if (input_data, future) in self.pending:
+                    self.pending.remove((input_data, future))
+            logger.warning('Micro-batch prediction timed out after {}s, predicting inline'.format(self.timeout))
+            return self.algorithm_object.compute_prediction(input_data)
+
+    def run(self, batch):
+        for i in range(0, len(batch), self.max_batch_size):
+            chunk = batch[i:i + self.max_batch_size]
+            try:
+                predictions = self.algorithm_object.compute_predictions([input_data for input_data, _ in chunk])
+            except Exception as e:
+                predictions = [{'status': 'Error', 'message': str(e)} for _ in chunk]
+
+            for (_, future), prediction in zip(chunk, predictions):
+                future.set_result(prediction)
+
+
+micro_batchers = {}
+micro_batchers_lock = threading.Lock()
+
+
+def get_micro_batcher(algorithm_id, algorithm_object):
+    """
+    Returns the micro-batcher for the given algorithm, creating it on first use.
+    """
+    micro_batcher = micro_batchers.get(algorithm_id)
+    if micro_batcher is None or micro_batcher.algorithm_object is not algorithm_object:
+        with micro_batchers_lock:
+            micro_batcher = micro_batchers.get(algorithm_id)
+            if micro_batcher is None or micro_batcher.algorithm_object is not algorithm_object:
+                micro_batcher = MicroBatcher(
+                    algorithm_object,
+                    max_batch_size=settings.ML_MICRO_BATCH_MAX_SIZE,
+                    max_wait=settings.ML_MICRO_BATCH_MAX_WAIT,
+                    timeout=settings.ML_MICRO_BATCH_TIMEOUT,
+                )
+                micro_batchers[algorithm_id] = micro_batcher
+
+    return micro_batcher
@@ -0,0 +1,141 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger('custom')
+
+
+class PredictionCache:
+    """
+    Two-tier cache of prediction results keyed on the canonical input and the algorithm.
+
+    The first tier is an in-process LRU with a TTL, the optional second tier is a shared Django cache (e.g. Redis).
+    Keys include the content hash of the algorithm and the artifacts fingerprint of the algorithm object, so cached
+    results are only invalidated when the code or the artifacts of that algorithm change, not by status changes.
+    """
+
+    def __init__(self, max_size, ttl, shared_cache_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_cache_alias = shared_cache_alias
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @property
+    def shared_cache(self):
+        return caches[self.shared_cache_alias] if self.shared_cache_alias else None
+
+    @staticmethod
+    def get_key(algorithm_id, algorithm_object, content_hash, input_data):
+        canonical_input = json.dumps(input_data, sort_keys=True, separators=(',', ':'), default=str)
+        key = '{}:{}:{}:{}'.format(algorithm_id, content_hash, algorithm_object.artifacts_fingerprint,
+                                   canonical_input)
+
+        return 'ml_prediction:' + hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def get_local(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set_local(self, key, value, shared_hit=False):
+        with self.lock:
+            self.shared_hits += shared_hit
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_shared(self, key):
+        try:
+            return self.shared_cache.get(key)
+        except Exception as e:
+            logger.error('Failed to read the shared prediction cache: {}'.format(e))
+            return None
+
+    def set_shared(self, key, value):
+        try:
+            self.shared_cache.set(key, value, self.ttl)
+        except Exception as e:
+            logger.error('Failed to write the shared prediction cache: {}'.format(e))
+
+    def compute_prediction(self, algorithm_id, algorithm_object, content_hash, input_data):
+        """
+        Returns a copy of the cached prediction for the given input, computing and caching it on a miss.
+
+        Only successful predictions are cached.
+        """
+        key = self.get_key(algorithm_id, algorithm_object, content_hash, input_data)
+
+        prediction = self.get_local(key)
+        if prediction is not None:
+            return copy.copy(prediction)
+
+        if self.shared_cache is not None:
+            prediction = self.get_shared(key)
+            if prediction is not None:
+                self.set_local(key, prediction, shared_hit=True)
+                return copy.copy(prediction)
+
+        with self.lock:
+            self.misses += 1
+        prediction = algorithm_object.compute_prediction(input_data)
+
+        if prediction.get('status') == 'OK':
+            self.set_local(key, copy.copy(prediction))
+            if self.shared_cache is not None:
+                self.set_shared(key, prediction)
+
+        return prediction
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            size, hits, shared_hits, misses = len(self.entries), self.hits, self.shared_hits, self.misses
+
+        lookups = hits + shared_hits + misses
+        return {
+            'pid': os.getpid(),
+            'enabled': settings.ML_PREDICTION_CACHE_ENABLED,
+            'size': size,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'shared_cache': self.shared_cache_alias,
+            'hits': hits,
+            'shared_hits': shared_hits,
+            'misses': misses,
+            'hit_ratio': (hits + shared_hits) / lookups if lookups else None,
+        }
+
+
+prediction_cache = PredictionCache(
+    max_size=settings.ML_PREDICTION_CACHE_SIZE,
+    ttl=settings.ML_PREDICTION_CACHE_TTL,
+    shared_cache_alias=settings.ML_PREDICTION_CACHE_ALIAS,
+)
@@ -0,0 +1,63 @@
+import math
+
+import numpy as np
+
+
+class FeatureEncoder:
+    """
+    Encodes input records into a feature array in training column order without pandas.
+
+    The encoder is compiled once from the fitted label encoders and the training mode values. Categorical columns
+    are encoded with dict lookup tables and missing values are filled with the training mode. Unseen categories
+    are handled according to the unknown policy:
+        error: raise a ValueError.
+        fill: encode the category as the training mode.
+    """
+    unknown_policies = ('error', 'fill')
+
+    def __init__(self, encoders, values_fill_missing, unknown_policy='error'):
+        if unknown_policy not in self.unknown_policies:
+            raise ValueError("Unknown policy must be one of: {}".format(', '.join(self.unknown_policies)))
+
+        self.columns = list(values_fill_missing)
+        self.unknown_policy = unknown_policy
+
+        self.plan = []
+        for column in self.columns:
+            lookup = None
+            fill_value = values_fill_missing[column]
+
+            if column in encoders:
+                lookup = {category: float(code) for code, category in enumerate(encoders[column].classes_)}
+                fill_value = lookup[fill_value]
+
+            self.plan.append((column, lookup, float(fill_value)))
+
+    def encode(self, column, lookup, fill_value, value):
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return fill_value
+
+        if lookup is None:
+            return float(value)
+
+        code = lookup.get(value)
+        if code is None:
+            if self.unknown_policy == 'error':
+                raise ValueError("Column '{}' contains previously unseen category: '{}'".format(column, value))
+            return fill_value
+
+        return code
+
+    def transform(self, input_data):
+        """
+        Returns the feature array for a single record or a list of records.
+        """
+        records = [input_data] if isinstance(input_data, dict) else input_data
+
+        features = np.empty((len(records), len(self.plan)), dtype=np.float64)
+        for i, record in enumerate(records):
+            row = features[i]
+            for j, (column, lookup, fill_value) in enumerate(self.plan):
+                row[j] = self.encode(column, lookup, fill_value, record.get(column))
+
+        return features
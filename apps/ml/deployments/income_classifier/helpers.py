@@ -1,33 +1,48 @@
-import pandas as pd
+import hashlib
+
+from apps.ml.artifacts import artifact_store
+from apps.ml.forest import CompiledForest
 
 
 class Helpers:
     values_fill_missing = None
     encoders = None
+    feature_encoder = None
     model = None
+    artifacts_fingerprint = ''
+
+    # the artifact files the algorithm loads, part of its registration content hash
+    artifact_paths = ()
+
+    # subclasses with tree-ensemble models can opt into the flat array inference engine
+    compile_model = False
+    compiled_model = None
+
+    def update_fingerprint(self, path):
+        # the fingerprint changes whenever the content of any of the loaded artifacts changes
+        fingerprint = self.artifacts_fingerprint + artifact_store.get_hash(path)
+        self.artifacts_fingerprint = hashlib.blake2b(fingerprint.encode(), digest_size=8).hexdigest()
+
+    def load_artifact(self, path):
+        self.update_fingerprint(path)
+        return artifact_store.load(path)
+
+    def load_model(self, path):
+        if self.compile_model:
+            # only the compiled model is kept in memory, the sklearn estimator is released after compilation
+            self.update_fingerprint(path)
+            self.compiled_model = artifact_store.load_compiled(path, CompiledForest)
+            return None
+
+        return self.load_artifact(path)
 
     def preprocessing(self, input_data):
-        input_data = pd.DataFrame(input_data, index=[0])
-        input_data.fillna(self.values_fill_missing)
-
-        encode_cols = [
-            'workclass',
-            'education',
-            'marital-status',
-            'occupation',
-            'relationship',
-            'race',
-            'sex',
-            'native-country'
-        ]
-
-        for column in encode_cols:
-            categorical_convert = self.encoders[column]
-            input_data[column] = categorical_convert.transform(input_data[column])
-
-        return input_data
+        return self.feature_encoder.transform(input_data)
 
     def predict(self, input_data):
+        if self.compiled_model is not None:
+            return self.compiled_model.predict_proba(input_data)
+
         return self.model.predict_proba(input_data)
 
     def process_prediction(self, input_data):
@@ -52,3 +67,14 @@ class Helpers:
             return {'status': 'Error', 'message': str(e)}
 
         return pred_data
+
+    def compute_predictions(self, input_data):
+        try:
+            features = self.preprocessing(input_data)
+            predictions = self.predict(features)
+            pred_data = [self.process_prediction(prediction) for prediction in predictions]
+        except Exception:
+            # fall back to one sample at a time so that a single bad record does not fail the batch
+            return [self.compute_prediction(record) for record in input_data]
+
+        return pred_data
@@ -1,8 +1,8 @@
 import os
 
-import joblib
 from django.conf import settings
 
+from .encoder import FeatureEncoder
 from .helpers import Helpers
 
 ARTIFACTS_DIR = os.path.join(settings.BASE_DIR, 'artifacts')
@@ -12,7 +12,19 @@ ARTIFACTS_PATH = os.path.join(ARTIFACTS_DIR, DEPLOYMENT)
 
 
 class RFClassifier(Helpers):
+    compile_model = True
+    artifact_paths = (
+        os.path.join(ARTIFACTS_PATH, 'train_mode.joblib'),
+        os.path.join(ARTIFACTS_PATH, 'encoders.joblib'),
+        os.path.join(ARTIFACTS_PATH, 'rf_classifier.joblib'),
+    )
+
     def __init__(self):
-        self.values_fill_missing = joblib.load(os.path.join(ARTIFACTS_PATH, 'train_mode.joblib'))
-        self.encoders = joblib.load(os.path.join(ARTIFACTS_PATH, 'encoders.joblib'))
-        self.model = joblib.load(os.path.join(ARTIFACTS_PATH, 'rf_classifier.joblib'))
+        train_mode_path, encoders_path, model_path = self.artifact_paths
+
+        self.values_fill_missing = self.load_artifact(train_mode_path)
+        self.encoders = self.load_artifact(encoders_path)
+        self.model = self.load_model(model_path)
+        self.feature_encoder = FeatureEncoder(
+            self.encoders, self.values_fill_missing, unknown_policy=settings.ML_ENCODER_UNKNOWN_POLICY
+        )
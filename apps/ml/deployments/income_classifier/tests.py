@@ -1,10 +1,27 @@
 import inspect
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import joblib
+import numpy as np
+from django.core.cache import cache
 from django.test import TestCase
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
 
 from apps.ml.deployments.income_classifier.et_classifier import ETClassifier
 from apps.ml.deployments.income_classifier.rf_classifier import RFClassifier
-from apps.ml.registry import MLRegistry
+from apps.endpoints.models import MLAlgorithm, MLAlgorithmStatus
+from apps.ml.deployments.income_classifier.encoder import FeatureEncoder
+from apps.ml.deployments.income_classifier.rf_classifier import ARTIFACTS_PATH
+from apps.ml.artifacts import ArtifactStore
+from apps.ml.batching import MicroBatcher
+from apps.ml.cache import PredictionCache
+from apps.ml.forest import CompiledForest
+from apps.ml.registry import ROUTES_VERSION_CACHE_KEY, MLRegistry
+from apps.ml.routing import TrafficSplit
 
 
 class MLTests(TestCase):
@@ -57,6 +74,225 @@ class MLTests(TestCase):
         self.assertTrue('label' in response)
         self.assertEqual('<=50K', response['label'])
 
+    def test_rf_algorithm_batch(self):
+        input_data = [
+            {
+                'age': 37,
+                'workclass': 'Private',
+                'fnlwgt': 34146,
+                'education': 'HS-grad',
+                'education-num': 9,
+                'marital-status': 'Married-civ-spouse',
+                'occupation': 'Craft-repair',
+                'relationship': 'Husband',
+                'race': 'White',
+                'sex': 'Male',
+                'capital-gain': 0,
+                'capital-loss': 0,
+                'hours-per-week': 68,
+                'native-country': 'United-States'
+            },
+            {
+                'age': 52,
+                'workclass': 'Self-emp-inc',
+                'fnlwgt': 287927,
+                'education': 'HS-grad',
+                'education-num': 9,
+                'marital-status': 'Married-civ-spouse',
+                'occupation': 'Exec-managerial',
+                'relationship': 'Wife',
+                'race': 'White',
+                'sex': 'Female',
+                'capital-gain': 15024,
+                'capital-loss': 0,
+                'hours-per-week': 40,
+                'native-country': 'United-States'
+            },
+        ]
+        my_alg = RFClassifier()
+
+        responses = my_alg.compute_predictions(input_data)
+        self.assertEqual(len(input_data), len(responses))
+        for record, response in zip(input_data, responses):
+            self.assertEqual('OK', response['status'])
+            self.assertEqual(my_alg.compute_prediction(record)['label'], response['label'])
+
+        input_data[1]['workclass'] = 'Unknown'
+        responses = my_alg.compute_predictions(input_data)
+        self.assertEqual('OK', responses[0]['status'])
+        self.assertEqual('Error', responses[1]['status'])
+
+    def test_feature_encoder(self):
+        input_data = {
+            'age': 37,
+            'workclass': 'Private',
+            'fnlwgt': 34146,
+            'education': 'HS-grad',
+            'education-num': 9,
+            'marital-status': 'Married-civ-spouse',
+            'occupation': 'Craft-repair',
+            'relationship': 'Husband',
+            'race': 'White',
+            'sex': 'Male',
+            'capital-gain': 0,
+            'capital-loss': 0,
+            'hours-per-week': 68,
+            'native-country': 'United-States'
+        }
+        my_alg = RFClassifier()
+        encoder = my_alg.feature_encoder
+
+        features = encoder.transform(input_data)
+        self.assertEqual((1, len(my_alg.values_fill_missing)), features.shape)
+        for j, column in enumerate(encoder.columns):
+            expected = input_data[column]
+            if column in my_alg.encoders:
+                expected = my_alg.encoders[column].transform([expected])[0]
+            self.assertEqual(expected, features[0, j])
+
+        missing_data = dict(input_data, occupation=None)
+        del missing_data['age']
+        features = encoder.transform([input_data, missing_data])
+        self.assertEqual((2, len(encoder.columns)), features.shape)
+        fill_data = dict(input_data, occupation=my_alg.values_fill_missing['occupation'],
+                         age=my_alg.values_fill_missing['age'])
+        self.assertTrue((encoder.transform(fill_data)[0] == features[1]).all())
+
+        unseen_data = dict(input_data, workclass='Unknown')
+        with self.assertRaises(ValueError):
+            encoder.transform(unseen_data)
+
+        encoder = FeatureEncoder(my_alg.encoders, my_alg.values_fill_missing, unknown_policy='fill')
+        fill_data = dict(input_data, workclass=my_alg.values_fill_missing['workclass'])
+        self.assertTrue((encoder.transform(fill_data) == encoder.transform(unseen_data)).all())
+
+    def test_prediction_cache(self):
+        input_data = {
+            'age': 37,
+            'workclass': 'Private',
+            'fnlwgt': 34146,
+            'education': 'HS-grad',
+            'education-num': 9,
+            'marital-status': 'Married-civ-spouse',
+            'occupation': 'Craft-repair',
+            'relationship': 'Husband',
+            'race': 'White',
+            'sex': 'Male',
+            'capital-gain': 0,
+            'capital-loss': 0,
+            'hours-per-week': 68,
+            'native-country': 'United-States'
+        }
+        my_alg = RFClassifier()
+        cache = PredictionCache(max_size=1, ttl=60)
+
+        response = cache.compute_prediction(1, my_alg, 1, input_data)
+        response['request_id'] = 1
+        self.assertEqual(my_alg.compute_prediction(input_data), cache.compute_prediction(1, my_alg, 1, input_data))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        # another content hash of the algorithm is another entry
+        cache.compute_prediction(1, my_alg, 2, dict(reversed(list(input_data.items()))))
+        cache.compute_prediction(1, my_alg, 1, input_data)
+        self.assertEqual((1, 2), (cache.hits, cache.misses - 1))
+
+        cache = PredictionCache(max_size=10, ttl=60)
+        records = [dict(input_data, age=age % 5) for age in range(200)]
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda record: cache.compute_prediction(1, my_alg, 1, record), records))
+        self.assertEqual(200, cache.hits + cache.misses)
+        self.assertEqual(200, cache.get_stats()['hits'] + cache.get_stats()['misses'])
+
+    def test_micro_batcher(self):
+        input_data = {
+            'age': 37,
+            'workclass': 'Private',
+            'fnlwgt': 34146,
+            'education': 'HS-grad',
+            'education-num': 9,
+            'marital-status': 'Married-civ-spouse',
+            'occupation': 'Craft-repair',
+            'relationship': 'Husband',
+            'race': 'White',
+            'sex': 'Male',
+            'capital-gain': 0,
+            'capital-loss': 0,
+            'hours-per-week': 68,
+            'native-country': 'United-States'
+        }
+        my_alg = RFClassifier()
+        batcher = MicroBatcher(my_alg, max_batch_size=8, max_wait=0.01, timeout=10)
+
+        records = [dict(input_data, age=age) for age in range(20, 60)]
+        records[5]['workclass'] = 'Unknown'
+        with ThreadPoolExecutor(8) as executor:
+            responses = list(executor.map(batcher.compute_prediction, records))
+
+        self.assertEqual([my_alg.compute_prediction(record) for record in records], responses)
+        self.assertEqual('Error', responses[5]['status'])
+
+        # a caller whose batch does not complete computes its prediction inline
+        released = threading.Event()
+
+        class StuckAlgorithm:
+            def compute_prediction(self, input_data):
+                return my_alg.compute_prediction(input_data)
+
+            def compute_predictions(self, input_data):
+                released.wait()
+                return my_alg.compute_predictions(input_data)
+
+        batcher = MicroBatcher(StuckAlgorithm(), max_batch_size=2, max_wait=1, timeout=0.05)
+        with ThreadPoolExecutor(2) as executor:
+            leader = executor.submit(batcher.compute_prediction, records[0])
+            while not batcher.pending:
+                time.sleep(0.001)
+            follower = executor.submit(batcher.compute_prediction, records[1])
+            self.assertEqual(my_alg.compute_prediction(records[1]), follower.result(timeout=5))
+            self.assertFalse(leader.done())
+            released.set()
+            self.assertEqual(my_alg.compute_prediction(records[0]), leader.result(timeout=5))
+
+    def assertForestEquivalent(self, model, X):
+        compiled_model = CompiledForest(model)
+        np.testing.assert_allclose(model.predict_proba(X), compiled_model.predict_proba(X), rtol=0, atol=1e-12)
+        np.testing.assert_array_equal(model.predict(X), compiled_model.predict(X))
+
+    def test_compiled_forest(self):
+        rng = np.random.default_rng(1234)
+
+        X = rng.normal(size=(2000, 5))
+        X[rng.random(X.shape) < 0.1] = np.nan
+        y = rng.integers(0, 3, len(X)) + (np.nan_to_num(X[:, 0]) > 0)
+        for model_class in (RandomForestClassifier, ExtraTreesClassifier):
+            model = model_class(n_estimators=20, random_state=0).fit(X, y)
+            self.assertForestEquivalent(model, X)
+            self.assertForestEquivalent(model, rng.normal(size=(500, 5)))
+
+        for my_alg in (RFClassifier(), ETClassifier()):
+            model = joblib.load(my_alg.artifact_paths[-1])
+            X = rng.normal(40, 30, size=(1000, model.n_features_in_))
+            self.assertForestEquivalent(model, X)
+
+    def test_artifact_store(self):
+        rf, et = RFClassifier(), ETClassifier()
+        self.assertIs(rf.encoders, et.encoders)
+        self.assertIs(rf.values_fill_missing, et.values_fill_missing)
+        self.assertIs(rf.compiled_model, RFClassifier().compiled_model)
+        self.assertIsNone(rf.model)
+
+        model_path = os.path.join(ARTIFACTS_PATH, 'rf_classifier.joblib')
+        with tempfile.TemporaryDirectory() as cache_dir:
+            store = ArtifactStore(mmap_mode='r', cache_dir=cache_dir)
+            compiled_model = store.load_compiled(model_path, CompiledForest)
+
+            self.assertIsInstance(compiled_model.threshold, np.memmap)
+            # only the compiled forest is kept, under a key with its format version
+            key = '{}.compiledforest.v{}'.format(store.get_hash(model_path), CompiledForest.format_version)
+            self.assertEqual([key], store.get_stats()['objects'])
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            np.testing.assert_array_equal(rf.compiled_model.value, compiled_model.value)
+
     def test_registry(self):
         registry = MLRegistry()
         self.assertEqual(len(registry.endpoints), 0)
@@ -75,3 +311,112 @@ class MLTests(TestCase):
                                algorithm_description, algorithm_code)
 
         self.assertEqual(len(registry.endpoints), 1)
+
+    def test_registry_routes(self):
+        registry = MLRegistry()
+        algorithm_code = inspect.getsource(RFClassifier)
+
+        registry.add_algorithm("income_classifier", RFClassifier(), "random forest", "production", "0.0.1",
+                               "Piotr", "Random Forest with simple pre- and post-processing", algorithm_code)
+
+        algs = registry.get_algorithms("income_classifier", "production")
+        self.assertEqual(len(algs), 1)
+        self.assertEqual(algs, registry.get_algorithms("income_classifier", "production", "0.0.1"))
+        self.assertEqual(len(registry.get_algorithms("income_classifier", "production", "0.0.2")), 0)
+
+        algorithm_id, algorithm_object = algs[0]
+        self.assertIs(registry.endpoints[algorithm_id], algorithm_object)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MLAlgorithmStatus.objects.filter(parent_mlalgorithm_id=algorithm_id).update(active=False)
+            MLAlgorithmStatus.objects.create(status="testing", created_by="Piotr",
+                                             parent_mlalgorithm_id=algorithm_id, active=True)
+
+        self.assertEqual(len(registry.get_algorithms("income_classifier", "production")), 0)
+        self.assertEqual(len(registry.get_algorithms("income_classifier", "testing")), 1)
+
+    def test_registry_routes_version(self):
+        registry = MLRegistry()
+        algorithm_code = inspect.getsource(RFClassifier)
+
+        registry.add_algorithm("income_classifier", RFClassifier(), "random forest", "production", "0.0.1",
+                               "Piotr", "Random Forest with simple pre- and post-processing", algorithm_code)
+
+        with self.settings(ML_REGISTRY_ROUTES_CACHE_ALIAS='default'):
+            self.assertEqual(len(registry.get_algorithms("income_classifier", "production")), 1)
+
+            # a change made by another worker is routed to once that worker bumps the shared version
+            MLAlgorithmStatus.objects.update(active=False)
+            self.assertEqual(len(registry.get_algorithms("income_classifier", "production")), 1)
+            cache.incr(ROUTES_VERSION_CACHE_KEY)
+            self.assertEqual(len(registry.get_algorithms("income_classifier", "production")), 0)
+
+    def test_registry_lazy_loading(self):
+        registry = MLRegistry()
+        algorithm_code = inspect.getsource(ETClassifier)
+
+        registry.add_algorithm("income_classifier", None, "extra trees", "testing", "0.0.1",
+                               "Piotr", "Extra Trees with simple pre- and post-processing", algorithm_code,
+                               algorithm_factory=ETClassifier)
+
+        algorithm_object = list(registry.endpoints.values())[0]
+        self.assertFalse(algorithm_object.loaded)
+        self.assertFalse(registry.ready)
+
+        registry.load_algorithms(max_workers=2, wait=True)
+        self.assertTrue(algorithm_object.loaded)
+        self.assertTrue(registry.ready)
+
+        input_data = {
+            "age": 37, "workclass": "Private", "fnlwgt": 34146, "education": "HS-grad", "education-num": 9,
+            "marital-status": "Married-civ-spouse", "occupation": "Craft-repair", "relationship": "Husband",
+            "race": "White", "sex": "Male", "capital-gain": 0, "capital-loss": 0, "hours-per-week": 68,
+            "native-country": "United-States"
+        }
+        self.assertEqual(algorithm_object.compute_prediction(input_data), ETClassifier().compute_prediction(input_data))
+
+    def test_registry_sync(self):
+        algorithms = [{
+            'endpoint_name': "income_classifier",
+            'algorithm_factory': RFClassifier,
+            'algorithm_name': "random forest",
+            'algorithm_status': "production",
+            'algorithm_version': "0.0.1",
+            'owner': "Piotr",
+            'algorithm_description': "Random Forest with simple pre- and post-processing",
+        }]
+
+        registry = MLRegistry()
+        registry.register_algorithms(algorithms)
+        self.assertEqual(len(registry.endpoints), 0)
+
+        registry.register_algorithms(algorithms, sync=True)
+        registry.register_algorithms(algorithms, sync=True)
+        self.assertEqual(len(registry.endpoints), 1)
+        self.assertEqual(MLAlgorithm.objects.count(), 1)
+        self.assertEqual(MLAlgorithmStatus.objects.count(), 1)
+
+        registry = MLRegistry()
+        registry.register_algorithms(algorithms)
+        self.assertEqual(list(registry.endpoints), [MLAlgorithm.objects.get().id])
+        self.assertEqual(len(MLAlgorithm.objects.get().content_hash), 64)
+        self.assertEqual(list(registry.content_hashes.values()), [MLAlgorithm.objects.get().content_hash])
+
+        # a changed algorithm is not synced under the version that is already served
+        changed_algorithms = [dict(algorithms[0], algorithm_description="Random Forest with new post-processing")]
+        self.assertRaises(ValueError, MLRegistry().register_algorithms, changed_algorithms, sync=True)
+        self.assertEqual(MLAlgorithm.objects.count(), 1)
+
+        changed_algorithms[0]['algorithm_version'] = "0.0.2"
+        MLRegistry().register_algorithms(changed_algorithms, sync=True)
+        self.assertEqual(MLAlgorithm.objects.count(), 2)
+
+    def test_traffic_split(self):
+        split = TrafficSplit([1, 3, 0, 6])
+
+        shares = np.bincount(split.choose_many(100000), minlength=4) / 100000
+        np.testing.assert_allclose(shares, [0.1, 0.3, 0.0, 0.6], atol=0.01)
+
+        key_shares = np.bincount([split.choose("user-{}".format(i)) for i in range(10000)], minlength=4) / 10000
+        np.testing.assert_allclose(key_shares, [0.1, 0.3, 0.0, 0.6], atol=0.02)
+        self.assertEqual(len({split.choose("user-1") for _ in range(10)}), 1)
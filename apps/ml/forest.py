@@ -0,0 +1,83 @@
+import numpy as np
+
+TREE_LEAF = -1
+
+
+class CompiledForest:
+    """
+    Flat array representation of a fitted sklearn tree-ensemble classifier (e.g. random forest, extra trees).
+
+    The nodes of all trees are packed into shared feature, threshold, left, right and value arrays. Leaves point to
+    themselves, so all rows are pushed through all trees at once with a fixed number of vectorized steps, which
+    avoids the per-call validation and dispatch overhead of the sklearn estimators.
+    """
+
+    # bump whenever the arrays or their layout change, so that cached copies of older compiled forests are not loaded
+    format_version = 1
+
+    def __init__(self, model):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single output tree ensembles can be compiled.")
+
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+
+        features, thresholds, lefts, rights, values, missing_lefts, roots = [], [], [], [], [], [], []
+        self.max_depth = 0
+
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_count = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            node_ids = np.arange(offset, offset + node_count)
+
+            value = tree.value[:, 0, :].astype(np.float64)
+            value = value / value.sum(axis=1, keepdims=True)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(value)
+            missing_lefts.append(getattr(tree, 'missing_go_to_left', np.zeros(node_count, dtype=np.uint8)))
+            roots.append(offset)
+
+            self.max_depth = max(self.max_depth, tree.max_depth)
+            offset += node_count
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds).astype(np.float64)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.value = np.concatenate(values)
+        self.missing_left = np.concatenate(missing_lefts).astype(bool)
+        self.roots = np.array(roots, dtype=np.intp)
+
+    def apply(self, X):
+        """
+        Returns the leaf index reached by every row in every tree, with shape (n_samples, n_trees).
+        """
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError("X has {} features, but the model expects {}.".format(X.shape[-1], self.n_features_in_))
+
+        has_missing = np.isnan(X).any()
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.tile(self.roots, (X.shape[0], 1))
+
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if has_missing:
+                go_left |= np.isnan(x) & self.missing_left[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return nodes
+
+    def predict_proba(self, X):
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
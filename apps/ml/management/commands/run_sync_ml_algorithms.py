@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand, CommandError
+
+from apps.ml.registration import ALGORITHMS
+from apps.ml.registry import MLRegistry
+
+
+class Command(BaseCommand):
+
+    def handle(self, *args, **options):
+        print('\n syncing ml algorithm entries')
+
+        registry = MLRegistry()
+        try:
+            registry.register_algorithms(ALGORITHMS, sync=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for algorithm_id in registry.endpoints:
+            print(' ml algorithm {} is synced'.format(algorithm_id))
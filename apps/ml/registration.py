@@ -1,38 +1,46 @@
-import inspect
+from django.conf import settings
 
 from apps.ml.deployments.income_classifier.et_classifier import ETClassifier
 from apps.ml.deployments.income_classifier.rf_classifier import RFClassifier
 from apps.ml.registry import MLRegistry
 
+ALGORITHMS = (
+    {
+        'endpoint_name': 'income_classifier',
+        'algorithm_factory': RFClassifier,
+        'algorithm_name': 'random forest',
+        'algorithm_status': 'production',
+        'algorithm_version': '0.1',
+        'owner': 'buswedg',
+        'algorithm_description': 'Random Forest with simple pre- and post-processing.',
+    },
+    {
+        'endpoint_name': 'income_classifier',
+        'algorithm_factory': ETClassifier,
+        'algorithm_name': 'extra trees',
+        'algorithm_status': 'testing',
+        'algorithm_version': '0.1',
+        'owner': 'buswedg',
+        'algorithm_description': 'Extra Trees with simple pre- and post-processing.',
+    },
+)
+
 
 try:
     registry = MLRegistry()
 
-    rf = RFClassifier()
-    registry.add_algorithm(
-        endpoint_name='income_classifier',
-        algorithm_object=rf,
-        algorithm_name='random forest',
-        algorithm_status='production',
-        algorithm_version='0.1',
-        owner='buswedg',
-        algorithm_description='Random Forest with simple pre- and post-processing.',
-        algorithm_code=inspect.getsource(RFClassifier)
-    )
-
-    et = ETClassifier()
-    registry.add_algorithm(
-        endpoint_name='income_classifier',
-        algorithm_object=et,
-        algorithm_name='extra trees',
-        algorithm_status='testing',
-        algorithm_version='0.1',
-        owner='buswedg',
-        algorithm_description='Extra Trees with simple pre- and post-processing.',
-        algorithm_code=inspect.getsource(ETClassifier)
-    )
-
-    print('Successfully loaded all algorithms to the registry')
+    # algorithms are synced to the database once by the run_sync_ml_algorithms command, workers only read their ids
+    # and content hashes
+    registry.register_algorithms(ALGORITHMS, sync=settings.ML_REGISTRY_SYNC_ON_STARTUP)
+
+    # algorithms are loaded on first use (lazy), in background threads (background) or before returning (eager)
+    if settings.ML_REGISTRY_LOAD_MODE in ('background', 'eager'):
+        registry.load_algorithms(
+            settings.ML_REGISTRY_LOAD_WORKERS,
+            wait=settings.ML_REGISTRY_LOAD_MODE == 'eager'
+        )
+
+    print('Successfully added all algorithms to the registry')
 
 except Exception as e:
-    print('Exception while loading the algorithms to the registry:', str(e))
+    print('Exception while loading the algorithms to the registry:', str(e))
\ No newline at end of file
@@ -1,32 +1,361 @@
-from apps.endpoints.models import Endpoint, MLAlgorithm, MLAlgorithmStatus
+import hashlib
+import inspect
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+
+from apps.endpoints.models import ABTestArm, Endpoint, MLAlgorithm, MLAlgorithmStatus
+from apps.ml.artifacts import artifact_store
+from apps.ml.routing import Route, TrafficSplit
+
+ROUTES_VERSION_CACHE_KEY = "ml_registry_routes_version"
+
+logger = logging.getLogger('custom')
+
+# the routing table version of this process, used when no shared cache is configured
+local_routes_version = 0
+
+
+def get_routes_cache():
+    # the version must reach every worker, which the per-process default cache does not
+    alias = settings.ML_REGISTRY_ROUTES_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def get_routes_version():
+    """
+    Returns the shared routing table version, initialising it if the cache has no value.
+
+    Without a shared cache this is the version of this process, so the changes made in other processes are only
+    routed to once the routes expire after ML_REGISTRY_ROUTES_TTL seconds.
+    """
+    routes_cache = get_routes_cache()
+    if routes_cache is None:
+        return local_routes_version
+
+    version = routes_cache.get(ROUTES_VERSION_CACHE_KEY)
+    if version is None:
+        routes_cache.add(ROUTES_VERSION_CACHE_KEY, time.time_ns(), None)
+        version = routes_cache.get(ROUTES_VERSION_CACHE_KEY)
+
+    return version
+
+
+def bump_routes_version():
+    """
+    Bumps the shared routing table version so that every registry rebuilds its routes on next use.
+    """
+    global local_routes_version
+    local_routes_version += 1
+
+    routes_cache = get_routes_cache()
+    if routes_cache is None:
+        return
+
+    try:
+        routes_cache.incr(ROUTES_VERSION_CACHE_KEY)
+    except ValueError:
+        routes_cache.add(ROUTES_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def get_content_hash(endpoint_name, algorithm_name, algorithm_version, owner, algorithm_description, algorithm_code,
+                     artifact_paths=()):
+    """
+    Returns the hash identifying an algorithm registration, over its fields, code and artifact contents.
+    """
+    content_hash = hashlib.blake2b(digest_size=32)
+
+    for value in (endpoint_name, algorithm_name, algorithm_version, owner, algorithm_description, algorithm_code):
+        content_hash.update(value.encode())
+        content_hash.update(b'\0')
+
+    for path in artifact_paths:
+        content_hash.update(artifact_store.get_hash(path).encode())
+
+    return content_hash.hexdigest()
+
+
+class LazyAlgorithm:
+    """
+    Stands in for an algorithm object that is only created by its factory on first use.
+
+    Attribute access is forwarded to the algorithm object, loading it first if needed.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.algorithm_object = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name in ('factory', 'algorithm_object', 'lock'):
+            raise AttributeError(name)
+
+        return getattr(self.load(), name)
+
+    @property
+    def loaded(self):
+        return self.algorithm_object is not None
+
+    def load(self):
+        if self.algorithm_object is None:
+            with self.lock:
+                if self.algorithm_object is None:
+                    self.algorithm_object = self.factory()
+
+        return self.algorithm_object
 
 
 class MLRegistry:
     def __init__(self):
         self.endpoints = {}
+        self.content_hashes = {}
+        self.artifacts = artifact_store
+        self.routes = {}
+        self.routes_version = None
+        self.routes_built_at = 0
+        self.routes_lock = threading.Lock()
+
+    @staticmethod
+    def sync_algorithm(endpoint_name, algorithm_name, algorithm_status, algorithm_version, owner,
+                       algorithm_description, algorithm_code, content_hash):
+        """
+        Creates the algorithm with the given content hash and its initial status, if it does not exist yet.
+
+        Returns the algorithm id. The lookup is on the indexed content hash, and concurrent syncs of the same
+        algorithm are resolved by its unique constraint. Raises a ValueError when the endpoint already has an algorithm
+        with the same name and version but other content, as a changed algorithm must be released under a new version.
+        """
+        algorithm_id = MLAlgorithm.objects.filter(content_hash=content_hash).values_list('id', flat=True).first()
+        if algorithm_id is not None:
+            return algorithm_id
+
+        try:
+            with transaction.atomic():
+                endpoint, _ = Endpoint.objects.get_or_create(name=endpoint_name, owner=owner)
+
+                # algorithms registered before content hashes were stored are matched on their code once
+                ml_algorithm = MLAlgorithm.objects.filter(
+                    name=algorithm_name,
+                    description=algorithm_description,
+                    code=algorithm_code,
+                    version=algorithm_version,
+                    owner=owner,
+                    parent_endpoint=endpoint,
+                    content_hash__isnull=True
+                ).first()
+
+                if ml_algorithm is not None:
+                    ml_algorithm.content_hash = content_hash
+                    ml_algorithm.save(update_fields=['content_hash', 'modified_at'])
+                    return ml_algorithm.id
+
+                # workers look algorithms up by name and version, so the version already served must not change
+                if MLAlgorithm.objects.filter(
+                    name=algorithm_name,
+                    version=algorithm_version,
+                    parent_endpoint__name=endpoint_name
+                ).exists():
+                    raise ValueError(
+                        "ML algorithm {} {} of the {} endpoint was changed, bump its version to register it.".format(
+                            algorithm_name, algorithm_version, endpoint_name)
+                    )
+
+                ml_algorithm = MLAlgorithm.objects.create(
+                    name=algorithm_name,
+                    description=algorithm_description,
+                    code=algorithm_code,
+                    version=algorithm_version,
+                    owner=owner,
+                    parent_endpoint=endpoint,
+                    content_hash=content_hash
+                )
+
+                MLAlgorithmStatus.objects.create(
+                    status=algorithm_status,
+                    created_by=owner,
+                    parent_mlalgorithm=ml_algorithm,
+                    active=True
+                )
+
+                return ml_algorithm.id
+
+        except IntegrityError:
+            return MLAlgorithm.objects.values_list('id', flat=True).get(content_hash=content_hash)
+
+    def register_algorithm(self, algorithm_id, algorithm_object=None, algorithm_factory=None, content_hash=None):
+        if algorithm_object is None:
+            algorithm_object = LazyAlgorithm(algorithm_factory)
+
+        self.endpoints[algorithm_id] = algorithm_object
+        self.content_hashes[algorithm_id] = content_hash
+        self.routes_version = None
 
     def add_algorithm(self, endpoint_name, algorithm_object, algorithm_name,
                       algorithm_status, algorithm_version, owner,
-                      algorithm_description, algorithm_code):
-
-        endpoint, _ = Endpoint.objects.get_or_create(name=endpoint_name, owner=owner)
-
-        ml_algorithm, created = MLAlgorithm.objects.get_or_create(
-            name=algorithm_name,
-            description=algorithm_description,
-            code=algorithm_code,
-            version=algorithm_version,
-            owner=owner,
-            parent_endpoint=endpoint
-        )
-
-        if created:
-            status = MLAlgorithmStatus(
-                status=algorithm_status,
-                created_by=owner,
-                parent_mlalgorithm=ml_algorithm,
-                active=True
-            )
-            status.save()
-
-        self.endpoints[ml_algorithm.id] = algorithm_object
+                      algorithm_description, algorithm_code, algorithm_factory=None, artifact_paths=()):
+
+        content_hash = get_content_hash(endpoint_name, algorithm_name, algorithm_version, owner,
+                                        algorithm_description, algorithm_code, artifact_paths)
+
+        algorithm_id = self.sync_algorithm(endpoint_name, algorithm_name, algorithm_status, algorithm_version, owner,
+                                           algorithm_description, algorithm_code, content_hash)
+
+        self.register_algorithm(algorithm_id, algorithm_object, algorithm_factory, content_hash)
+
+    def register_algorithms(self, algorithms, sync=False):
+        """
+        Registers the given algorithm specs.
+
+        Every spec holds the add_algorithm arguments, with the code and artifact paths taken from its
+        algorithm_factory. With sync set, the content hashes are computed and the algorithms missing from the database
+        are created, e.g. by the run_sync_ml_algorithms command. Otherwise the ids and content hashes stored by the
+        last sync are read by endpoint, name and version with one query, so workers never hash the artifacts, and
+        algorithms that are not synced yet are skipped.
+        """
+        if sync:
+            synced = {}
+            for algorithm in algorithms:
+                algorithm_factory = algorithm['algorithm_factory']
+                algorithm_code = inspect.getsource(algorithm_factory)
+
+                content_hash = get_content_hash(
+                    algorithm['endpoint_name'], algorithm['algorithm_name'], algorithm['algorithm_version'],
+                    algorithm['owner'], algorithm['algorithm_description'], algorithm_code,
+                    getattr(algorithm_factory, 'artifact_paths', ())
+                )
+                algorithm_id = self.sync_algorithm(
+                    algorithm['endpoint_name'], algorithm['algorithm_name'], algorithm['algorithm_status'],
+                    algorithm['algorithm_version'], algorithm['owner'], algorithm['algorithm_description'],
+                    algorithm_code, content_hash
+                )
+                key = (algorithm['endpoint_name'], algorithm['algorithm_name'], algorithm['algorithm_version'])
+                synced[key] = (algorithm_id, content_hash)
+        else:
+            synced = {
+                (endpoint_name, algorithm_name, algorithm_version): (algorithm_id, content_hash)
+                for endpoint_name, algorithm_name, algorithm_version, algorithm_id, content_hash
+                in MLAlgorithm.objects.filter(
+                    parent_endpoint__name__in={algorithm['endpoint_name'] for algorithm in algorithms},
+                    content_hash__isnull=False
+                ).order_by('id').values_list('parent_endpoint__name', 'name', 'version', 'id', 'content_hash')
+            }
+
+        for algorithm in algorithms:
+            key = (algorithm['endpoint_name'], algorithm['algorithm_name'], algorithm['algorithm_version'])
+            algorithm_id, content_hash = synced.get(key, (None, None))
+
+            if algorithm_id is None:
+                logger.warning('ML algorithm {} {} is not synced, skipping it'.format(
+                    algorithm['algorithm_name'], algorithm['algorithm_version']))
+                continue
+
+            self.register_algorithm(algorithm_id, algorithm_factory=algorithm['algorithm_factory'],
+                                    content_hash=content_hash)
+
+    @property
+    def ready(self):
+        """
+        Returns True when all registered algorithm objects are loaded.
+        """
+        return all(getattr(algorithm_object, 'loaded', True) for algorithm_object in self.endpoints.values())
+
+    def load_algorithms(self, max_workers, wait=False):
+        """
+        Loads the registered lazy algorithm objects in a pool of background threads.
+
+        The threads are daemon threads, so management commands do not wait for the algorithms to load on exit.
+        """
+        semaphore = threading.BoundedSemaphore(max_workers)
+
+        def load(algorithm_id, algorithm_object):
+            with semaphore:
+                try:
+                    algorithm_object.load()
+                except Exception as e:
+                    logger.error('Failed to load ML algorithm {}: {}'.format(algorithm_id, e))
+
+        threads = []
+        for algorithm_id, algorithm_object in self.endpoints.items():
+            if isinstance(algorithm_object, LazyAlgorithm) and not algorithm_object.loaded:
+                thread = threading.Thread(target=load, args=(algorithm_id, algorithm_object), daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def build_routes(self):
+        """
+        Builds the (endpoint name, status, version) routing table from the active algorithm statuses.
+
+        Every route holds a list of (algorithm id, algorithm object) pairs and the traffic split between them,
+        weighted by the arms of the running A/B tests. The version None holds the algorithms of all versions for
+        the endpoint and status. Algorithms that are not loaded into this registry are not routed to.
+        """
+        routes = defaultdict(list)
+
+        active_statuses = MLAlgorithmStatus.objects.filter(active=True).values_list(
+            'parent_mlalgorithm__parent_endpoint__name',
+            'status',
+            'parent_mlalgorithm__version',
+            'parent_mlalgorithm_id',
+        ).order_by('parent_mlalgorithm_id').distinct()
+
+        for endpoint_name, algorithm_status, algorithm_version, algorithm_id in active_statuses:
+            if algorithm_id not in self.endpoints:
+                continue
+
+            route = (algorithm_id, self.endpoints[algorithm_id])
+            routes[(endpoint_name, algorithm_status, None)].append(route)
+            routes[(endpoint_name, algorithm_status, algorithm_version)].append(route)
+
+        # the arms of later tests take precedence, algorithms without an arm get the default weight
+        weights = dict(ABTestArm.objects.filter(ab_test__ended_at__isnull=True).order_by(
+            'ab_test__created_at', 'id'
+        ).values_list('parent_mlalgorithm_id', 'weight'))
+
+        built_routes = {}
+        for key, algorithms in routes.items():
+            algorithm_weights = [weights.get(algorithm_id, 1.0) for algorithm_id, _ in algorithms]
+            if sum(algorithm_weights) <= 0:
+                algorithm_weights = [1.0] * len(algorithms)
+
+            salt = ','.join(str(algorithm_id) for algorithm_id, _ in algorithms)
+            built_routes[key] = Route(algorithms, TrafficSplit(algorithm_weights, salt=salt))
+
+        return built_routes
+
+    def routes_stale(self, version):
+        expired = time.monotonic() - self.routes_built_at > settings.ML_REGISTRY_ROUTES_TTL
+        return expired or version != self.routes_version
+
+    def get_routes(self):
+        """
+        Returns the routing table, rebuilding it when the shared version changes or the TTL expires.
+        """
+        version = get_routes_version()
+
+        if self.routes_stale(version):
+            with self.routes_lock:
+                if self.routes_stale(version):
+                    self.routes = self.build_routes()
+                    self.routes_version = version
+                    self.routes_built_at = time.monotonic()
+
+        return self.routes
+
+    def get_route(self, endpoint_name, algorithm_status, algorithm_version=None):
+        """
+        Returns the algorithms and the traffic split of a route from one snapshot of the routing table.
+        """
+        return self.get_routes().get((endpoint_name, algorithm_status, algorithm_version), Route([], None))
+
+    def get_algorithms(self, endpoint_name, algorithm_status, algorithm_version=None):
+        return self.get_route(endpoint_name, algorithm_status, algorithm_version).algorithms
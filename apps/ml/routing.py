@@ -0,0 +1,66 @@
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+from numpy.random import rand
+
+Route = namedtuple('Route', ['algorithms', 'split'])
+
+
+class TrafficSplit:
+    """
+    Weighted split of traffic between the algorithms of a route, sampled in O(1) with Vose's alias method.
+
+    The alias table is precomputed from the weights, so every draw is a single lookup. A key, e.g. a user id,
+    is hashed to a fixed point instead of a random one, so requests with the same key stick to the same
+    algorithm for as long as the weights do not change. The salt makes assignments independent between routes.
+    """
+
+    def __init__(self, weights, salt=''):
+        weights = [float(weight) for weight in weights]
+        if not weights or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError("Weights must be non-negative with a positive sum.")
+
+        n = len(weights)
+        scaled = [weight * n / sum(weights) for weight in weights]
+        probabilities = [1.0] * n
+        aliases = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            i, j = small.pop(), large.pop()
+            probabilities[i], aliases[i] = scaled[i], j
+
+            scaled[j] -= 1 - scaled[i]
+            (small if scaled[j] < 1 else large).append(j)
+
+        self.weights = weights
+        self.salt = salt
+        self.probabilities = np.array(probabilities)
+        self.aliases = np.array(aliases)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def get_point(self, key):
+        digest = hashlib.blake2b('{}:{}'.format(self.salt, key).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') / 2 ** 64
+
+    def lookup(self, points):
+        scaled = points * len(self)
+        indices = scaled.astype(int)
+        return np.where(scaled - indices < self.probabilities[indices], indices, self.aliases[indices])
+
+    def choose(self, key=None):
+        """
+        Returns the index of the algorithm for one request, fixed for the given key.
+        """
+        return int(self.choose_many(1, key)[0])
+
+    def choose_many(self, count, key=None):
+        """
+        Returns the algorithm indices for the given number of records, all fixed to one index for the given key.
+        """
+        points = np.full(count, self.get_point(key)) if key is not None else rand(count)
+        return self.lookup(points)
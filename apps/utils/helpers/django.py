@@ -55,13 +55,19 @@ def get_all_related_m2m_objects(model):
     ]
 
 
+def get_upload_prefix(model):
+    """
+    Returns the directory that get_upload_path uploads the files of the given model to.
+    """
+    return os.path.join(model._meta.app_label, model._meta.model_name)
+
+
 def get_upload_path(instance, filename):
     """
     Returns the upload path for the given instance and filename.
     """
     path = os.path.join(
-        instance._meta.app_label,
-        instance._meta.model_name,
+        get_upload_prefix(instance),
         timezone.now().strftime('%Y'),
         timezone.now().strftime('%m'),
         uuid4().hex,
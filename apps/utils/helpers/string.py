@@ -88,4 +88,13 @@ def uuid_to_shortuuid(uuid, length=16):
         hex_int, remainder = divmod(hex_int, len(_SHORT_UUID_ALPHABET))
         res_str = _SHORT_UUID_ALPHABET[remainder] + res_str
 
-    return res_str
\ No newline at end of file
+    return res_str
+
+
+def compile_any(patterns):
+    """
+    Compiles the given regex patterns into a single regex matching any of them.
+
+    Named groups are made non-capturing, since the same name may be used by several patterns.
+    """
+    return re.compile('|'.join('(?:{})'.format(re.sub(r'\(\?P<\w+>', '(?:', pattern)) for pattern in patterns))
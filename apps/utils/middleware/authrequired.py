@@ -1,8 +1,8 @@
-import re
-
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from apps.utils.helpers.string import compile_any
+
 
 class AuthRequiredMiddleware:
     allowed_patterns = [
@@ -14,28 +14,22 @@ class AuthRequiredMiddleware:
         r'^/account/password-reset-complete/$',
         r'^/account/password-change-done/$',
         r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/(?P<token>[0-9A-Za-z]{1,13}-[0-9A-Za-z]{1,36})/$',
-        r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/set-password/$'
+        r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/set-password/$',
         r'^/maintenance/$',
     ]
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.allowed_re = compile_any(self.allowed_patterns)
 
     def __call__(self, request):
-        if not self.pass_request(request):
-
-            match = False
-            for pattern in self.allowed_patterns:
-
-                if re.compile(pattern).match(request.path):
-                    match = True
-                    break
-
-            if not match:
-                return redirect(reverse('account:login'))
+        # the path is matched first, so allowed requests do not load the user
+        if not self.allowed_re.match(request.path) and not self.pass_request(request):
+            return redirect(reverse('account:login'))
 
         return self.get_response(request)
 
     @staticmethod
     def pass_request(request):
-        return request.user.is_authenticated
+        # token-authenticated API requests are authenticated by the API views
+        return getattr(request, 'api_fast_path', False) or request.user.is_authenticated
@@ -0,0 +1,72 @@
+from django.contrib.auth import middleware as auth_middleware
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages import middleware as messages_middleware
+from django.contrib.sessions import middleware as sessions_middleware
+from django.middleware import csrf
+
+from apps.utils.helpers.string import compile_any
+
+
+class APIFastPathMiddleware:
+    """
+    Marks the requests to API paths that carry a JWT or API key Authorization header as being on the API fast path.
+
+    These requests are authenticated by the API views with their tokens or keys, so the session, CSRF, auth and
+    messages middleware below skip them, and their request.user is anonymous. Requests with other schemes, e.g.
+    Basic, go through the session middleware and the login redirect as usual. It must come before the session
+    middleware.
+    """
+    fast_path_patterns = [
+        r'^/api/',
+    ]
+    # the schemes of JWTAuthentication and APIKeyAuthentication, matched case-insensitively as by the latter
+    fast_path_schemes = [
+        'JWT',
+        'Api-Key',
+    ]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.fast_path_re = compile_any(self.fast_path_patterns)
+        self.fast_path_schemes_lower = {scheme.lower() for scheme in self.fast_path_schemes}
+
+    def __call__(self, request):
+        request.api_fast_path = self.is_fast_path_scheme(request) and \
+            self.fast_path_re.match(request.path) is not None
+
+        if request.api_fast_path:
+            request.user = AnonymousUser()
+
+        return self.get_response(request)
+
+    def is_fast_path_scheme(self, request):
+        scheme = request.META.get('HTTP_AUTHORIZATION', '').split(' ', 1)[0]
+        return scheme.lower() in self.fast_path_schemes_lower
+
+
+class FastPathSkipMixin:
+    def __call__(self, request):
+        if getattr(request, 'api_fast_path', False):
+            return self.get_response(request)
+
+        return super().__call__(request)
+
+
+class SessionMiddleware(FastPathSkipMixin, sessions_middleware.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(FastPathSkipMixin, csrf.CsrfViewMiddleware):
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if getattr(request, 'api_fast_path', False):
+            return None
+
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(FastPathSkipMixin, auth_middleware.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(FastPathSkipMixin, messages_middleware.MessageMiddleware):
+    pass
@@ -1,8 +1,8 @@
-import re
-
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from apps.utils.helpers.string import compile_any
+
 
 class MaintenanceModeMiddleware:
     allowed_patterns = [
@@ -14,19 +14,12 @@ class MaintenanceModeMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.allowed_re = compile_any(self.allowed_patterns)
 
     def __call__(self, request):
-        if not self.pass_request(request):
-
-            match = False
-            for pattern in self.allowed_patterns:
-
-                if re.compile(pattern).match(request.path):
-                    match = True
-                    break
-
-            if not match:
-                return redirect(reverse('maintenance'))
+        # the path is matched first, so allowed requests do not load the user
+        if not self.allowed_re.match(request.path) and not self.pass_request(request):
+            return redirect(reverse('maintenance'))
 
         return self.get_response(request)
 
@@ -0,0 +1,63 @@
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from rest_framework.test import APIClient
+
+from apps.account.models import User
+from apps.utils.middleware.authrequired import AuthRequiredMiddleware
+from apps.utils.middleware.fastpath import (
+    APIFastPathMiddleware, AuthenticationMiddleware, CsrfViewMiddleware, SessionMiddleware
+)
+
+
+def view(request):
+    return HttpResponse()
+
+
+class APIFastPathTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='piotr', email='piotr@example.com', password='secret-password')
+        self.client = APIClient(enforce_csrf_checks=True)
+
+    def get_request(self, path, **extra):
+        request = RequestFactory().post(path, **extra)
+        APIFastPathMiddleware(SessionMiddleware(view))(request)
+        return request
+
+    def test_fast_path(self):
+        # token-authenticated API requests get no session and no CSRF check
+        for authorization in ('JWT token', 'Api-Key prefix.secret'):
+            request = self.get_request('/api/v1/endpoint/', HTTP_AUTHORIZATION=authorization)
+            self.assertTrue(request.api_fast_path)
+            self.assertFalse(hasattr(request, 'session'))
+            self.assertTrue(request.user.is_anonymous)
+            self.assertIsNone(CsrfViewMiddleware(view).process_view(request, view, (), {}))
+
+        self.client.credentials(HTTP_AUTHORIZATION='JWT {}'.format(self.user.tokens['access']))
+        response = self.client.get('/api/v1/endpoint/')
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(hasattr(response.wsgi_request, 'session'))
+
+    def test_session_requests(self):
+        # API requests without an Authorization header and other paths go through the session and CSRF middleware
+        for path, extra in (('/api/v1/endpoint/', {}), ('/admin/', {'HTTP_AUTHORIZATION': 'JWT token'})):
+            request = self.get_request(path, **extra)
+            self.assertFalse(request.api_fast_path)
+            self.assertTrue(hasattr(request, 'session'))
+            self.assertEqual(403, CsrfViewMiddleware(view).process_view(request, view, (), {}).status_code)
+
+        response = self.client.post('/api/token/', {'username': 'piotr', 'password': 'secret-password'},
+                                    format='json')
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(hasattr(response.wsgi_request, 'session'))
+
+    def test_other_schemes(self):
+        # API requests with other schemes are not on the fast path, so AuthRequiredMiddleware still redirects them
+        for authorization in ('Basic cGlvdHI6c2VjcmV0LXBhc3N3b3Jk', 'Bearer token'):
+            request = RequestFactory().get('/api/v1/endpoint/', HTTP_AUTHORIZATION=authorization)
+            APIFastPathMiddleware(SessionMiddleware(AuthenticationMiddleware(view)))(request)
+            self.assertFalse(request.api_fast_path)
+            self.assertFalse(AuthRequiredMiddleware.pass_request(request))
+
+        request = self.get_request('/api/v1/endpoint/', HTTP_AUTHORIZATION='api-key prefix.secret')
+        self.assertTrue(AuthRequiredMiddleware.pass_request(request))
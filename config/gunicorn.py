@@ -0,0 +1,19 @@
+import gc
+import os
+
+# load the app, and with it all ML artifacts, once in the master process before forking the workers, so that
+# the workers share the read-only artifact pages instead of each loading their own copy (requires
+# ML_REGISTRY_LOAD_MODE=eager, so that the algorithms are loaded before the workers are forked)
+preload_app = os.getenv('GUNICORN_PRELOAD', False) == "True"
+
+
+def pre_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+
+    # workers must not inherit the database connections used while registering the algorithms
+    from django.db import connections
+    connections.close_all()
+
+    # keep the garbage collector from touching (and so copying) the objects loaded by the master
+    gc.freeze()
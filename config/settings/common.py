@@ -1,6 +1,9 @@
 import json
 import os
 from datetime import timedelta
+from importlib.util import find_spec
+
+from celery.schedules import crontab
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(
@@ -88,13 +91,15 @@ AUTH_USER_MODEL = "account.User"
 # MIDDLEWARE
 # ------------------------------------------------------------------------------
 
+# token-authenticated API requests skip the session, CSRF, auth and messages middleware, see APIFastPathMiddleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.utils.middleware.fastpath.APIFastPathMiddleware',
+    'apps.utils.middleware.fastpath.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'apps.utils.middleware.fastpath.CsrfViewMiddleware',
+    'apps.utils.middleware.fastpath.AuthenticationMiddleware',
+    'apps.utils.middleware.fastpath.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -242,6 +247,9 @@ STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'static'),
 )
 
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_URL = "/media/"
+
 # CELERY
 # ------------------------------------------------------------------------------
 # https://github.com/celery/django-celery-beat
@@ -256,14 +264,94 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_ENABLE_UTC = True
 CELERY_TIMEZONE = TIME_ZONE
 
+CELERY_BEAT_SCHEDULE = {
+    'archive-ml-algorithm-requests': {
+        'task': 'apps.endpoints.tasks.task_archive_ml_algorithm_requests',
+        'schedule': crontab(hour=3, minute=0),
+        'options': {'queue': 'queue_long'},
+    },
+}
+
+# ML SERVICE
+# ------------------------------------------------------------------------------
+
+ML_PREDICT_BATCH_MAX_SIZE = int(os.getenv('ML_PREDICT_BATCH_MAX_SIZE', 1000))
+# number of records parsed and scored at a time by the streaming file endpoint
+ML_PREDICT_FILE_CHUNK_SIZE = int(os.getenv('ML_PREDICT_FILE_CHUNK_SIZE', 1000))
+# number of records per chunk task of batch scoring jobs, and the storage directory of their intermediate files
+ML_BATCH_SCORING_CHUNK_SIZE = int(os.getenv('ML_BATCH_SCORING_CHUNK_SIZE', 10000))
+ML_BATCH_SCORING_DIR = os.getenv('ML_BATCH_SCORING_DIR', 'batch_scoring')
+# for how many seconds the routing table is kept, and the cache shared by all workers that carries its version, so
+# changes reach every worker at once, without which the other workers only see them once the table expires
+ML_REGISTRY_ROUTES_TTL = int(os.getenv('ML_REGISTRY_ROUTES_TTL', 60))
+ML_REGISTRY_ROUTES_CACHE_ALIAS = os.getenv('ML_REGISTRY_ROUTES_CACHE_ALIAS')
+
+# create missing algorithms in the database at startup, instead of only with the run_sync_ml_algorithms command
+ML_REGISTRY_SYNC_ON_STARTUP = os.getenv('ML_REGISTRY_SYNC_ON_STARTUP', False) == "True"
+
+# load algorithms on first use (lazy), in background threads (background) or at startup (eager, e.g. for preloading)
+ML_REGISTRY_LOAD_MODE = os.getenv('ML_REGISTRY_LOAD_MODE', 'background')
+ML_REGISTRY_LOAD_WORKERS = int(os.getenv('ML_REGISTRY_LOAD_WORKERS', 4))
+
+# memory map artifacts (e.g. 'r') from uncompressed copies in the cache directory, to share them between workers
+ML_ARTIFACTS_MMAP_MODE = os.getenv('ML_ARTIFACTS_MMAP_MODE') or None
+ML_ARTIFACTS_CACHE_DIR = os.getenv('ML_ARTIFACTS_CACHE_DIR', os.path.join(BASE_DIR, 'artifacts', '.cache'))
+
+# how the feature encoders handle unseen categories: error or fill (with the training mode)
+ML_ENCODER_UNKNOWN_POLICY = os.getenv('ML_ENCODER_UNKNOWN_POLICY', 'error')
+
+# prediction result cache, with an optional shared tier on the given cache alias (e.g. Redis)
+ML_PREDICTION_CACHE_ENABLED = os.getenv('ML_PREDICTION_CACHE_ENABLED', False) == "True"
+ML_PREDICTION_CACHE_SIZE = int(os.getenv('ML_PREDICTION_CACHE_SIZE', 10000))
+ML_PREDICTION_CACHE_TTL = int(os.getenv('ML_PREDICTION_CACHE_TTL', 300))
+ML_PREDICTION_CACHE_ALIAS = os.getenv('ML_PREDICTION_CACHE_ALIAS') or None
+
+# micro-batching of concurrent single predictions, useful with threaded workers
+ML_MICRO_BATCH_ENABLED = os.getenv('ML_MICRO_BATCH_ENABLED', False) == "True"
+ML_MICRO_BATCH_MAX_SIZE = int(os.getenv('ML_MICRO_BATCH_MAX_SIZE', 32))
+ML_MICRO_BATCH_MAX_WAIT = float(os.getenv('ML_MICRO_BATCH_MAX_WAIT', 0.002))
+# seconds a request waits for its batch before computing its prediction inline
+ML_MICRO_BATCH_TIMEOUT = float(os.getenv('ML_MICRO_BATCH_TIMEOUT', 1))
+
+# number of feedback items applied per query by the bulk feedback endpoint and command
+ML_FEEDBACK_CHUNK_SIZE = int(os.getenv('ML_FEEDBACK_CHUNK_SIZE', 2000))
+
+# confidence level of the A/B test statistics intervals and significance test
+ML_AB_TEST_CONFIDENCE = float(os.getenv('ML_AB_TEST_CONFIDENCE', 0.95))
+
+# request logging mode: sync, buffered (background bulk_create) or celery (background hand-off to queue_short)
+ML_REQUEST_LOG_MODE = os.getenv('ML_REQUEST_LOG_MODE', 'sync')
+ML_REQUEST_LOG_BUFFER_SIZE = int(os.getenv('ML_REQUEST_LOG_BUFFER_SIZE', 10000))
+ML_REQUEST_LOG_BATCH_SIZE = int(os.getenv('ML_REQUEST_LOG_BATCH_SIZE', 500))
+ML_REQUEST_LOG_FLUSH_INTERVAL = float(os.getenv('ML_REQUEST_LOG_FLUSH_INTERVAL', 1.0))
+# what to do when the buffer is full: sync, block or drop
+ML_REQUEST_LOG_OVERFLOW_POLICY = os.getenv('ML_REQUEST_LOG_OVERFLOW_POLICY', 'sync')
+# requests older than the retention in days (0 keeps them) are archived to gzipped JSON lines files in the storage
+# directory and removed by a daily task, which also creates the monthly partitions of the request log on Postgres
+ML_REQUEST_LOG_RETENTION_DAYS = int(os.getenv('ML_REQUEST_LOG_RETENTION_DAYS', 0))
+ML_REQUEST_LOG_ARCHIVE_DIR = os.getenv('ML_REQUEST_LOG_ARCHIVE_DIR', 'request_log_archive')
+ML_REQUEST_LOG_ARCHIVE_CHUNK_SIZE = int(os.getenv('ML_REQUEST_LOG_ARCHIVE_CHUNK_SIZE', 5000))
+ML_REQUEST_LOG_PARTITIONS_AHEAD = int(os.getenv('ML_REQUEST_LOG_PARTITIONS_AHEAD', 3))
+# the cache shared by all workers keeping the change versions of the registry tables, the registry lists answer
+# conditional GETs only when it is set
+ML_LIST_CACHE_ALIAS = os.getenv('ML_LIST_CACHE_ALIAS')
+# whether the rendered bodies of the registry lists are also kept in that cache, and for how long
+ML_LIST_CACHE_ENABLED = os.getenv('ML_LIST_CACHE_ENABLED', False) == "True"
+ML_LIST_CACHE_TTL = int(os.getenv('ML_LIST_CACHE_TTL', 300))
+
 # DJANGO REST FRAMEWORK
 # ------------------------------------------------------------------------------
 # http://www.django-rest-framework.org/
 
 REST_FRAMEWORK = {
+    # the JSON renderer and parser use orjson, which is optional, and fall back to the standard library without it
     'DEFAULT_RENDERER_CLASSES': (
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'apps.api.renderers.JSONRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'apps.api.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -272,10 +360,18 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.TokenAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.account.authentication.CachedJWTAuthentication',
     ),
 }
 
+# application/msgpack is accepted and returned for machine clients when the optional msgpack package is installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('apps.api.renderers.MessagePackRenderer',)
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] += ('apps.api.parsers.MessagePackParser',)
+
+if DEBUG:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] += ('rest_framework.renderers.BrowsableAPIRenderer',)
+
 # SIMPLE JWT
 # ------------------------------------------------------------------------------
 # https://github.com/jazzband/djangorestframework-simplejwt
@@ -295,6 +391,16 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# whether the users of access tokens are kept in a shared cache until the tokens expire, and in which cache, which
+# must be set when enabled, as the default cache may be local to each process
+JWT_USER_CACHE_ENABLED = os.getenv('JWT_USER_CACHE_ENABLED', False) == "True"
+JWT_USER_CACHE_ALIAS = os.getenv('JWT_USER_CACHE_ALIAS')
+# for how many seconds API keys are kept in the cache of each process, which bounds how long a revoked key works
+API_KEY_CACHE_TTL = int(os.getenv('API_KEY_CACHE_TTL', 60))
+# for how many seconds unknown API key prefixes are remembered, which bounds how long a new key is rejected by the
+# other processes
+API_KEY_CACHE_MISS_TTL = int(os.getenv('API_KEY_CACHE_MISS_TTL', 5))
+
 # LOGGING
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/4.2/topics/logging/
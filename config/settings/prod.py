@@ -21,6 +21,9 @@ if REDIS_CACHE_ENABLED:
     }
 
     CACHE_MIDDLEWARE_ALIAS = "default"
+
+    # redis is shared by all workers, so it carries the routing table version
+    ML_REGISTRY_ROUTES_CACHE_ALIAS = ML_REGISTRY_ROUTES_CACHE_ALIAS or "default"
     CACHE_MIDDLEWARE_KEY_PREFIX = ""
     CACHE_MIDDLEWARE_SECONDS = 600
 
@@ -39,11 +42,3 @@ for options in TEMPLATES:
     options['OPTIONS']['loaders'] = [
         cached_loaders,
     ]
-
-# DJANGO REST FRAMEWORK
-# ------------------------------------------------------------------------------
-# http://www.django-rest-framework.org/
-
-REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = (
-    'rest_framework.renderers.JSONRenderer',
-)
@@ -1,3 +1,4 @@
 #!/bin/sh
 
-python manage.py run_rebuild_core
\ No newline at end of file
+python manage.py run_rebuild_core
+python manage.py run_sync_ml_algorithms
\ No newline at end of file